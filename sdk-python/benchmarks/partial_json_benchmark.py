@@ -0,0 +1,74 @@
+"""
+Microbenchmark: re-parsing streamed tool call arguments with partialjson vs.
+copilotkit's incremental partial JSON parser.
+
+Run with:
+
+    poetry run python benchmarks/partial_json_benchmark.py
+"""
+
+import json
+import time
+from partialjson.json_parser import JSONParser
+from copilotkit.partial_json import IncrementalJSONParser
+
+CHUNK_SIZE = 8
+
+
+def make_arguments(size: int) -> str:
+    """Tool call arguments with a document of roughly `size` characters"""
+    paragraph = 'CopilotKit streams "intermediate" state.\n'
+    document = (paragraph * (size // len(paragraph) + 1))[:size]
+    return json.dumps({"document": document, "steps": [{"title": "draft", "done": False}]})
+
+
+def chunked(arguments: str):
+    return [arguments[i:i + CHUNK_SIZE] for i in range(0, len(arguments), CHUNK_SIZE)]
+
+
+def bench_partialjson(chunks):
+    buffer = ""
+    value = None
+    for chunk in chunks:
+        buffer += chunk
+        try:
+            value = JSONParser().parse(buffer)
+        except ValueError:
+            # chunk ends inside an escape sequence, keep the previous value
+            pass
+    return value
+
+
+def bench_incremental(chunks):
+    parser = IncrementalJSONParser()
+    value = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        try:
+            value = parser.get_value()
+        except ValueError:
+            pass
+    return value
+
+
+def timed(fn, chunks):
+    start = time.perf_counter()
+    value = fn(chunks)
+    return time.perf_counter() - start, value
+
+
+def main():
+    print(f"{'size':>8} {'chunks':>7} {'partialjson':>13} {'incremental':>13} {'speedup':>8}")
+    for size in (1_000, 5_000, 20_000, 50_000):
+        chunks = chunked(make_arguments(size))
+        old_time, old_value = timed(bench_partialjson, chunks)
+        new_time, new_value = timed(bench_incremental, chunks)
+        assert old_value == new_value
+        print(
+            f"{size:>8} {len(chunks):>7} {old_time * 1000:>11.1f}ms {new_time * 1000:>11.1f}ms "
+            f"{old_time / new_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,45 @@
 """Actions"""
 
+import os
 import re
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import Executor, ThreadPoolExecutor
 from inspect import iscoroutinefunction
-from typing import Optional, List, Callable, TypedDict, Any, cast
+from typing import Optional, List, Callable, TypedDict, Any, Mapping, cast
 from .parameter import Parameter, normalize_parameters
+from .action_cache import ActionCache
+from .concurrency import ThreadSafeSemaphore
+from .exc import ActionTimeoutException
+from .metrics import get_metrics
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+def get_action_executor() -> Executor:
+    """
+    Get the executor that runs synchronous action handlers.
+
+    By default, this is a thread pool shared by all actions. Its size can be set with the
+    `COPILOTKIT_ACTION_MAX_WORKERS` environment variable.
+    """
+    global _executor # pylint: disable=global-statement
+    with _executor_lock:
+        if _executor is None:
+            max_workers = os.getenv("COPILOTKIT_ACTION_MAX_WORKERS")
+            _executor = ThreadPoolExecutor(
+                max_workers=int(max_workers) if max_workers else None,
+                thread_name_prefix="copilotkit-action"
+            )
+        return _executor
+
+def set_action_executor(executor: Executor):
+    """Set the executor that runs synchronous action handlers"""
+    global _executor # pylint: disable=global-statement
+    with _executor_lock:
+        _executor = executor
 
 class ActionDict(TypedDict):
     """Dict representation of an action"""
@@ -16,19 +52,53 @@ class ActionResultDict(TypedDict):
     result: Any
 
 class Action:  # pylint: disable=too-few-public-methods
-    """Action class for CopilotKit"""
-    def __init__(
+    """
+    Action class for CopilotKit
+
+    Synchronous handlers are run on the action executor (see `get_action_executor`) so that they
+    don't block the event loop.
+
+    Parameters
+    ----------
+    name : str
+        The name of the action.
+    handler : Callable
+        The function (sync or async) handling the action.
+    description : Optional[str]
+        The description of the action.
+    parameters : Optional[List[Parameter]]
+        The parameters of the action.
+    max_concurrency : Optional[int]
+        The maximum number of concurrent executions of this action. Further executions wait.
+    timeout : Optional[float]
+        The maximum time in seconds to wait for the action (including waiting for a free slot).
+        Raises `ActionTimeoutException` when exceeded.
+    cache : Optional[ActionCache]
+        Cache the results of the action. Only use this for idempotent actions.
+    """
+    def __init__( # pylint: disable=too-many-arguments
             self,
             *,
             name: str,
             handler: Callable,
             description: Optional[str] = None,
             parameters: Optional[List[Parameter]] = None,
+            max_concurrency: Optional[int] = None,
+            timeout: Optional[float] = None,
+            cache: Optional[ActionCache] = None,
         ):
         self.name = name
         self.description = description
         self.parameters = parameters
         self.handler = handler
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self._limiter = (
+            ThreadSafeSemaphore(max_concurrency)
+            if max_concurrency is not None
+            else None
+        )
 
         if not re.match(r"^[a-zA-Z0-9_-]+$", name):
             raise ValueError(
@@ -39,13 +109,76 @@ class Action:  # pylint: disable=too-few-public-methods
     async def execute(
             self,
             *,
-            arguments: dict
+            arguments: dict,
+            context: Optional[Mapping[str, Any]] = None,
         ) -> ActionResultDict:
         """Execute the action"""
-        result = self.handler(**arguments)
+        if self.cache is None:
+            return await self._execute_with_timeout(arguments)
+
+        key = self.cache.make_key(self.name, arguments, context)
+        result = await self.cache.get_or_execute(
+            key,
+            lambda: self._execute_with_timeout(arguments),
+            name=self.name
+        )
+        return cast(ActionResultDict, result)
+
+    async def _execute_with_timeout(self, arguments: dict) -> ActionResultDict:
+        try:
+            return await asyncio.wait_for(self._execute(arguments), self.timeout)
+        except asyncio.TimeoutError as exc:
+            get_metrics().increment("action_timeouts", action=self.name)
+            raise ActionTimeoutException(self.name, cast(float, self.timeout)) from exc
+
+    async def _execute(self, arguments: dict) -> ActionResultDict:
+        metrics = get_metrics()
+        queued_at = time.perf_counter()
+        started_at = queued_at
+
+        if self._limiter is not None:
+            await self._limiter.acquire()
+        release_limiter = self._limiter is not None
+
+        try:
+            if iscoroutinefunction(self.handler):
+                started_at = time.perf_counter()
+                metrics.observe(
+                    "action_queue_wait_seconds",
+                    started_at - queued_at,
+                    action=self.name
+                )
+                result = await self.handler(**arguments)
+            else:
+                def _run_handler():
+                    nonlocal started_at
+                    started_at = time.perf_counter()
+                    metrics.observe(
+                        "action_queue_wait_seconds",
+                        started_at - queued_at,
+                        action=self.name
+                    )
+                    return self.handler(**arguments)
+
+                context = contextvars.copy_context()
+                future = get_action_executor().submit(context.run, _run_handler)
+                if self._limiter is not None:
+                    # a timed out handler keeps running, so it keeps its slot until it is done
+                    future.add_done_callback(lambda _: cast(Any, self._limiter).release())
+                    release_limiter = False
+                result = await asyncio.wrap_future(future)
+        finally:
+            if release_limiter:
+                cast(Any, self._limiter).release()
+
+        metrics.observe(
+            "action_execution_seconds",
+            time.perf_counter() - started_at,
+            action=self.name
+        )
 
         return {
-            "result": await result if iscoroutinefunction(self.handler) else result
+            "result": result
         }
 
     def dict_repr(self) -> ActionDict:
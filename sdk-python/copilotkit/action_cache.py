@@ -0,0 +1,187 @@
+"""
+Result cache for idempotent actions.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional
+
+from .cache import LRUCache
+from .metrics import get_metrics
+
+DEFAULT_ACTION_CACHE_TTL = 300
+DEFAULT_ACTION_CACHE_MAX_ENTRIES = 1000
+
+_MISSING = object()
+
+
+class ActionCacheBackend(ABC):
+    """
+    Storage for cached action results.
+
+    Implement this to share results between processes, e.g. with Redis. Keys are strings, values
+    are the results returned by the action handlers.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        """Get a result, or `None` if it is not cached"""
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[float]):
+        """Store a result for `ttl` seconds (forever if `ttl` is None)"""
+
+    @abstractmethod
+    async def invalidate(self, key: str):
+        """Remove a result"""
+
+
+class InMemoryActionCacheBackend(ActionCacheBackend):
+    """In-process backend, bounded by number of entries and optionally by memory"""
+
+    def __init__(
+            self,
+            *,
+            max_entries: Optional[int] = DEFAULT_ACTION_CACHE_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+        ):
+        self.cache: LRUCache[Any] = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    async def get(self, key: str) -> Any:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float]):
+        self.cache.set(key, value, ttl=ttl)
+
+    async def invalidate(self, key: str):
+        self.cache.invalidate(key)
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(
+        value,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=repr
+    )
+
+
+class ActionCache:
+    """
+    Opt-in result cache for an `Action`.
+
+    Results are keyed by the action name and the canonicalized arguments (key order does not
+    matter), plus the values of `context_keys` in `CopilotKitContext.properties`, e.g. to cache
+    per user. Concurrent calls with the same key are de-duplicated: only one runs the handler,
+    the others wait for its result. Errors are not cached.
+
+    ```python
+    Action(
+        name="lookup_policy",
+        handler=lookup_policy,
+        cache=ActionCache(ttl=60, max_entries=500, context_keys=["tenantId"]),
+    )
+    ```
+
+    Cached results are shared, handlers should not return objects that are mutated later.
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+            self,
+            *,
+            ttl: Optional[float] = DEFAULT_ACTION_CACHE_TTL,
+            max_entries: Optional[int] = DEFAULT_ACTION_CACHE_MAX_ENTRIES,
+            max_bytes: Optional[int] = None,
+            context_keys: Optional[List[str]] = None,
+            backend: Optional[ActionCacheBackend] = None,
+        ):
+        self.ttl = ttl
+        self.context_keys = context_keys or []
+        self.backend = backend or InMemoryActionCacheBackend(
+            max_entries=max_entries,
+            max_bytes=max_bytes
+        )
+        self._lock = threading.Lock()
+        # futures are not bound to an event loop, so calls from different workers are de-duplicated
+        self._in_flight: Dict[str, Future] = {}
+
+    def make_key(
+            self,
+            name: str,
+            arguments: dict,
+            context: Optional[Mapping[str, Any]] = None,
+        ) -> str:
+        """Build the cache key of a call"""
+        properties = (context or {}).get("properties") or {}
+        scope = {key: properties.get(key) for key in self.context_keys}
+        digest = hashlib.sha256(
+            _canonical_json([arguments, scope]).encode("utf-8")
+        ).hexdigest()
+        return f"{name}:{digest}"
+
+    async def invalidate(
+            self,
+            name: str,
+            arguments: dict,
+            context: Optional[Mapping[str, Any]] = None,
+        ):
+        """Remove the cached result of a call"""
+        await self.backend.invalidate(self.make_key(name, arguments, context))
+
+    async def get_or_execute(
+            self,
+            key: str,
+            execute: Callable[[], Awaitable[Any]],
+            *,
+            name: str,
+        ) -> Any:
+        """Return the cached result for `key`, or run `execute` once and cache its result"""
+        metrics = get_metrics()
+        while True:
+            cached = await self.backend.get(key)
+            if cached is not None:
+                metrics.increment("action_cache_hits", action=name)
+                return cached
+
+            with self._lock:
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    in_flight = Future()
+                    self._in_flight[key] = in_flight
+                    leader = True
+                else:
+                    leader = False
+
+            if not leader:
+                metrics.increment("action_cache_coalesced", action=name)
+                result = await asyncio.shield(asyncio.wrap_future(in_flight))
+                if result is _MISSING:
+                    # the call we waited for was cancelled, try again
+                    continue
+                return result
+
+            metrics.increment("action_cache_misses", action=name)
+            try:
+                result = await execute()
+            except BaseException as exc:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                if isinstance(exc, asyncio.CancelledError):
+                    in_flight.set_result(_MISSING)
+                else:
+                    in_flight.set_exception(exc)
+                raise
+
+            try:
+                if result is not None:
+                    await self.backend.set(key, result, self.ttl)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(key, None)
+                in_flight.set_result(result)
+            return result
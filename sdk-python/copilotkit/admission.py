@@ -0,0 +1,249 @@
+"""
+Admission control for agent runs.
+"""
+
+import math
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Dict, List, Optional, Union, cast
+
+from .concurrency import ThreadSafeSemaphore
+from .exc import RunQueueFullException, RunQueueTimeoutException
+from .metrics import get_metrics
+
+DEFAULT_RUN_QUEUE_SIZE = 100
+DEFAULT_RUN_QUEUE_TIMEOUT = 60
+DEFAULT_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 60
+
+
+class RunTicket:
+    """
+    An admitted run. Call `wait` before running if the run is queued, and `release` when it is
+    done.
+    """
+
+    def __init__(self, controller: "AdmissionController", agent_name: str):
+        self.controller = controller
+        self.agent_name = agent_name
+        self.started_at: Optional[float] = None
+        self.agent_slot_acquired = False
+        self.global_slot_acquired = False
+        self.released = False
+        # resolved when the position of the run in the queue changes
+        self.position_changed: Optional[Future] = None
+
+    @property
+    def position(self) -> int:
+        """The position of the run in the queue (starting at 1), 0 if it is not queued"""
+        return self.controller.position(self)
+
+    @property
+    def queued(self) -> bool:
+        """Whether the run has to wait for a slot"""
+        return self.position > 0
+
+    def watch_position(self) -> Future:
+        """Get a future that is resolved the next time the position of the run changes"""
+        return self.controller.watch_position(self)
+
+    async def wait(self):
+        """Wait for a slot, raises `RunQueueTimeoutException` if the queue timeout passes"""
+        await self.controller.wait(self)
+
+    def release(self):
+        """Release the slots of the run"""
+        self.controller.release(self)
+
+
+class AdmissionController:
+    """
+    Limits the number of concurrent agent runs, globally and per agent.
+
+    Runs that don't get a slot right away wait in a bounded queue for at most `queue_timeout`
+    seconds. When the queue is full, `admit` raises `RunQueueFullException` with a `retry_after`
+    estimated from the average duration of recent runs.
+    """
+
+    def __init__(
+            self,
+            *,
+            max_concurrent_runs: Optional[int] = None,
+            max_concurrent_runs_per_agent: Optional[Union[int, Dict[str, int]]] = None,
+            queue_size: int = DEFAULT_RUN_QUEUE_SIZE,
+            queue_timeout: Optional[float] = DEFAULT_RUN_QUEUE_TIMEOUT,
+        ):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_concurrent_runs_per_agent = max_concurrent_runs_per_agent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._global_slots = (
+            ThreadSafeSemaphore(max_concurrent_runs)
+            if max_concurrent_runs is not None
+            else None
+        )
+        self._agent_slots: Dict[str, Optional[ThreadSafeSemaphore]] = {}
+        # queued runs, in order
+        self._queue: List[RunTicket] = []
+        # exponential moving average of the run duration, used for Retry-After
+        self._average_run_seconds: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any limit is set"""
+        return (
+            self.max_concurrent_runs is not None or
+            self.max_concurrent_runs_per_agent is not None
+        )
+
+    @property
+    def queued(self) -> int:
+        """The number of runs waiting for a slot"""
+        return len(self._queue)
+
+    def position(self, ticket: RunTicket) -> int:
+        """The position of a run in the queue (starting at 1), 0 if it is not queued"""
+        with self._lock:
+            try:
+                return self._queue.index(ticket) + 1
+            except ValueError:
+                return 0
+
+    def watch_position(self, ticket: RunTicket) -> Future:
+        """Get a future that is resolved the next time the position of a queued run changes"""
+        with self._lock:
+            if ticket.position_changed is None or ticket.position_changed.done():
+                ticket.position_changed = Future()
+            return ticket.position_changed
+
+    def _agent_semaphore(self, agent_name: str) -> Optional[ThreadSafeSemaphore]:
+        with self._lock:
+            if agent_name not in self._agent_slots:
+                limit = self.max_concurrent_runs_per_agent
+                if isinstance(limit, dict):
+                    limit = limit.get(agent_name)
+                self._agent_slots[agent_name] = (
+                    ThreadSafeSemaphore(limit) if limit is not None else None
+                )
+            return self._agent_slots[agent_name]
+
+    def admit(self, agent_name: str) -> RunTicket:
+        """
+        Admit a run, taking free slots right away if possible. Raises `RunQueueFullException` if
+        the run would have to wait and the queue is full.
+        """
+        ticket = RunTicket(self, agent_name)
+        agent_slots = self._agent_semaphore(agent_name)
+        ticket.agent_slot_acquired = agent_slots is None or agent_slots.try_acquire()
+        # the global slot is only taken once the agent slot is held
+        ticket.global_slot_acquired = self._global_slots is None or (
+            ticket.agent_slot_acquired and self._global_slots.try_acquire()
+        )
+        if ticket.agent_slot_acquired and ticket.global_slot_acquired:
+            ticket.started_at = time.monotonic()
+            return ticket
+
+        with self._lock:
+            full = len(self._queue) >= self.queue_size
+            if not full:
+                self._queue.append(ticket)
+        if full:
+            self._release_slots(ticket)
+            get_metrics().increment("agent_runs_rejected", agent=agent_name)
+            raise RunQueueFullException(agent_name, self.retry_after())
+        return ticket
+
+    async def wait(self, ticket: RunTicket):
+        """Wait until a queued run gets its slots"""
+        if not ticket.queued or ticket.started_at is not None:
+            return
+        queued_at = time.monotonic()
+        deadline = queued_at + self.queue_timeout if self.queue_timeout is not None else None
+        try:
+            if not ticket.agent_slot_acquired:
+                agent_slots = cast(ThreadSafeSemaphore, self._agent_semaphore(ticket.agent_name))
+                ticket.agent_slot_acquired = await agent_slots.acquire(_remaining(deadline))
+            if ticket.agent_slot_acquired and not ticket.global_slot_acquired:
+                global_slots = cast(ThreadSafeSemaphore, self._global_slots)
+                ticket.global_slot_acquired = await global_slots.acquire(_remaining(deadline))
+        finally:
+            self._dequeue(ticket)
+
+        get_metrics().observe(
+            "agent_run_queue_wait_seconds",
+            time.monotonic() - queued_at,
+            agent=ticket.agent_name
+        )
+        if not (ticket.agent_slot_acquired and ticket.global_slot_acquired):
+            self._release_slots(ticket)
+            get_metrics().increment("agent_run_queue_timeouts", agent=ticket.agent_name)
+            raise RunQueueTimeoutException(ticket.agent_name, self.queue_timeout or 0)
+        ticket.started_at = time.monotonic()
+
+    def release(self, ticket: RunTicket):
+        """Release the slots of a run"""
+        if ticket.released:
+            return
+        ticket.released = True
+        self._dequeue(ticket)
+        if ticket.started_at is not None:
+            duration = time.monotonic() - ticket.started_at
+            with self._lock:
+                self._average_run_seconds = (
+                    duration
+                    if self._average_run_seconds is None
+                    else 0.8 * self._average_run_seconds + 0.2 * duration
+                )
+        self._release_slots(ticket)
+
+    def retry_after(self) -> int:
+        """Estimate in seconds when a rejected run should be retried"""
+        with self._lock:
+            average = self._average_run_seconds
+            queued = len(self._queue)
+        if average is None:
+            return DEFAULT_RETRY_AFTER
+        limits = [self.max_concurrent_runs]
+        if isinstance(self.max_concurrent_runs_per_agent, int):
+            limits.append(self.max_concurrent_runs_per_agent)
+        limit = min((value for value in limits if value is not None), default=1)
+        estimate = math.ceil(average * (queued + 1) / max(limit, 1))
+        return min(max(estimate, DEFAULT_RETRY_AFTER), MAX_RETRY_AFTER)
+
+    def _dequeue(self, ticket: RunTicket):
+        with self._lock:
+            try:
+                index = self._queue.index(ticket)
+            except ValueError:
+                return
+            del self._queue[index]
+            # the runs behind it move up
+            moved = [
+                queued.position_changed
+                for queued in self._queue[index:]
+                if queued.position_changed is not None
+            ]
+        for future in moved:
+            try:
+                future.set_result(None)
+            except InvalidStateError:
+                # resolved or cancelled in the meantime
+                pass
+
+    def _release_slots(self, ticket: RunTicket):
+        if ticket.global_slot_acquired and self._global_slots is not None:
+            self._global_slots.release()
+        ticket.global_slot_acquired = False
+        if ticket.agent_slot_acquired:
+            agent_slots = self._agent_semaphore(ticket.agent_name)
+            if agent_slots is not None:
+                agent_slots.release()
+        ticket.agent_slot_acquired = False
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0)
@@ -0,0 +1,163 @@
+"""
+Bounded in-memory cache used by CopilotKit.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar
+from typing_extensions import TypedDict
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class CacheStats(TypedDict):
+    """Cache counters"""
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    entries: int
+    bytes: int
+
+
+def estimate_size(obj: Any) -> int:
+    """
+    Roughly estimate the memory used by an object, including the objects it references.
+
+    Containers, strings and objects with a `__dict__` (e.g. LangChain messages) are followed,
+    shared objects are counted once.
+    """
+    seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        try:
+            size += sys.getsizeof(current)
+        except TypeError:
+            continue
+        if isinstance(current, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif hasattr(current, "__dict__") and not isinstance(current, type):
+            stack.append(current.__dict__)
+    return size
+
+
+class LRUCache(Generic[V]):
+    """
+    Thread safe LRU cache with optional entry limit, time to live and memory budget.
+
+    ```python
+    cache = LRUCache(max_entries=1000, ttl=300, max_bytes=64 * 1024 * 1024)
+    cache.set("thread-1", state)
+    cache.get("thread-1")
+    cache.stats()  # {"hits": 1, "misses": 0, ...}
+    ```
+
+    When `max_bytes` is set, the size of each value is estimated with `size_of` (by default
+    `estimate_size`) when it is stored. Values larger than the whole budget are not cached.
+    """
+
+    def __init__(
+            self,
+            *,
+            max_entries: Optional[int] = None,
+            ttl: Optional[float] = None,
+            max_bytes: Optional[int] = None,
+            size_of: Callable[[Any], int] = estimate_size,
+        ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self._lock = threading.Lock()
+        # key -> (value, expires at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[V, Optional[float], int]]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, *, count: bool = True) -> Any:
+        """Get a value, or `default` if it is not cached or has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self._hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: V, *, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entries if needed"""
+        size = self.size_of(value) if self.max_bytes is not None else 0
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while (
+                (self.max_entries is not None and len(self._entries) > self.max_entries) or
+                (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Remove a value"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all values"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        """Get the cache counters"""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
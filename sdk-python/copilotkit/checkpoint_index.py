@@ -0,0 +1,99 @@
+"""
+Message id index for LangGraph checkpoints, used for time travel when regenerating messages.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_THREADS = 1000
+
+# (config of the checkpoint before the first one containing the message or None if there is
+#  none, config of the first checkpoint containing the message)
+CheckpointEntry = Tuple[Optional[dict], dict]
+
+
+class _ThreadIndex:  # pylint: disable=too-few-public-methods
+    __slots__ = ("messages", "last_checkpoint_id", "last_config")
+
+    def __init__(self):
+        self.messages: Dict[str, CheckpointEntry] = {}
+        self.last_checkpoint_id: Optional[str] = None
+        self.last_config: Optional[dict] = None
+
+
+def _checkpoint_id(config: Optional[dict]) -> Optional[str]:
+    return ((config or {}).get("configurable") or {}).get("checkpoint_id")
+
+
+class MessageCheckpointIndex:
+    """
+    Per thread index from message id to the first checkpoint containing the message.
+
+    The index is updated incrementally: only checkpoints newer than the last indexed checkpoint
+    of a thread are read from the checkpointer. Threads are evicted least recently used first
+    once more than `max_threads` threads are indexed.
+    """
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS):
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, _ThreadIndex]" = OrderedDict()
+
+    def invalidate(self, thread_id: str):
+        """Drop the index of a thread"""
+        self._threads.pop(thread_id, None)
+
+    async def update(self, graph: Any, thread_id: str):
+        """Index the checkpoints added to the thread since the last update"""
+        index = self._threads.get(thread_id)
+        last_checkpoint_id = index.last_checkpoint_id if index is not None else None
+
+        new_snapshots: List[Any] = []
+        found_last_checkpoint = last_checkpoint_id is None
+        # history is ordered from newest to oldest
+        history = graph.aget_state_history({"configurable": {"thread_id": thread_id}})
+        try:
+            async for snapshot in history:
+                checkpoint_id = _checkpoint_id(snapshot.config)
+                if last_checkpoint_id is not None and checkpoint_id == last_checkpoint_id:
+                    found_last_checkpoint = True
+                    break
+                new_snapshots.append(snapshot)
+        finally:
+            # stop reading older checkpoints right away
+            await history.aclose()
+
+        if index is None or not found_last_checkpoint:
+            # the history was rewritten, what we read is the whole history
+            index = _ThreadIndex()
+
+        previous_config = index.last_config
+        for snapshot in reversed(new_snapshots):
+            for message in snapshot.values.get("messages", []):
+                message_id = getattr(message, "id", None)
+                if message_id is not None and message_id not in index.messages:
+                    index.messages[message_id] = (previous_config, snapshot.config)
+            previous_config = snapshot.config
+
+        if new_snapshots:
+            index.last_config = new_snapshots[0].config
+            index.last_checkpoint_id = _checkpoint_id(new_snapshots[0].config)
+
+        self._threads[thread_id] = index
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    async def lookup(self, graph: Any, thread_id: str, message_id: str) -> Optional[CheckpointEntry]:
+        """Find the checkpoints for a message, bringing the thread's index up to date if needed"""
+        index = self._threads.get(thread_id)
+        if index is not None and message_id in index.messages:
+            self._threads.move_to_end(thread_id)
+            return index.messages[message_id]
+
+        await self.update(graph, thread_id)
+        index = self._threads.get(thread_id)
+        return index.messages.get(message_id) if index is not None else None
@@ -0,0 +1,84 @@
+"""
+Concurrency primitives that work across event loops (e.g. the workers of a `WorkerPool`).
+"""
+
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Deque, Optional
+
+
+class ThreadSafeSemaphore:
+    """
+    Semaphore that can be shared by coroutines running on different event loops.
+
+    Waiters are served in FIFO order. Unlike `asyncio.Semaphore`, it is not bound to an event
+    loop.
+    """
+
+    def __init__(self, value: int):
+        if value < 1:
+            raise ValueError("Semaphore value must be at least 1")
+        self.value = value
+        self._available = value
+        self._lock = threading.Lock()
+        self._waiters: Deque[Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        """The number of waiting coroutines"""
+        return len(self._waiters)
+
+    @property
+    def in_use(self) -> int:
+        """The number of acquired slots"""
+        return self.value - self._available
+
+    def try_acquire(self) -> bool:
+        """Acquire a slot if one is available right away"""
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return True
+            return False
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a slot. Returns False if no slot was available within `timeout` seconds.
+        """
+        with self._lock:
+            if self._available > 0 and not self._waiters:
+                self._available -= 1
+                return True
+            waiter: Future = Future()
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(waiter)), timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if not waiter.cancel():
+                # the slot was handed over to us in the meantime
+                if isinstance(exc, asyncio.TimeoutError):
+                    return True
+                self.release()
+            else:
+                with self._lock:
+                    try:
+                        self._waiters.remove(waiter)
+                    except ValueError:
+                        pass
+            if isinstance(exc, asyncio.TimeoutError):
+                return False
+            raise
+
+    def release(self):
+        """Release a slot, handing it over to the next waiter if there is one"""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if waiter.set_running_or_notify_cancel():
+                    waiter.set_result(None)
+                    return
+            self._available += 1
@@ -19,6 +19,7 @@ from crewai.cli.crew_chat import (
 )
 from litellm import completion
 from copilotkit.agent import Agent
+from copilotkit.exc import AgentResyncRequiredException
 from copilotkit.types import Message
 from copilotkit.action import ActionDict
 from copilotkit.protocol import (
@@ -168,6 +169,10 @@ class CrewAIAgent(Agent):
         **kwargs,
     ):
         """Execute the agent"""
+        if kwargs.get("messages_after") is not None:
+            # CrewAI agents need the full message history
+            raise AgentResyncRequiredException(self.name, kwargs["messages_after"])
+
         if self.crew:
             crew = deepcopy(self.crew)
             return self.execute_crew(
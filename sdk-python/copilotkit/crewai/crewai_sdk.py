@@ -472,12 +472,24 @@ async def copilotkit_predict_state(
     return True
 
 
+def _group_by_parent_message_id(messages: List[Any]) -> Dict[Any, List[Any]]:
+    """Index messages by their id and their parent message id, keeping their order"""
+    groups: Dict[Any, List[Any]] = {}
+    for msg in messages:
+        msg_id = msg["id"]
+        parent_id = msg.get("parentMessageId", None)
+        groups.setdefault(msg_id, []).append(msg)
+        if parent_id is not None and parent_id != msg_id:
+            groups.setdefault(parent_id, []).append(msg)
+    return groups
+
 def copilotkit_messages_to_crewai_flow(messages: List[Message]) -> List[Any]:
     """
     Convert CopilotKit messages to CrewAI Flow messages
     """
     result = []
     processed_action_executions = set()
+    tool_call_groups = None
 
     for message in messages:
         message_id = message["id"]
@@ -497,14 +509,11 @@ def copilotkit_messages_to_crewai_flow(messages: List[Message]) -> List[Any]:
 
             processed_action_executions.add(original_message_id)
 
-            all_tool_calls = []
+            if tool_call_groups is None:
+                tool_call_groups = _group_by_parent_message_id(messages)
 
             # Find all tool calls for this message
-            for msg in messages:
-                msg_id = msg["id"]
-                if (msg.get("parentMessageId", None) == original_message_id or
-                    msg_id == original_message_id):
-                    all_tool_calls.append(msg)
+            all_tool_calls = tool_call_groups.get(original_message_id, [])
 
             tool_calls = [
                 {
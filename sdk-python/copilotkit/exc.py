@@ -29,3 +29,79 @@ class AgentExecutionException(Exception):
         self.name = name
         self.error = error
         super().__init__(f"Agent '{name}' failed to execute: {error}")
+
+class AgentResyncRequiredException(Exception):
+    """Exception raised when an agent can not resolve the message history sent by the client."""
+
+    def __init__(self, name: str, message_id: str):
+        self.name = name
+        self.message_id = message_id
+        super().__init__(
+            f"Agent '{name}' can not resolve message '{message_id}', " +
+            "resend the full message history."
+        )
+
+class ActionTimeoutException(Exception):
+    """Exception raised when an action does not finish within its timeout."""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        super().__init__(f"Action '{name}' timed out after {timeout} seconds.")
+
+class RunQueueFullException(Exception):
+    """Exception raised when an agent run is rejected because the run queue is full."""
+
+    def __init__(self, name: str, retry_after: int):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(
+            f"Too many runs of agent '{name}', retry after {retry_after} seconds."
+        )
+
+class RunQueueTimeoutException(Exception):
+    """Exception raised when a queued agent run does not start within the queue timeout."""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        super().__init__(f"Run of agent '{name}' did not start within {timeout} seconds.")
+
+class ThreadBusyException(Exception):
+    """Exception raised when an agent is already running on a thread."""
+
+    def __init__(self, name: str, thread_id: str):
+        self.name = name
+        self.thread_id = thread_id
+        super().__init__(f"Agent '{name}' is already running on thread '{thread_id}'.")
+
+class IdempotencyKeyConflictException(Exception):
+    """Exception raised when an idempotency key is reused for a run on another thread."""
+
+    def __init__(self, name: str, idempotency_key: str, thread_id: str):
+        self.name = name
+        self.idempotency_key = idempotency_key
+        self.thread_id = thread_id
+        super().__init__(
+            f"Idempotency key '{idempotency_key}' is already used by a run of agent '{name}' " +
+            f"on thread '{thread_id}'."
+        )
+
+class RunNotFoundException(Exception):
+    """Exception raised when an agent run is not found, or no longer retained."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        super().__init__(f"Run '{run_id}' not found.")
+
+class RunEventsExpiredException(Exception):
+    """Exception raised when the events requested from a run are no longer buffered."""
+
+    def __init__(self, run_id: str, after: int, first_seq: int):
+        self.run_id = run_id
+        self.after = after
+        self.first_seq = first_seq
+        super().__init__(
+            f"Events of run '{run_id}' after {after} are no longer available, " +
+            f"the oldest buffered event is {first_seq}."
+        )
@@ -0,0 +1,158 @@
+"""
+Length-prefixed framing of binary event streams.
+
+In the `msgpack` event format, every event is sent as a frame: a 4-byte big-endian unsigned
+length, followed by that many bytes of MessagePack. Decoding a frame gives the same object as
+parsing the corresponding line of the JSON event format with `json.loads`, except for integers
+larger than 64 bit, which MessagePack can't represent: they are sent as decimal strings.
+
+`FrameDecoder` is the reference decoder:
+
+```python
+decoder = FrameDecoder()
+async for data in response.aiter_bytes():
+    for event in decoder.feed(data):
+        handle(event)
+decoder.close()  # raises ValueError if the stream ended in the middle of a frame
+```
+
+Encoding and decoding use `ormsgpack` if it is installed, `msgpack` otherwise.
+"""
+
+import struct
+from typing import Any, Callable, List, Optional
+
+try:
+    import ormsgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    ormsgpack = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPE = "application/vnd.msgpack"
+# media types accepted for the msgpack event format
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/msgpack", "application/x-msgpack")
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 2 ** 32 - 1
+
+
+def msgpack_available() -> bool:
+    """Whether a MessagePack library is installed"""
+    return ormsgpack is not None or msgpack is not None
+
+
+def packb(obj: Any, default: Callable[[Any], Any]) -> bytes:
+    """
+    Pack an object with MessagePack. `default` is called for every object that is not a
+    dict, list, tuple, str, int, float, bool or None, like `json.dumps` does.
+
+    Integers larger than 64 bit are passed to `default` too (with `msgpack`, they raise
+    `OverflowError`). Raises `TypeError` if the object can not be packed, e.g. because of
+    non-string keys.
+    """
+    if ormsgpack is not None:
+        # let `default` handle the types json does not serialize natively either
+        return ormsgpack.packb(
+            obj,
+            default=default,
+            option=(
+                ormsgpack.OPT_PASSTHROUGH_DATACLASS |
+                ormsgpack.OPT_PASSTHROUGH_DATETIME |
+                ormsgpack.OPT_PASSTHROUGH_ENUM |
+                ormsgpack.OPT_PASSTHROUGH_UUID |
+                ormsgpack.OPT_PASSTHROUGH_BIG_INT
+            )
+        )
+    if msgpack is not None:
+        return msgpack.packb(obj, default=default)
+    raise ImportError("No MessagePack library is installed, run `pip install ormsgpack`")
+
+
+def unpackb(data: bytes) -> Any:
+    """Unpack a MessagePack payload"""
+    if ormsgpack is not None:
+        return ormsgpack.unpackb(data, option=ormsgpack.OPT_NON_STR_KEYS)
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    raise ImportError("No MessagePack library is installed, run `pip install ormsgpack`")
+
+
+def frame(payload: bytes) -> bytes:
+    """Prefix a payload with its length"""
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {len(payload)} bytes is too large")
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def count_frames(data: bytes) -> int:
+    """The number of complete frames in a chunk"""
+    count = 0
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size + length
+        if offset > len(data):
+            break
+        count += 1
+    return count
+
+
+def skip_frames(data: bytes, count: int) -> bytes:
+    """Drop the first `count` frames of a chunk"""
+    offset = 0
+    for _ in range(count):
+        if offset + FRAME_HEADER.size > len(data):
+            return data[:0]
+        (length,) = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size + length
+    return data[offset:]
+
+
+class FrameDecoder:
+    """
+    Incremental decoder of a framed MessagePack event stream.
+
+    Feed it the bytes as they arrive, in chunks of any size, and it returns the events of the
+    frames that are complete.
+    """
+
+    def __init__(self, *, max_frame_size: Optional[int] = None):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Add received bytes, returns the decoded events of all completed frames"""
+        self._buffer += data
+        events = []
+        offset = 0
+        buffer = self._buffer
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(buffer, offset)
+            if self.max_frame_size is not None and length > self.max_frame_size:
+                raise ValueError(
+                    f"Frame of {length} bytes exceeds the maximum of {self.max_frame_size}"
+                )
+            end = offset + FRAME_HEADER.size + length
+            if end > len(buffer):
+                break
+            events.append(unpackb(bytes(buffer[offset + FRAME_HEADER.size:end])))
+            offset = end
+        del buffer[:offset]
+        return events
+
+    def close(self):
+        """Raise `ValueError` if the stream ended in the middle of a frame"""
+        if self._buffer:
+            raise ValueError(f"Stream ended with {len(self._buffer)} bytes of an incomplete frame")
+
+
+def decode_frames(data: bytes) -> List[Any]:
+    """Decode a complete framed MessagePack event stream"""
+    decoder = FrameDecoder()
+    events = decoder.feed(data)
+    decoder.close()
+    return events
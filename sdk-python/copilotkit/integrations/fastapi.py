@@ -1,28 +1,97 @@
 """FastAPI integration"""
 
 import logging
-import asyncio
 import re
 import uuid
-import warnings
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Any, cast, Optional
+from typing import List, Any, cast, Optional, Callable
+import anyio
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse
+from fastapi.responses import JSONResponse, StreamingResponse, HTMLResponse, Response
 from fastapi.encoders import jsonable_encoder
-from ..sdk import CopilotKitRemoteEndpoint, CopilotKitContext
-from ..types import Message, MetaEvent
+from starlette.requests import ClientDisconnect
+from ..sdk import CopilotKitRemoteEndpoint, CopilotKitContext, ActionBatchItemDict
+from ..types import Message, MetaEvent, EventFilter
 from ..exc import (
     ActionNotFoundException,
     ActionExecutionException,
+    ActionTimeoutException,
     AgentNotFoundException,
-    AgentExecutionException,
+    AgentResyncRequiredException,
+    RunQueueFullException,
+    ThreadBusyException,
+    IdempotencyKeyConflictException,
+    RunNotFoundException,
+    RunEventsExpiredException,
 )
 from ..action import ActionDict
-from ..html import generate_info_html
+from ..streaming import (
+    prime_stream,
+    number_events,
+    drop_numbers,
+    format_server_sent_events,
+    negotiate_media_type,
+    negotiate_stream_encoding,
+    compress_stream,
+    EventFilterMatcher,
+)
+from ..runs import AgentRun
+from ..framing import MSGPACK_MEDIA_TYPE, MSGPACK_MEDIA_TYPES, msgpack_available
+from ..worker_pool import WorkerPool
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
+RUN_ID_HEADER = "X-CopilotKit-Run-Id"
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+LAST_EVENT_ID_HEADER = "Last-Event-ID"
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+
+class AgentStreamingResponse(StreamingResponse):
+    """
+    Streaming response that stops streaming as soon as the client disconnects, and closes its
+    stream when sending stops for any reason, so that the agent run is cancelled right away.
+
+    A single task per response listens for the disconnect while the events are streamed, for
+    every ASGI spec version (Starlette stops listening from version 2.4 on). With
+    `cancel_on_disconnect = False`, the disconnect is only noticed when sending fails.
+    """
+
+    cancel_on_disconnect = True
+    on_disconnect: Optional[Callable[[], None]] = None
+
+    async def __call__(self, scope, receive, send):
+        try:
+            if not self.cancel_on_disconnect:
+                await super().__call__(scope, receive, send)
+                return
+            await self._stream_until_disconnect(receive, send)
+            if self.background is not None:
+                await self.background()
+        finally:
+            if hasattr(self.body_iterator, "aclose"):
+                await cast(Any, self.body_iterator).aclose()
+
+    async def _stream_until_disconnect(self, receive, send):
+        send_error: Optional[BaseException] = None
+        async with anyio.create_task_group() as task_group:
+
+            async def watch_for_disconnect():
+                await self.listen_for_disconnect(receive)
+                if self.on_disconnect is not None:
+                    self.on_disconnect()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(watch_for_disconnect)
+            try:
+                await self.stream_response(send)
+            except OSError:
+                send_error = ClientDisconnect()
+            except Exception as exc: # pylint: disable=broad-except
+                # raised outside of the task group, so that it is not wrapped in a group
+                send_error = exc
+            task_group.cancel_scope.cancel()
+        if send_error is not None:
+            raise send_error
+
 def add_fastapi_endpoint(
         fastapi_app: FastAPI,
         sdk: CopilotKitRemoteEndpoint,
@@ -30,29 +99,60 @@ def add_fastapi_endpoint(
         *,
         use_thread_pool: bool = False,
         max_workers: int = 10,
+        cancel_on_client_disconnect: bool = True,
+        compress_streams: bool = True,
     ):
-    """Add FastAPI endpoint with configurable ThreadPoolExecutor size"""
-    if use_thread_pool:
-        warnings.warn(
-            "The 'use_thread_pool' parameter is deprecated " + 
-            "and will be removed in a future version.",
-            DeprecationWarning
-        )
-
-    def run_handler_in_thread(request: Request, sdk: CopilotKitRemoteEndpoint):
-        # Run the handler coroutine in the event loop
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(handler(request, sdk))
+    """
+    Add FastAPI endpoint
+
+    With `use_thread_pool=True`, requests are handled on a shared pool of `max_workers` worker
+    threads, each running its own event loop, so that sync or CPU heavy agents and actions don't
+    block the server's event loop. Streamed responses keep running on their worker and are
+    bridged back to the server event by event. The pool is shut down with the app.
+
+    With `cancel_on_client_disconnect=True`, agent runs are cancelled as soon as the client
+    disconnects. Resumable runs (see `resumable_runs`) keep running for their linger timeout
+    instead, so that the client can attach again.
+
+    Resumable runs return their id in the `X-CopilotKit-Run-Id` header. To resume, send
+    `GET {prefix}/runs/{run_id}?after={n}` (or POST with `{"after": n}`), where `n` is the number
+    of events (lines) already received. A run request repeated by the same caller with the same
+    `Idempotency-Key` header attaches to the existing run from the start. Reusing the key for
+    another thread is answered with 409 Conflict.
+
+    Agent responses are streamed as newline delimited JSON, or as server-sent events (with the
+    sequence number of each event as its id) if the request accepts `text/event-stream`. For
+    server-to-server use, requests that accept `application/vnd.msgpack` get length-prefixed
+    MessagePack frames instead (requires `ormsgpack` or `msgpack`, see `copilotkit.framing`). With
+    `compress_streams=True`, they are compressed with gzip or deflate if the request accepts it.
+    """
+    pool = WorkerPool(max_workers=max_workers) if use_thread_pool else None
 
     async def make_handler(request: Request):
-        if use_thread_pool:
-            executor = ThreadPoolExecutor(max_workers=max_workers)
-            loop = asyncio.get_event_loop()
-            future = loop.run_in_executor(executor, run_handler_in_thread, request, sdk)
-            return await future
-        return await handler(request, sdk)
-
+        if pool is not None:
+            # the body has to be read on the server's event loop
+            await request.body()
+
+            async def run_on_worker():
+                response = await handler(request, sdk)
+                if compress_streams:
+                    # compress on the worker
+                    _compress_response(response, request.headers.get("accept-encoding"))
+                if isinstance(response, StreamingResponse):
+                    response.body_iterator = pool.bridge(response.body_iterator)
+                return response
+
+            response = await pool.run(run_on_worker)
+        else:
+            response = await handler(request, sdk)
+            if compress_streams:
+                _compress_response(response, request.headers.get("accept-encoding"))
+        if isinstance(response, AgentStreamingResponse):
+            response.cancel_on_disconnect = cancel_on_client_disconnect
+        return response
+
+    if pool is not None:
+        fastapi_app.add_event_handler("shutdown", pool.shutdown)
 
     # Ensure the prefix starts with a slash and remove trailing slashes
     normalized_prefix = '/' + prefix.strip('/')
@@ -63,6 +163,36 @@ def add_fastapi_endpoint(
         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
     )
 
+def _compress_response(response: Any, accept_encoding: Optional[str]):
+    """Compress a streamed agent response if the client accepts it"""
+    if not isinstance(response, AgentStreamingResponse):
+        return
+    response.headers.append("Vary", "Accept-Encoding")
+    encoding = negotiate_stream_encoding(accept_encoding)
+    if encoding is None or "content-encoding" in response.headers:
+        return
+    response.body_iterator = compress_stream(response.body_iterator, encoding)
+    response.headers["Content-Encoding"] = encoding
+
+def _negotiate_media_type(headers: Any) -> str:
+    """Pick the media type of a streamed agent response from the `Accept` header"""
+    offers = [
+        *(MSGPACK_MEDIA_TYPES if msgpack_available() else ()),
+        EVENT_STREAM_MEDIA_TYPE,
+        "application/json",
+    ]
+    media_type = negotiate_media_type((headers or {}).get("accept"), offers)
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return MSGPACK_MEDIA_TYPE
+    return media_type or "application/json"
+
+def _last_event_id(headers: Any) -> Optional[int]:
+    try:
+        last_event_id = int((headers or {}).get(LAST_EVENT_ID_HEADER, ""))
+    except ValueError:
+        return None
+    return last_event_id if last_event_id >= 0 else None
+
 def body_get_or_raise(body: Any, key: str):
     """Get value from body or raise an error"""
     value = body.get(key)
@@ -96,7 +226,7 @@ async def handler(request: Request, sdk: CopilotKitRemoteEndpoint):
         return await handle_info(
             sdk=sdk,
             context=context,
-            as_html='text/html' in accept_header,
+            as_html=negotiate_media_type(accept_header, ['text/html']) is not None,
         )
 
     # handle /agent/name request for executing an agent
@@ -111,8 +241,11 @@ async def handler(request: Request, sdk: CopilotKitRemoteEndpoint):
 
         # used for LangGraph only
         node_name = body.get("nodeName")
+        event_filter = cast(Optional[EventFilter], body.get("eventFilter"))
+        last_message_id = body.get("lastMessageId")
+        messages_after = body.get("messagesAfter")
 
-        return handle_execute_agent(
+        return await handle_execute_agent_async(
             sdk=sdk,
             context=context,
             thread_id=thread_id,
@@ -121,6 +254,10 @@ async def handler(request: Request, sdk: CopilotKitRemoteEndpoint):
             state=state,
             messages=messages,
             actions=actions,
+            event_filter=event_filter,
+            last_message_id=last_message_id,
+            messages_after=messages_after,
+            idempotency_key=request.headers.get(IDEMPOTENCY_KEY_HEADER),
         )
 
     # handle /agent/name/state request for getting agent state
@@ -135,6 +272,30 @@ async def handler(request: Request, sdk: CopilotKitRemoteEndpoint):
             name=name,
         )
 
+    # handle /runs/id request for attaching to a resumable agent run
+    if method in ['GET', 'POST'] and (match := re.match(r'runs/([a-zA-Z0-9_-]+)$', path)):
+        run_id = match.group(1)
+        after = (
+            (body or {}).get("after")
+            if method == 'POST'
+            else request.query_params.get("after")
+        )
+        if after is None:
+            after = _last_event_id(request.headers) or 0
+        try:
+            after = int(after)
+        except (TypeError, ValueError):
+            after = -1
+        if after < 0:
+            raise HTTPException(status_code=400, detail="after must be a non-negative integer")
+
+        return await handle_attach_agent_run(
+            sdk=sdk,
+            run_id=run_id,
+            after=after,
+            media_type=_negotiate_media_type(request.headers),
+        )
+
     # handle /action/name request for executing an action
     if method == 'POST' and (match := re.match(r'action/([a-zA-Z0-9_-]+)', path)):
         name = match.group(1)
@@ -147,6 +308,26 @@ async def handler(request: Request, sdk: CopilotKitRemoteEndpoint):
             arguments=arguments,
         )
 
+    # handle /actions/batch request for executing several actions
+    if method == 'POST' and path == 'actions/batch':
+        actions = body_get_or_raise(body, "actions")
+        if not isinstance(actions, list) or not all(isinstance(item, dict) for item in actions):
+            raise HTTPException(status_code=400, detail="actions must be a list of objects")
+        max_concurrency = body.get("maxConcurrency")
+        if max_concurrency is not None and (
+            not isinstance(max_concurrency, int) or
+            isinstance(max_concurrency, bool) or
+            max_concurrency < 1
+        ):
+            raise HTTPException(status_code=400, detail="maxConcurrency must be a positive integer")
+
+        return await handle_execute_actions(
+            sdk=sdk,
+            context=context,
+            actions=actions,
+            max_concurrency=max_concurrency,
+        )
+
     # v2: POST /agents/name/state
 
     # Deal with backwards compatibility
@@ -201,8 +382,11 @@ async def handler_v1(
         messages = body_get_or_raise(body, "messages")
         actions = cast(List[ActionDict], body.get("actions", []))
         meta_events = cast(List[MetaEvent], body.get("metaEvents", []))
+        event_filter = cast(Optional[EventFilter], body.get("eventFilter"))
+        last_message_id = body.get("lastMessageId")
+        messages_after = body.get("messagesAfter")
 
-        return handle_execute_agent(
+        return await handle_execute_agent_async(
             sdk=sdk,
             context=context,
             thread_id=thread_id,
@@ -213,6 +397,10 @@ async def handler_v1(
             messages=messages,
             actions=actions,
             meta_events=meta_events,
+            event_filter=event_filter,
+            last_message_id=last_message_id,
+            messages_after=messages_after,
+            idempotency_key=context["headers"].get(IDEMPOTENCY_KEY_HEADER),
         )
 
 
@@ -237,10 +425,29 @@ async def handle_info(
         as_html: bool = False,
     ):
     """Handle info request with FastAPI"""
-    result = sdk.info(context=context)
+    payload = sdk.info_payload(context=context)
+    etag = payload.html_etag if as_html else payload.etag
+    if _etag_matches(context["headers"].get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
     if as_html:
-        return HTMLResponse(content=generate_info_html(result))
-    return JSONResponse(content=jsonable_encoder(result))
+        return HTMLResponse(content=payload.html, headers={"ETag": etag})
+    return Response(
+        content=payload.body,
+        media_type="application/json",
+        headers={"ETag": etag}
+    )
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
 
 async def handle_execute_action(
         *,
@@ -263,10 +470,39 @@ async def handle_execute_action(
     except ActionExecutionException as exc:
         logger.error("Action execution error: %s", exc)
         return JSONResponse(content={"error": str(exc)}, status_code=500)
+    except ActionTimeoutException as exc:
+        logger.error("Action timeout: %s", exc)
+        return JSONResponse(
+            content={
+                "error": str(exc),
+                "code": "action_timeout",
+                "timeout": exc.timeout,
+            },
+            status_code=504
+        )
     except Exception as exc: # pylint: disable=broad-except
         logger.error("Action execution error: %s", exc)
         return JSONResponse(content={"error": str(exc)}, status_code=500)
 
+async def handle_execute_actions(
+        *,
+        sdk: CopilotKitRemoteEndpoint,
+        context: CopilotKitContext,
+        actions: List[ActionBatchItemDict],
+        max_concurrency: Optional[int] = None,
+    ):
+    """Handle execute actions (batch) request with FastAPI"""
+    try:
+        results = await sdk.execute_actions(
+            context=context,
+            actions=actions,
+            max_concurrency=max_concurrency,
+        )
+        return JSONResponse(content=jsonable_encoder({"results": results}))
+    except Exception as exc: # pylint: disable=broad-except
+        logger.error("Actions execution error: %s", exc)
+        return JSONResponse(content={"error": str(exc)}, status_code=500)
+
 def handle_execute_agent( # pylint: disable=too-many-arguments
         *,
         sdk: CopilotKitRemoteEndpoint,
@@ -279,8 +515,147 @@ def handle_execute_agent( # pylint: disable=too-many-arguments
         actions: List[ActionDict],
         node_name: str,
         meta_events: Optional[List[MetaEvent]] = None,
+        event_filter: Optional[EventFilter] = None,
+        last_message_id: Optional[str] = None,
+        messages_after: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
     ):
-    """Handle continue agent execution request with FastAPI"""
+    """
+    Handle continue agent execution request with FastAPI
+
+    Errors raised once the agent has started (e.g. `AgentResyncRequiredException`) end the
+    stream instead of getting a status code. Use `handle_execute_agent_async` to get one.
+    """
+    try:
+        prepared = _prepare_agent_execution(
+            sdk=sdk,
+            context=context,
+            thread_id=thread_id,
+            name=name,
+            state=state,
+            config=config,
+            messages=messages,
+            actions=actions,
+            node_name=node_name,
+            meta_events=meta_events,
+            event_filter=event_filter,
+            last_message_id=last_message_id,
+            messages_after=messages_after,
+            idempotency_key=idempotency_key,
+        )
+        if isinstance(prepared, Response):
+            return prepared
+        return _agent_execution_response(prepared, sdk=sdk)
+    except Exception as exc: # pylint: disable=broad-except
+        return _agent_error_response(exc)
+
+async def handle_execute_agent_async( # pylint: disable=too-many-arguments
+        *,
+        sdk: CopilotKitRemoteEndpoint,
+        context: CopilotKitContext,
+        thread_id: str,
+        name: str,
+        state: dict,
+        config: Optional[dict] = None,
+        messages: List[Message],
+        actions: List[ActionDict],
+        node_name: str,
+        meta_events: Optional[List[MetaEvent]] = None,
+        event_filter: Optional[EventFilter] = None,
+        last_message_id: Optional[str] = None,
+        messages_after: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ):
+    """
+    Handle continue agent execution request with FastAPI, waiting for the first event so that
+    errors raised before streaming starts get a status code
+    """
+    try:
+        prepared = _prepare_agent_execution(
+            sdk=sdk,
+            context=context,
+            thread_id=thread_id,
+            name=name,
+            state=state,
+            config=config,
+            messages=messages,
+            actions=actions,
+            node_name=node_name,
+            meta_events=meta_events,
+            event_filter=event_filter,
+            last_message_id=last_message_id,
+            messages_after=messages_after,
+            idempotency_key=idempotency_key,
+        )
+        if isinstance(prepared, Response):
+            return prepared
+        try:
+            prepared.events = await prime_stream(prepared.events)
+        except Exception as exc:
+            _fail_agent_run(sdk, prepared.run, exc)
+            raise
+        return _agent_execution_response(prepared, sdk=sdk)
+    except Exception as exc: # pylint: disable=broad-except
+        return _agent_error_response(exc)
+
+class _AgentExecution:
+    """An agent execution that has not been turned into a response yet"""
+
+    def __init__(
+            self,
+            *,
+            events: Any,
+            run: Optional[AgentRun],
+            media_type: str,
+            name: str,
+            thread_id: str,
+        ):
+        self.events = events
+        self.run = run
+        self.media_type = media_type
+        self.name = name
+        self.thread_id = thread_id
+
+def _prepare_agent_execution( # pylint: disable=too-many-arguments
+        *,
+        sdk: CopilotKitRemoteEndpoint,
+        context: CopilotKitContext,
+        thread_id: str,
+        name: str,
+        state: dict,
+        config: Optional[dict] = None,
+        messages: List[Message],
+        actions: List[ActionDict],
+        node_name: str,
+        meta_events: Optional[List[MetaEvent]] = None,
+        event_filter: Optional[EventFilter] = None,
+        last_message_id: Optional[str] = None,
+        messages_after: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Any:
+    """Start an agent execution, or return a response if it can't or doesn't need to start"""
+    invalid_event_filter = _event_filter_error_response(event_filter)
+    if invalid_event_filter is not None:
+        return invalid_event_filter
+    media_type = _negotiate_media_type(context["headers"])
+    event_format = "msgpack" if media_type == MSGPACK_MEDIA_TYPE else "json"
+    run: Optional[AgentRun] = None
+    if sdk.runs is not None:
+        run, created = sdk.runs.create(
+            agent_name=name,
+            thread_id=thread_id,
+            idempotency_key=idempotency_key,
+            context=context,
+            event_format=event_format,
+        )
+        if not created:
+            logger.info("Attaching repeated request to run %s", run.run_id)
+            return _agent_run_response(
+                run,
+                after=_last_event_id(context["headers"]) or 0,
+                media_type=media_type,
+            )
+
     try:
         events = sdk.execute_agent(
             context=context,
@@ -292,17 +667,208 @@ def handle_execute_agent( # pylint: disable=too-many-arguments
             messages=messages,
             actions=actions,
             meta_events=meta_events,
+            event_filter=event_filter,
+            last_message_id=last_message_id,
+            messages_after=messages_after,
+            event_format=event_format,
         )
-        return StreamingResponse(events, media_type="application/json")
-    except AgentNotFoundException as exc:
+    except Exception as exc:
+        _fail_agent_run(sdk, run, exc)
+        raise
+    return _AgentExecution(
+        events=events,
+        run=run,
+        media_type=media_type,
+        name=name,
+        thread_id=thread_id,
+    )
+
+def _fail_agent_run(sdk: CopilotKitRemoteEndpoint, run: Optional[AgentRun], exc: Exception):
+    if run is not None:
+        # requests that attached in the meantime get the error
+        run.fail(exc)
+        cast(Any, sdk.runs).discard(run)
+
+def _agent_execution_response(
+        execution: _AgentExecution,
+        *,
+        sdk: CopilotKitRemoteEndpoint,
+    ) -> AgentStreamingResponse:
+    """Stream the events of an agent execution, recording them first if the run is resumable"""
+    if execution.run is not None:
+        try:
+            execution.run.start(execution.events)
+        except Exception as exc:
+            _fail_agent_run(sdk, execution.run, exc)
+            raise
+        return _agent_run_response(
+            execution.run,
+            after=0,
+            media_type=execution.media_type,
+        )
+
+    events = execution.events
+    if execution.media_type == EVENT_STREAM_MEDIA_TYPE:
+        events = format_server_sent_events(number_events(events))
+    return _agent_stream_response(
+        events,
+        media_type=execution.media_type,
+        on_disconnect=lambda: logger.info(
+            "Client disconnected, cancelling agent '%s' on thread %s",
+            execution.name,
+            execution.thread_id
+        )
+    )
+
+def _agent_error_response(exc: Exception) -> JSONResponse:
+    """Turn an error raised while starting an agent execution into a response"""
+    if isinstance(exc, AgentNotFoundException):
         logger.error("Agent not found: %s", exc, exc_info=True)
         return JSONResponse(content={"error": str(exc)}, status_code=404)
-    except AgentExecutionException as exc:
-        logger.error("Agent execution error: %s", exc, exc_info=True)
-        return JSONResponse(content={"error": str(exc)}, status_code=500)
-    except Exception as exc: # pylint: disable=broad-except
-        logger.error("Agent execution error: %s", exc, exc_info=True)
-        return JSONResponse(content={"error": str(exc)}, status_code=500)
+    if isinstance(exc, AgentResyncRequiredException):
+        logger.info("Agent resync required: %s", exc)
+        return JSONResponse(
+            content={
+                "error": str(exc),
+                "code": "resync_required",
+                "messageId": exc.message_id,
+            },
+            status_code=409
+        )
+    if isinstance(exc, RunEventsExpiredException):
+        logger.info("Run events expired: %s", exc)
+        return _events_expired_response(exc)
+    if isinstance(exc, ThreadBusyException):
+        logger.warning("Agent run rejected: %s", exc)
+        return JSONResponse(
+            content={
+                "error": str(exc),
+                "code": "thread_busy",
+                "threadId": exc.thread_id,
+            },
+            status_code=409
+        )
+    if isinstance(exc, IdempotencyKeyConflictException):
+        logger.warning("Agent run rejected: %s", exc)
+        return JSONResponse(
+            content={
+                "error": str(exc),
+                "code": "idempotency_key_conflict",
+                "threadId": exc.thread_id,
+            },
+            status_code=409
+        )
+    if isinstance(exc, RunQueueFullException):
+        logger.warning("Agent run rejected: %s", exc)
+        return JSONResponse(
+            content={
+                "error": str(exc),
+                "code": "run_queue_full",
+                "retryAfter": exc.retry_after,
+            },
+            status_code=429,
+            headers={"Retry-After": str(exc.retry_after)}
+        )
+    logger.error("Agent execution error: %s", exc, exc_info=True)
+    return JSONResponse(content={"error": str(exc)}, status_code=500)
+
+def _event_filter_error_response(event_filter: Any) -> Optional[JSONResponse]:
+    """Reject a malformed event filter sent by the client with a 400 response"""
+    if event_filter is None:
+        return None
+    try:
+        EventFilterMatcher(event_filter)
+    except ValueError as exc:
+        logger.info("Invalid event filter: %s", exc)
+        return JSONResponse(
+            content={"error": str(exc), "code": "invalid_event_filter"},
+            status_code=400
+        )
+    return None
+
+def _agent_stream_response(
+        events: Any,
+        *,
+        media_type: str,
+        on_disconnect: Optional[Callable[[], None]] = None,
+        headers: Optional[dict] = None,
+    ) -> AgentStreamingResponse:
+    """Stream agent events as newline delimited JSON, server-sent events or MessagePack frames"""
+    if media_type == EVENT_STREAM_MEDIA_TYPE:
+        headers = {
+            "Cache-Control": "no-cache",
+            # don't let proxies buffer the stream
+            "X-Accel-Buffering": "no",
+            **(headers or {}),
+        }
+    response = AgentStreamingResponse(events, media_type=media_type, headers=headers)
+    response.on_disconnect = on_disconnect
+    return response
+
+def _agent_run_response(
+        run: AgentRun,
+        *,
+        after: int,
+        media_type: str = "application/json",
+    ) -> AgentStreamingResponse:
+    """
+    Stream the events of a resumable run after `after`. Events recorded as MessagePack are
+    always streamed as MessagePack, events recorded as JSON never are.
+    """
+    run.check(after)
+    if run.event_format == "msgpack":
+        media_type = MSGPACK_MEDIA_TYPE
+    elif media_type == MSGPACK_MEDIA_TYPE:
+        media_type = "application/json"
+    events = run.stream(after)
+    return _agent_stream_response(
+        (
+            format_server_sent_events(events)
+            if media_type == EVENT_STREAM_MEDIA_TYPE
+            else drop_numbers(events)
+        ),
+        media_type=media_type,
+        # only stops streaming, the run keeps going so that the client can attach again
+        on_disconnect=lambda: logger.info(
+            "Client disconnected from run %s of agent '%s'", run.run_id, run.agent_name
+        ),
+        headers={RUN_ID_HEADER: run.run_id},
+    )
+
+def _events_expired_response(exc: RunEventsExpiredException) -> JSONResponse:
+    return JSONResponse(
+        content={
+            "error": str(exc),
+            "code": "events_expired",
+            "firstSeq": exc.first_seq,
+        },
+        status_code=410
+    )
+
+async def handle_attach_agent_run(
+        *,
+        sdk: CopilotKitRemoteEndpoint,
+        run_id: str,
+        after: int = 0,
+        media_type: str = "application/json",
+    ):
+    """Handle attach to agent run request with FastAPI"""
+    try:
+        run = sdk.get_agent_run(run_id=run_id)
+        return _agent_run_response(
+            run,
+            after=after,
+            media_type=media_type,
+        )
+    except RunNotFoundException as exc:
+        logger.info("Run not found: %s", exc)
+        return JSONResponse(
+            content={"error": str(exc), "code": "run_not_found"},
+            status_code=404
+        )
+    except RunEventsExpiredException as exc:
+        logger.info("Run events expired: %s", exc)
+        return _events_expired_response(exc)
 
 async def handle_get_agent_state(
         *,
@@ -0,0 +1,59 @@
+"""
+Minimal JSON Patch (RFC 6902) generation for CopilotKit state sync deltas.
+"""
+
+from typing import Any, List
+from typing_extensions import TypedDict, NotRequired, Literal
+
+class JSONPatchOperation(TypedDict):
+    """A single JSON Patch operation"""
+    op: Literal["add", "remove", "replace"]
+    path: str
+    value: NotRequired[Any]
+
+def make_json_patch(old: Any, new: Any) -> List[JSONPatchOperation]:
+    """
+    Compute the JSON Patch that transforms `old` into `new`.
+
+    Both values must be JSON-compatible (dicts, lists, strings, numbers, booleans and None).
+    Dicts are diffed key by key, lists element by element (appends and truncations become
+    add/remove operations) and everything else is replaced wholesale.
+    """
+    operations: List[JSONPatchOperation] = []
+    _diff(old, new, "", operations)
+    return operations
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+def _same(old: Any, new: Any) -> bool:
+    # 1 == True in Python, but not in JSON
+    return type(old) is type(new) and old == new
+
+def _diff(old: Any, new: Any, path: str, operations: List[JSONPatchOperation]):
+    if _same(old, new):
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            if key not in old:
+                operations.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+            else:
+                _diff(old[key], value, f"{path}/{_escape(key)}", operations)
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for index in range(common):
+            _diff(old[index], new[index], f"{path}/{index}", operations)
+        for index in range(common, len(new)):
+            operations.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+        # remove from the end so that indices stay valid while applying the patch
+        for index in range(len(old) - 1, common - 1, -1):
+            operations.append({"op": "remove", "path": f"{path}/{index}"})
+        return
+
+    operations.append({"op": "replace", "path": path, "value": new})
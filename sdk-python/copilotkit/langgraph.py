@@ -43,9 +43,20 @@ def copilotkit_messages_to_langchain(
     """
     Convert CopilotKit messages to LangChain messages
     """
+    def _group_tool_calls(messages: List[Any]) -> Dict[Any, List[Any]]:
+        # messages by their id and by their parent message id, in order
+        groups: Dict[Any, List[Any]] = {}
+        for msg in messages:
+            parent_id = msg.get("parentMessageId", None)
+            groups.setdefault(msg["id"], []).append(msg)
+            if parent_id is not None and parent_id != msg["id"]:
+                groups.setdefault(parent_id, []).append(msg)
+        return groups
+
     def _copilotkit_messages_to_langchain(messages: List[Message]) -> List[BaseMessage]:
         result = []
         processed_action_executions = set()
+        tool_call_groups = None
         for message in cast(Any, messages):
             if message["type"] == "TextMessage":
                 if message["role"] == "user":
@@ -77,12 +88,11 @@ def copilotkit_messages_to_langchain(
 
                     processed_action_executions.add(message_id)
 
-                    all_tool_calls = []
+                    if tool_call_groups is None:
+                        tool_call_groups = _group_tool_calls(cast(Any, messages))
 
                     # Find all tool calls for this message
-                    for msg in messages:
-                        if msg.get("parentMessageId", None) == message_id or msg["id"] == message_id:
-                            all_tool_calls.append(msg)
+                    all_tool_calls = tool_call_groups.get(message_id, [])
 
                     tool_calls = [{
                         "name": t["name"],
@@ -2,28 +2,47 @@
 
 import uuid
 import json
-from typing import Optional, List, Callable, Any, cast, Union, TypedDict, Literal
+import asyncio
+import weakref
+from typing import (
+    Optional, List, Callable, Any, cast, Union, TypedDict, Literal, Set, Iterable, AbstractSet
+)
 
 from langgraph.graph.state import CompiledStateGraph
 from typing_extensions import NotRequired
 
 from langgraph.types import Command
-from langchain.load.dump import dumps as langchain_dumps
 from langchain.schema import BaseMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig, ensure_config
-from langchain_core.messages import HumanMessage
-
-from partialjson.json_parser import JSONParser
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 from .types import Message, MetaEvent
 from .utils import filter_by_schema_keys
+from .json_patch import make_json_patch
+from .partial_json import IncrementalJSONParser
+from .serializer import dumps_event, encode_event
+from .checkpoint_index import MessageCheckpointIndex
+from .cache import LRUCache
+from .streaming import (
+    coalesce_chat_model_stream,
+    DEFAULT_COALESCE_MAX_CHARS,
+    EventFilterMatcher,
+)
 from .langgraph import copilotkit_messages_to_langchain, langchain_messages_to_copilotkit
 from .action import ActionDict
 from .agent import Agent
+from .exc import AgentResyncRequiredException
 from .logging import get_logger
+from .metrics import get_metrics
 
 logger = get_logger(__name__)
 
+DEFAULT_THREAD_STATE_CACHE_SIZE = 1000
+DEFAULT_THREAD_STATE_CACHE_TTL = 300
+
+# graph -> {(input schema, output schema, config schema): schema keys}
+_SCHEMA_KEYS_CACHE: "weakref.WeakKeyDictionary[Any, dict]" = weakref.WeakKeyDictionary()
+
 class CopilotKitConfig(TypedDict):
     """
     CopilotKit config for LangGraphAgent
@@ -52,9 +71,33 @@ class CopilotKitConfig(TypedDict):
         This function lets you customize how CopilotKit merges the agent state.
     convert_messages : Callable
         Use this function to customize how CopilotKit converts its messages to LangChain messages.`
+    emit_state_deltas : bool
+        When True, only the first state sync of a run carries the full state. Subsequent state
+        syncs carry a JSON Patch (`state_delta`) against the previously emitted state. Every
+        state sync has a `state_seq` sequence number so that clients can detect gaps and
+        resync via the state endpoint. The final state sync of a run is always a full snapshot.
+    coalesce_tokens_window_ms : float
+        When set, consecutive `on_chat_model_stream` content deltas of the same message are merged
+        into a single event. Merged content is flushed after this many milliseconds (15-30 ms
+        works well), when it reaches `coalesce_tokens_max_chars` characters or as soon as any
+        other event is streamed. Tool call chunks are never merged.
+    coalesce_tokens_max_chars : int
+        The maximum number of characters merged into a single event (default: 512).
+    thread_state_cache_size : int
+        The maximum number of threads whose state is cached for `get_state` (default: 1000).
+    thread_state_cache_ttl : float
+        How long, in seconds, the state of a thread is cached (default: 300).
+    thread_state_cache_max_bytes : int
+        The approximate memory budget of the thread state cache in bytes (default: unlimited).
     """
     merge_state: NotRequired[Callable]
     convert_messages: NotRequired[Callable]
+    emit_state_deltas: NotRequired[bool]
+    coalesce_tokens_window_ms: NotRequired[float]
+    coalesce_tokens_max_chars: NotRequired[int]
+    thread_state_cache_size: NotRequired[int]
+    thread_state_cache_ttl: NotRequired[float]
+    thread_state_cache_max_bytes: NotRequired[int]
 
 def langgraph_default_merge_state( # pylint: disable=unused-argument
         *,
@@ -165,7 +208,17 @@ class LangGraphAgent(Agent):
         )
 
         self.merge_state = None
-        self.thread_state = {}
+        self.thread_state: LRUCache[dict] = LRUCache(
+            max_entries=(copilotkit_config or {}).get(
+                "thread_state_cache_size",
+                DEFAULT_THREAD_STATE_CACHE_SIZE
+            ),
+            ttl=(copilotkit_config or {}).get(
+                "thread_state_cache_ttl",
+                DEFAULT_THREAD_STATE_CACHE_TTL
+            ),
+            max_bytes=(copilotkit_config or {}).get("thread_state_cache_max_bytes"),
+        )
         if copilotkit_config is not None:
             self.merge_state = copilotkit_config.get("merge_state")
         if not self.merge_state and merge_state is not None:
@@ -179,10 +232,33 @@ class LangGraphAgent(Agent):
             else None
         ) or copilotkit_messages_to_langchain(use_function_call=False)
 
+        self.emit_state_deltas = bool(
+            copilotkit_config.get("emit_state_deltas")
+            if copilotkit_config
+            else False
+        )
+
+        self.coalesce_tokens_window_ms = (
+            copilotkit_config.get("coalesce_tokens_window_ms")
+            if copilotkit_config
+            else None
+        )
+        self.coalesce_tokens_max_chars = (
+            copilotkit_config.get("coalesce_tokens_max_chars")
+            if copilotkit_config
+            else None
+        ) or DEFAULT_COALESCE_MAX_CHARS
+
         self.langgraph_config = langgraph_config or config
 
         self.graph = cast(CompiledStateGraph, graph or agent)
         self.active_interrupt_event = False
+        self.message_checkpoints = MessageCheckpointIndex()
+
+        # warm the schema keys cache
+        self.get_schema_keys(
+            ensure_config(cast(Any, self.langgraph_config.copy()) if self.langgraph_config else {})
+        )
 
     def execute( # pylint: disable=too-many-arguments
             self,
@@ -196,6 +272,9 @@ class LangGraphAgent(Agent):
             **kwargs
     ):
         node_name = kwargs.get("node_name")
+        event_filter = kwargs.get("event_filter")
+        last_message_id = kwargs.get("last_message_id")
+        messages_after = kwargs.get("messages_after")
 
         return self._stream_events(
             state=state,
@@ -204,7 +283,10 @@ class LangGraphAgent(Agent):
             actions=actions,
             thread_id=thread_id,
             node_name=node_name,
-            meta_events=meta_events
+            meta_events=meta_events,
+            event_matcher=EventFilterMatcher(event_filter) if event_filter else None,
+            last_message_id=last_message_id,
+            messages_after=messages_after
         )
 
     async def prepare_stream( # pylint: disable=too-many-arguments
@@ -218,11 +300,13 @@ class LangGraphAgent(Agent):
             actions: Optional[List[ActionDict]] = None,
             node_name: Optional[str] = None,
             meta_events: Optional[List[MetaEvent]] = None,
+            langchain_messages: Optional[List[BaseMessage]] = None,
     ):
         active_interrupts = agent_state.tasks[0].interrupts if agent_state.tasks and agent_state.tasks[0].interrupts else None
         state_input["messages"] = agent_state.values.get("messages", [])
         current_graph_state = agent_state.values
-        langchain_messages = self.convert_messages(messages)
+        if langchain_messages is None:
+            langchain_messages = self.convert_messages(messages)
         state = cast(Callable, self.merge_state)(
             state=state_input,
             messages=langchain_messages,
@@ -257,7 +341,7 @@ class LangGraphAgent(Agent):
         stream_input = resume_input if resume_input else initial_state
 
         # Get the output and input schema keys the user has allowed for this graph
-        input_keys, output_keys, config_keys = self.get_schema_keys(config)
+        input_keys, output_keys, config_keys = self.get_schema_keys(config) or (None, None, None)
         self.output_schema_keys = output_keys
         self.input_schema_keys = input_keys
 
@@ -322,6 +406,9 @@ class LangGraphAgent(Agent):
             actions: Optional[List[ActionDict]] = None,
             node_name: Optional[str] = None,
             meta_events: Optional[List[MetaEvent]] = None,
+            event_matcher: Optional[EventFilterMatcher] = None,
+            last_message_id: Optional[str] = None,
+            messages_after: Optional[str] = None,
         ):
         default_config = ensure_config(cast(Any, self.langgraph_config.copy()) if self.langgraph_config else {}) # pylint: disable=line-too-long
         config = {**default_config, **(self.graph.config or {}), **(config or {})}
@@ -329,13 +416,21 @@ class LangGraphAgent(Agent):
         config["configurable"]["thread_id"] = thread_id
 
         streaming_state_extractor = _StreamingStateExtractor([])
+        state_sync = _StateSyncEncoder() if self.emit_state_deltas else None
         prev_node_name = None
         emit_intermediate_state_until_end = None
         should_exit = False
-        manually_emitted_state = None
         thread_id = cast(Any, config)["configurable"]["thread_id"]
 
         agent_state = await self.graph.aget_state(config)
+        if messages_after is not None:
+            langchain_messages = self._messages_with_history(
+                thread_messages=agent_state.values.get("messages", []),
+                messages=messages,
+                messages_after=messages_after
+            )
+        else:
+            langchain_messages = self.convert_messages(messages)
         prepared_stream_response = await self.prepare_stream(
             state_input=state,
             agent_state=agent_state,
@@ -344,10 +439,10 @@ class LangGraphAgent(Agent):
             actions=actions,
             thread_id=thread_id,
             node_name=node_name,
-            meta_events=meta_events
+            meta_events=meta_events,
+            langchain_messages=langchain_messages
         )
 
-        langchain_messages = self.convert_messages(messages)
         non_system_messages = [msg for msg in langchain_messages if not isinstance(msg, SystemMessage)]
         if len(agent_state.values.get("messages", [])) > len(non_system_messages):
             # Find the last user message by working backwards from the last message
@@ -365,8 +460,10 @@ class LangGraphAgent(Agent):
                     actions=actions,
                 )
 
-        state = prepared_stream_response["state"]
-        current_graph_state = prepared_stream_response["state"]
+        state_tracker = _StateTracker(
+            prepared_stream_response["state"],
+            output_keys=self.output_schema_keys
+        )
         stream = prepared_stream_response["stream"]
         config = prepared_stream_response["config"]
         interrupt_event = prepared_stream_response.get('interrupt_event', None)
@@ -375,6 +472,13 @@ class LangGraphAgent(Agent):
             yield interrupt_event
             return
 
+        if self.coalesce_tokens_window_ms:
+            stream = coalesce_chat_model_stream(
+                stream,
+                window=self.coalesce_tokens_window_ms / 1000,
+                max_chars=self.coalesce_tokens_max_chars
+            )
+
         try:
             async for event in stream:
                 current_node_name = event.get("name")
@@ -404,7 +508,7 @@ class LangGraphAgent(Agent):
                 if event_type == "on_chain_end" and isinstance(
                     event.get("data", {}).get("output"), dict
                 ):
-                    current_graph_state.update(event["data"]["output"])
+                    state_tracker.update(event["data"]["output"])
 
                 emit_intermediate_state = metadata.get("copilotkit:emit-intermediate-state")
                 manually_emit_intermediate_state = (
@@ -425,18 +529,20 @@ class LangGraphAgent(Agent):
                 exiting_node = node_name == current_node_name and event_type == "on_chain_end"
 
                 if exiting_node:
-                    manually_emitted_state = None
+                    state_tracker.set_manual_state(None)
 
                 if manually_emit_intermediate_state:
                     manually_emitted_state = cast(Any, event["data"])
+                    state_tracker.set_manual_state(manually_emitted_state)
                     yield self._emit_state_sync_event(
                         thread_id=thread_id,
                         run_id=run_id,
                         node_name=node_name,
                         state=manually_emitted_state,
                         running=True,
-                        active=True
-                    ) + "\n"
+                        active=True,
+                        state_sync=state_sync
+                    )
                     continue
 
 
@@ -447,17 +553,14 @@ class LangGraphAgent(Agent):
                     # reset the streaming state extractor
                     streaming_state_extractor = _StreamingStateExtractor(emit_intermediate_state)
 
-                # OPTIMIZATION: Use locally maintained state instead of hitting checkpointer repeatedly
-                updated_state = manually_emitted_state or current_graph_state
-
                 if emit_intermediate_state and event_type == "on_chat_model_stream":
                     streaming_state_extractor.buffer_tool_calls(event)
 
+                # OPTIMIZATION: Use locally maintained state instead of hitting checkpointer repeatedly
                 if emit_intermediate_state_until_end is not None:
-                    updated_state = {
-                        **updated_state,
-                        **streaming_state_extractor.extract_state()
-                    }
+                    state_tracker.set_overlay(streaming_state_extractor.extract_state())
+                else:
+                    state_tracker.set_overlay(None)
 
                 if (not emit_intermediate_state and
                     current_node_name == emit_intermediate_state_until_end and
@@ -469,20 +572,37 @@ class LangGraphAgent(Agent):
                 #   a) the state has changed
                 #   b) the node has changed
                 #   c) the node is ending
-                if updated_state != state or prev_node_name != node_name or exiting_node:
-                    state = updated_state
+                if state_tracker.changed or prev_node_name != node_name or exiting_node:
+                    state = state_tracker.snapshot()
+                    changed_keys = state_tracker.changed_keys
                     prev_node_name = node_name
-                    current_graph_state.update(updated_state)
+                    state_tracker.mark_emitted(state)
                     yield self._emit_state_sync_event(
                         thread_id=thread_id,
                         run_id=run_id,
                         node_name=node_name,
                         state=state,
                         running=True,
-                        active=not exiting_node
-                    ) + "\n"
+                        active=not exiting_node,
+                        state_sync=state_sync,
+                        changed_keys=changed_keys
+                    )
 
-                yield langchain_dumps(event) + "\n"
+                # events the client is not interested in are not serialized at all
+                if event_matcher is None or event_matcher(event):
+                    yield encode_event(event)
+        except (asyncio.CancelledError, GeneratorExit):
+            # the client went away: closing the stream cancels the graph run. LangGraph writes a
+            # checkpoint after each completed step, so the thread is left at the last one
+            get_metrics().increment("agent_runs_cancelled", agent=self.name)
+            run_thread_id = cast(Any, config)["configurable"].get("thread_id") or thread_id
+            try:
+                if hasattr(stream, "aclose"):
+                    await cast(Any, stream).aclose()
+            finally:
+                self.thread_state.invalidate(run_thread_id)
+                self.message_checkpoints.invalidate(run_thread_id)
+            raise
         except Exception as error:
             # Emit error information through streaming protocol before terminating
             # This preserves the semantic error details that would otherwise be lost
@@ -508,7 +628,7 @@ class LangGraphAgent(Agent):
             # Emit error events in both formats to support both LangGraph Platform and direct LangGraph modes
 
             # Format for LangGraph Platform (remote-lg-action.ts)
-            yield langchain_dumps({
+            yield encode_event({
                 "event": "error",
                 "data": {
                     "message": f"{error_type}: {error_message}",
@@ -517,10 +637,10 @@ class LangGraphAgent(Agent):
                     "agent_name": self.name,
                     "node_name": node_name or "unknown"
                 }
-            }) + "\n"
+            })
 
             # Format for direct LangGraph mode (event-source.ts)
-            yield langchain_dumps({
+            yield encode_event({
                 "event": "on_copilotkit_error",
                 "data": {
                     "error": error_details,
@@ -528,12 +648,16 @@ class LangGraphAgent(Agent):
                     "agent_name": self.name,
                     "node_name": node_name or "unknown"
                 }
-            }) + "\n"
+            })
 
             # Re-raise the exception to maintain normal error handling flow
             raise
 
         state = await self.graph.aget_state(config)
+        # prepare_stream creates a thread id if there was none
+        run_thread_id = cast(Any, config)["configurable"].get("thread_id") or thread_id
+        # keep the state returned by get_state up to date
+        self.thread_state.set(run_thread_id, {**state.values})
         tasks = state.tasks
         interrupts = tasks[0].interrupts if tasks and len(tasks) > 0 else None
         if interrupts:
@@ -556,8 +680,43 @@ class LangGraphAgent(Agent):
             # at this point, the node is ending so we set active to false
             active=False,
             # sync messages at the end of the run
-            include_messages=True
-        ) + "\n"
+            include_messages=True,
+            state_sync=state_sync,
+            last_message_id=last_message_id
+        )
+
+        # index the checkpoints of this run so that regenerating a message doesn't need to scan
+        # the whole thread history
+        try:
+            await self.message_checkpoints.update(self.graph, run_thread_id)
+        except Exception as exc: # pylint: disable=broad-except
+            logger.debug("Failed to index checkpoints of thread %s: %s", run_thread_id, exc)
+
+    def _messages_with_history(
+        self,
+        *,
+        thread_messages: List[BaseMessage],
+        messages: List[Message],
+        messages_after: str
+    ) -> List[BaseMessage]:
+        """
+        Rebuild the full message history when the client only sent the messages after
+        `messages_after`, taking the messages up to it from the thread's checkpoint.
+        """
+        index = _find_message_index(thread_messages, messages_after)
+        if index is None:
+            raise AgentResyncRequiredException(self.name, messages_after)
+
+        history = thread_messages[:index + 1]
+        new_messages = self.convert_messages(messages)
+
+        # new messages must not continue a message of the history (e.g. more tool calls of the
+        # same assistant message), the client needs to send the full history in that case
+        history_ids = {message.id for message in history}
+        if any(message.id in history_ids for message in new_messages):
+            raise AgentResyncRequiredException(self.name, messages_after)
+
+        return history + new_messages
 
     def _emit_state_sync_event(
         self,
@@ -568,30 +727,55 @@ class LangGraphAgent(Agent):
         state: dict,
         running: bool,
         active: bool,
-        include_messages: bool = False
+        include_messages: bool = False,
+        state_sync: Optional["_StateSyncEncoder"] = None,
+        last_message_id: Optional[str] = None,
+        changed_keys: Optional[AbstractSet[str]] = None
     ):
+        messages_fields = {}
         # First handle messages as before
         if not include_messages:
             state = {
                 k: v for k, v in state.items() if k != "messages"
             }
         else:
+            messages = state.get("messages", [])
+            # only sync the messages the client doesn't have yet if possible
+            new_messages = (
+                _messages_after(messages, last_message_id)
+                if last_message_id is not None
+                else None
+            )
+            if new_messages is not None:
+                messages = new_messages
+                messages_fields = {"messages_after": last_message_id}
             state = {
                 **state,
-                "messages": langchain_messages_to_copilotkit(state.get("messages", []))
+                "messages": langchain_messages_to_copilotkit(messages)
             }
 
         # Filter by schema keys if available
         state = self.filter_state_on_schema_keys(state, 'output')
 
-        return langchain_dumps({
+        if state_sync is not None:
+            # the final sync (with messages) is always a full snapshot
+            state_fields = state_sync.encode(
+                state,
+                snapshot=include_messages,
+                changed_keys=changed_keys
+            )
+        else:
+            state_fields = {"state": state}
+
+        return encode_event({
             "event": "on_copilotkit_state_sync",
             "thread_id": thread_id,
             "run_id": run_id,
             "agent_name": self.name,
             "node_name": node_name,
             "active": active,
-            "state": state,
+            **state_fields,
+            **messages_fields,
             "running": running,
             "role": "assistant"
         })
@@ -613,10 +797,10 @@ class LangGraphAgent(Agent):
         config["configurable"] = config.get("configurable", {})
         config["configurable"]["thread_id"] = thread_id
 
-        if self.thread_state.get(thread_id, None) is None:
-            self.thread_state[thread_id] = {**(await self.graph.aget_state(config)).values}
-
-        state = self.thread_state[thread_id]
+        state = self.thread_state.get(thread_id)
+        if state is None:
+            state = {**(await self.graph.aget_state(config)).values}
+            self.thread_state.set(thread_id, state)
         if state == {}:
             return {
                 "threadId": thread_id or "",
@@ -644,6 +828,30 @@ class LangGraphAgent(Agent):
         }
 
     def get_schema_keys(self, config):
+        """
+        Get the input, output and config schema keys of the graph as frozensets.
+
+        Generating the JSON schemas is expensive, so the keys are cached per graph and schema
+        classes (which are the same objects as long as the graph's schemas don't change).
+        """
+        try:
+            fingerprint = (
+                self.graph.get_input_schema(config),
+                self.graph.get_output_schema(config),
+                self.graph.config_schema(),
+            )
+            graph_cache = _SCHEMA_KEYS_CACHE.setdefault(self.graph, {})
+        except Exception: # pylint: disable=broad-except
+            return self._resolve_schema_keys(config)
+
+        if fingerprint not in graph_cache:
+            schema_keys = self._resolve_schema_keys(config)
+            if schema_keys is None:
+                return None
+            graph_cache[fingerprint] = schema_keys
+        return graph_cache[fingerprint]
+
+    def _resolve_schema_keys(self, config):
         CONSTANT_KEYS = ['copilotkit', 'messages']
         CONSTANT_CONFIG_KEYS = ['checkpoint_id', 'checkpoint_ns', 'thread_id']
         try:
@@ -670,7 +878,11 @@ class LangGraphAgent(Agent):
                 if key not in output_schema_keys:
                     output_schema_keys.append(key)
 
-            return input_schema_keys, output_schema_keys, config_schema_keys
+            return (
+                frozenset(input_schema_keys),
+                frozenset(output_schema_keys),
+                frozenset(config_schema_keys) if config_schema_keys is not None else None,
+            )
         except Exception:
             return None
 
@@ -685,42 +897,82 @@ class LangGraphAgent(Agent):
     def get_interrupt_event(self, value):
         if not isinstance(value, str) and "__copilotkit_interrupt_value__" in value:
             ev_value = value["__copilotkit_interrupt_value__"]
-            return langchain_dumps({
+            return encode_event({
                 "event": "on_copilotkit_interrupt",
                 "data": { "value": ev_value if isinstance(ev_value, str) else json.dumps(ev_value), "messages": langchain_messages_to_copilotkit(value["__copilotkit_messages__"]) }
-            }) + "\n"
+            })
         else:
-            return langchain_dumps({
+            return encode_event({
                 "event": "on_interrupt",
                 "value": value if isinstance(value, str) else json.dumps(value)
-            }) + "\n"
+            })
 
     async def get_checkpoint_before_message(self, message_id: str, thread_id: str):
         if not thread_id:
             raise ValueError("Missing thread_id in config")
 
-        history_list = []
-        async for snapshot in self.graph.aget_state_history({"configurable": {"thread_id": thread_id}}):
-            history_list.append(snapshot)
-
-        history_list.reverse()
-        for idx, snapshot in enumerate(history_list):
-            messages = snapshot.values.get("messages", [])
-            if any(getattr(m, "id", None) == message_id for m in messages):
-                if idx == 0:
-                    # No snapshot before this
-                    # Return synthetic "empty before" version
-                    empty_snapshot = snapshot
-                    empty_snapshot.values["messages"] = []
-                    return empty_snapshot
-                return history_list[idx - 1]  # return one snapshot *before* the one that includes the message
+        for _ in range(2):
+            entry = await self.message_checkpoints.lookup(self.graph, thread_id, message_id)
+            if entry is None:
+                break
+            before_config, first_config = entry
+            snapshot = await self.graph.aget_state(before_config or first_config)
+            if snapshot.metadata is None:
+                # the checkpoint no longer exists, rebuild the thread's index
+                self.message_checkpoints.invalidate(thread_id)
+                continue
+            if before_config is None:
+                # No snapshot before this
+                # Return synthetic "empty before" version
+                snapshot.values["messages"] = []
+            return snapshot
 
         raise ValueError("Message ID not found in history")
 
+def _find_message_index(messages: List[BaseMessage], message_id: str) -> Optional[int]:
+    """
+    Find the LangChain message for a CopilotKit message id, searching from the end. Tool calls are
+    separate CopilotKit messages, so the id may also be the id of a tool call.
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message.id == message_id or (
+            isinstance(message, AIMessage) and
+            any(tool_call["id"] == message_id for tool_call in message.tool_calls)
+        ):
+            return index
+    return None
+
+def _messages_after(messages: List[BaseMessage], message_id: str) -> Optional[List[BaseMessage]]:
+    """
+    Return the messages after the message with the given CopilotKit message id, or None if the
+    message is not found or the messages after it can not be converted on their own.
+    """
+    index = _find_message_index(messages, message_id)
+    if index is None:
+        return None
+
+    new_messages = messages[index + 1:]
+
+    # tool results are synced together with their tool call, so the new messages must not contain
+    # results of earlier tool calls
+    tool_call_ids = {
+        tool_call["id"]
+        for message in new_messages if isinstance(message, AIMessage)
+        for tool_call in message.tool_calls
+    }
+    if any(
+        isinstance(message, ToolMessage) and message.tool_call_id not in tool_call_ids
+        for message in new_messages
+    ):
+        return None
+
+    return new_messages
+
 class _StreamingStateExtractor:
     def __init__(self, emit_intermediate_state: List[dict]):
         self.emit_intermediate_state = emit_intermediate_state
-        self.tool_call_buffer = {}
+        self.tool_call_parsers = {}
         self.current_tool_call = None
 
         self.previously_parsable_state = {}
@@ -731,11 +983,10 @@ class _StreamingStateExtractor:
             chunk = event["data"]["chunk"].tool_call_chunks[0]
             if chunk["name"] is not None:
                 self.current_tool_call = chunk["name"]
-                self.tool_call_buffer[self.current_tool_call] = chunk["args"]
+                self.tool_call_parsers[self.current_tool_call] = IncrementalJSONParser()
+                self.tool_call_parsers[self.current_tool_call].feed(chunk["args"])
             elif self.current_tool_call is not None:
-                self.tool_call_buffer[self.current_tool_call] = (
-                    self.tool_call_buffer[self.current_tool_call] + chunk["args"]
-                )
+                self.tool_call_parsers[self.current_tool_call].feed(chunk["args"])
 
     def get_emit_state_config(self, current_tool_name):
         """Get the emit state config"""
@@ -753,18 +1004,16 @@ class _StreamingStateExtractor:
 
     def extract_state(self):
         """Extract the streaming state"""
-        parser = JSONParser()
-
         state = {}
 
-        for key, value in self.tool_call_buffer.items():
+        for key, parser in self.tool_call_parsers.items():
             argument_name, state_key = self.get_emit_state_config(key)
 
             if state_key is None:
                 continue
 
             try:
-                parsed_value = parser.parse(value)
+                parsed_value = parser.get_value()
             except Exception as _exc: # pylint: disable=broad-except
                 if key in self.previously_parsable_state:
                     parsed_value = self.previously_parsable_state[key]
@@ -779,3 +1028,188 @@ class _StreamingStateExtractor:
                 state[state_key] = parsed_value.get(argument_name)
 
         return state
+
+class _StateTracker:
+    """
+    Tracks the state of a run and decides when a state sync is needed.
+
+    The state is the graph state, replaced by a manually emitted state while one is active, with
+    the state extracted from streaming tool calls on top while intermediate state is emitted. A
+    sync is needed when the state differs from the last emitted state, which is decided from the
+    tracked changes (O(changed keys)) instead of comparing (and copying) the whole state on every
+    event. Like the comparison, updates to the graph state don't count while the last emitted
+    state is the graph state itself, since it is updated in place.
+
+    The changed top-level keys that state syncs include (`messages` and keys that are not part
+    of the output schema are left out) are collected in `changed_keys`, so that state deltas
+    only need to diff those.
+    """
+    def __init__(self, values: dict, output_keys: Optional[AbstractSet[str]] = None):
+        self.values = values
+        self.output_keys = output_keys
+        self.manual_state: Optional[dict] = None
+        # None while no intermediate state is emitted
+        self.overlay: Optional[dict] = None
+        self.version = 0
+        self.emitted_version = 0
+        # the last emitted state if it was the graph state or the manual state itself, None if
+        # it was a copy
+        self.emitted: Optional[dict] = None
+        # None when any key may have changed, e.g. because the manual state was replaced
+        self.changed_keys: Optional[Set[str]] = set()
+
+    @property
+    def changed(self) -> bool:
+        """Whether the state differs from the last emitted state"""
+        emitted = self.emitted
+        if emitted is None:
+            return self.version != self.emitted_version
+        base = self.manual_state or self.values
+        if self.overlay is None and base is emitted:
+            return False
+        if emitted is self.values and base is self.values:
+            return any(
+                key not in base or not _same_value(base[key], value)
+                for key, value in cast(dict, self.overlay).items()
+            )
+        # the manual state was set or replaced since the last sync
+        return not _same_value(self.snapshot(), emitted)
+
+    def _mark_changed(self, keys: Iterable[str]):
+        self.version += 1
+        if self.changed_keys is not None:
+            self.changed_keys.update(
+                key for key in keys
+                if key != "messages" and (self.output_keys is None or key in self.output_keys)
+            )
+
+    def update(self, changes: dict):
+        """Update the graph state"""
+        values = self.values
+        changed = []
+        for key, value in changes.items():
+            if key not in values or not _same_value(values[key], value):
+                values[key] = value
+                changed.append(key)
+        if changed:
+            self._mark_changed(changed)
+
+    def set_manual_state(self, state: Optional[dict]):
+        """Set or clear the manually emitted state"""
+        if state is not self.manual_state:
+            self.manual_state = state
+            self.changed_keys = None
+            self.version += 1
+
+    def set_overlay(self, overlay: Optional[dict]):
+        """Set the state extracted from streaming tool calls, None when none is emitted"""
+        previous = self.overlay or {}
+        self.overlay = overlay
+        overlay = overlay or {}
+        if not overlay and not previous:
+            return
+        base = self.manual_state or self.values
+        changed = len(overlay) != len(previous) or any(
+            key not in previous or not _same_value(previous[key], value)
+            for key, value in overlay.items()
+        )
+        if not overlay:
+            # the overlay was merged into the graph state when it was emitted, only the parts
+            # that were never emitted change the state
+            changed = any(
+                key not in base or not _same_value(base[key], value)
+                for key, value in previous.items()
+            )
+        if changed:
+            self._mark_changed([*previous, *overlay])
+
+    def snapshot(self) -> dict:
+        """Return the current state"""
+        base = self.manual_state or self.values
+        return {**base, **self.overlay} if self.overlay is not None else base
+
+    def mark_emitted(self, state: dict):
+        """Record that `state` was emitted and merge it into the graph state"""
+        if state is not self.values:
+            self.values.update(state)
+        self.emitted = state if state is self.values or state is self.manual_state else None
+        self.emitted_version = self.version
+        self.changed_keys = set()
+
+
+def _same_value(old: Any, new: Any) -> bool:
+    if old is new:
+        return True
+    try:
+        return bool(old == new)
+    except Exception: # pylint: disable=broad-except
+        return False
+
+
+class _StateSyncEncoder:
+    """
+    Encodes the state syncs of a single run as a snapshot followed by deltas.
+
+    Deltas are computed per top-level key against the plain JSON last sent for it: keys that are
+    not in `changed_keys` and values that are still the same objects are skipped, only the
+    changed values are normalized to plain JSON and diffed. Values changed in place are picked up
+    by the final snapshot of the run.
+    """
+    def __init__(self):
+        self.seq = 0
+        # the values last sent per key, and their plain JSON as the client received it
+        self.last_values: Optional[dict] = None
+        self.normalized: dict = {}
+
+    def encode(
+            self,
+            state: dict,
+            snapshot: bool = False,
+            changed_keys: Optional[AbstractSet[str]] = None,
+        ) -> dict:
+        """
+        Return the state fields of the next state sync event. `changed_keys` are the keys that
+        may have changed since the previous call, None if any may have.
+        """
+        self.seq += 1
+
+        if snapshot or self.last_values is None:
+            self.last_values = dict(state)
+            # normalize right away, the values may be changed in place before the next delta
+            self.normalized = {key: _normalize(value) for key, value in state.items()}
+            return {
+                "state": state,
+                "state_seq": self.seq,
+            }
+
+        last_values = self.last_values
+        normalized = self.normalized
+        delta: list = []
+        for key in list(last_values):
+            if key not in state:
+                delta.extend(make_json_patch({key: None}, {}))
+                del last_values[key]
+                del normalized[key]
+        for key, value in state.items():
+            if key in last_values and (
+                last_values[key] is value or
+                (changed_keys is not None and key not in changed_keys)
+            ):
+                continue
+            # normalize to plain JSON so that the diff matches what the client has received
+            current = _normalize(value)
+            if key in normalized:
+                delta.extend(make_json_patch({key: normalized[key]}, {key: current}))
+            else:
+                delta.extend(make_json_patch({}, {key: current}))
+            last_values[key] = value
+            normalized[key] = current
+
+        return {
+            "state_delta": delta,
+            "state_seq": self.seq,
+        }
+
+
+def _normalize(value: Any) -> Any:
+    return json.loads(dumps_event(value))
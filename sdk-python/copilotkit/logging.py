@@ -2,9 +2,13 @@
 Logging setup for CopilotKit.
 """
 
+import itertools
 import logging
 import os
 import sys
+from pprint import pformat
+from typing import Any, Dict, List, Optional, Tuple
+from typing_extensions import TypedDict
 
 def get_logger(name: str):
     """
@@ -23,3 +27,70 @@ def bold(text: str) -> str:
     if hasattr(sys.stdout, 'isatty') and sys.stdout.isatty():
         return f"\033[1m{text}\033[0m"
     return text
+
+DEFAULT_MAX_FIELD_LENGTH = 10000
+
+class RequestLoggingConfig(TypedDict, total=False):
+    """
+    Request logging configuration
+
+    Parameters
+    ----------
+    level : int
+        The level requests are logged at. Defaults to `logging.INFO`.
+    sample_rate : int
+        Log 1 in `sample_rate` requests. Defaults to 1 (every request).
+    max_field_length : int
+        The maximum number of characters logged per field. Defaults to 10000.
+    field_max_lengths : Dict[str, int]
+        Per field overrides of `max_field_length`, e.g. `{"State": 500}`.
+    """
+    level: int
+    sample_rate: int
+    max_field_length: int
+    field_max_lengths: Dict[str, int]
+
+class RequestLogger:
+    """
+    Logs requests with their fields, formatting them only when the request is actually logged.
+
+    Field values can be callables, they are only called when the request is logged.
+    """
+
+    def __init__(self, logger: logging.Logger, config: Optional[RequestLoggingConfig] = None):
+        config = config or {}
+        self.logger = logger
+        self.level = config.get("level", logging.INFO)
+        self.sample_rate = max(config.get("sample_rate", 1), 1)
+        self.max_field_length = config.get("max_field_length", DEFAULT_MAX_FIELD_LENGTH)
+        self.field_max_lengths = config.get("field_max_lengths", {})
+        self._counter = itertools.count()
+
+    def log(self, title: str, fields: List[Tuple[str, Any]]):
+        """Log a request"""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if self.sample_rate > 1 and next(self._counter) % self.sample_rate != 0:
+            return
+
+        formatted = {
+            key: self._format(key, value() if callable(value) else value)
+            for key, value in fields
+        }
+        lines = [bold(title), "--------------------------"]
+        for key, value in formatted.items():
+            lines.append(bold(key + ":"))
+            lines.append(value)
+        lines.append("--------------------------")
+        self.logger.log(
+            self.level,
+            "\n".join(lines),
+            extra={"copilotkit_request": {"title": title, "fields": formatted}}
+        )
+
+    def _format(self, key: str, value: Any) -> str:
+        text = pformat(value)
+        max_length = self.field_max_lengths.get(key, self.max_field_length)
+        if max_length is not None and len(text) > max_length:
+            return text[:max_length] + f"... ({len(text) - max_length} more characters)"
+        return text
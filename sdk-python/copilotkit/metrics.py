@@ -0,0 +1,80 @@
+"""
+In-process metrics for CopilotKit.
+
+```python
+from copilotkit.metrics import get_metrics
+
+get_metrics().snapshot()
+# {"counters": {...}, "timings": {"action_execution_seconds{action=search}": {...}}}
+```
+"""
+
+import threading
+from typing import Dict, Tuple
+from typing_extensions import TypedDict
+
+
+class TimingSummary(TypedDict):
+    """Summary of observed durations in seconds"""
+    count: int
+    total: float
+    max: float
+
+
+class MetricsSnapshot(TypedDict):
+    """All metrics at a point in time"""
+    counters: Dict[str, float]
+    timings: Dict[str, TimingSummary]
+
+
+def _key(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+class Metrics:
+    """Thread safe counters and timing summaries, identified by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._timings: Dict[str, Tuple[int, float, float]] = {}
+
+    def increment(self, name: str, value: float = 1, **labels: str):
+        """Increment a counter"""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        """Record a duration"""
+        key = _key(name, labels)
+        with self._lock:
+            count, total, maximum = self._timings.get(key, (0, 0.0, 0.0))
+            self._timings[key] = (count + 1, total + seconds, max(maximum, seconds))
+
+    def snapshot(self) -> MetricsSnapshot:
+        """Get all metrics"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "timings": {
+                    key: {"count": count, "total": total, "max": maximum}
+                    for key, (count, total, maximum) in self._timings.items()
+                },
+            }
+
+    def reset(self):
+        """Reset all metrics"""
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+
+_METRICS = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Get the process wide metrics"""
+    return _METRICS
@@ -41,6 +41,8 @@ def normalize_parameters(parameters: Optional[List[Parameter]]) -> List[Paramete
 
 def _normalize_parameter(parameter: Parameter) -> Parameter:
     """Normalize a parameter to ensure it has the correct type and format."""
+    # don't modify the parameter passed in by the user
+    parameter = cast(Parameter, dict(parameter))
     if not "type" in parameter:
         cast(Any, parameter)['type'] = 'string'
     if not 'required' in parameter:
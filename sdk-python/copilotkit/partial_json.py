@@ -0,0 +1,350 @@
+"""
+Incremental partial JSON parser for streamed tool call arguments.
+"""
+
+import json
+import re
+from typing import Any, List, Optional
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NUMBER_CHARS = frozenset("0123456789.-+eE")
+_WHITESPACE = frozenset(" \t\n\r")
+_LITERALS = {"t": ("true", True), "f": ("false", False), "n": ("null", None)}
+_MISSING = object()
+
+
+class _Frame:  # pylint: disable=too-few-public-methods
+    """An object or array that is still open"""
+    __slots__ = ("container", "is_object", "key", "has_key", "expect")
+
+    def __init__(self, is_object: bool):
+        self.container: Any = {} if is_object else []
+        self.is_object = is_object
+        self.key: Any = None
+        self.has_key = False
+        # object: "key", "colon", "value" or "comma" - array: "value" or "comma"
+        self.expect = "key" if is_object else "value"
+
+
+class IncrementalJSONParser:  # pylint: disable=too-many-instance-attributes
+    """
+    Resumable partial JSON parser.
+
+    Unlike `partialjson.JSONParser`, which re-parses the whole buffer on every call, this parser
+    consumes only the text passed to `feed` and keeps its parse stack between chunks. `get_value`
+    returns the same partial values as `partialjson.JSONParser().parse(buffer)` for the text fed
+    so far and raises `ValueError` whenever it would raise.
+
+    ```python
+    parser = IncrementalJSONParser()
+    parser.feed('{"steps": ["sear')
+    parser.get_value()  # {"steps": ["sear"]}
+    ```
+
+    Values returned by `get_value` are never mutated by later calls to `feed`.
+    """
+
+    def __init__(self):
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._fed_any = False
+        self._root: Any = _MISSING
+        self._error: Optional[str] = None
+        # numbers with exponents are not supported by partialjson until the document is complete
+        self._incomplete_unsupported = False
+
+        # scalar token in progress: None, "string", "number" or "literal"
+        self._token: Optional[str] = None
+        self._token_is_key = False
+        self._token_chars = ""
+
+        # string token state
+        self._decoded = ""
+        self._raw: List[str] = []
+        self._raw_len = 0
+        self._escape_start = -1
+        self._escape = ""
+        self._high_surrogate_start = -1
+
+        self._snapshot: Any = _MISSING
+
+    def feed(self, text: Optional[str]):
+        """Consume the next chunk of the JSON document"""
+        if not text:
+            return
+        self._fed_any = True
+        self._snapshot = _MISSING
+        if self._error is not None:
+            return
+        try:
+            self._consume(text)
+        except ValueError as exc:
+            self._error = str(exc)
+
+    def get_value(self) -> Any:
+        """Return the value of the JSON document fed so far, completing it where necessary"""
+        if self._snapshot is _MISSING:
+            self._snapshot = self._build_snapshot()
+        return self._snapshot
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether a complete JSON value has been parsed"""
+        return self._root is not _MISSING
+
+    # -- tokenizer --------------------------------------------------------------------------------
+
+    def _consume(self, text: str):  # pylint: disable=too-many-branches
+        pos = 0
+        length = len(text)
+        while pos < length:
+            if self._token == "string":
+                pos = self._consume_string(text, pos)
+                continue
+
+            char = text[pos]
+
+            if self._token == "number":
+                if char in _NUMBER_CHARS:
+                    self._token_chars += char
+                    pos += 1
+                    continue
+                self._complete_value(self._number_value(self._token_chars, partial=False))
+                continue
+
+            if self._token == "literal":
+                word, value = _LITERALS[self._token_chars[0]]
+                if len(self._token_chars) < len(word):
+                    if char != word[len(self._token_chars)]:
+                        raise ValueError(f"Invalid literal: {self._token_chars + char}")
+                    self._token_chars += char
+                    pos += 1
+                    if len(self._token_chars) == len(word):
+                        self._complete_value(value)
+                    continue
+
+            if char in _WHITESPACE:
+                pos += 1
+                continue
+
+            if self._root is not _MISSING:
+                # ignore anything after the top level value
+                return
+
+            self._consume_structural(char)
+            pos += 1
+
+    def _consume_structural(self, char: str):  # pylint: disable=too-many-branches
+        frame = self._stack[-1] if self._stack else None
+        expect = frame.expect if frame is not None else "value"
+
+        if frame is not None and char == ("}" if frame.is_object else "]") and (
+                expect in ("key", "comma") or (expect == "value" and not frame.is_object)):
+            self._stack.pop()
+            self._complete_value(frame.container)
+        elif frame is not None and expect == "comma" and char == ",":
+            frame.expect = "key" if frame.is_object else "value"
+        elif frame is not None and expect == "colon" and char == ":":
+            frame.expect = "value"
+        elif frame is not None and expect == "key":
+            if char != '"':
+                raise ValueError(f"Expected object key, got {char!r}")
+            self._start_string(is_key=True)
+        elif expect == "value":
+            self._started = True
+            if char == '"':
+                self._start_string(is_key=False)
+            elif char in ("{", "["):
+                self._stack.append(_Frame(is_object=char == "{"))
+            elif char in _NUMBER_CHARS:
+                self._token = "number"
+                self._token_chars = char
+            elif char in _LITERALS:
+                self._token = "literal"
+                self._token_chars = char
+            else:
+                raise ValueError(f"Unexpected character {char!r}")
+        else:
+            raise ValueError(f"Unexpected character {char!r}")
+
+    def _complete_value(self, value: Any):
+        self._token = None
+        self._token_chars = ""
+        if not self._stack:
+            self._root = value
+            return
+        frame = self._stack[-1]
+        if frame.is_object:
+            frame.container[frame.key] = value
+            frame.key = None
+            frame.has_key = False
+        else:
+            frame.container.append(value)
+        frame.expect = "comma"
+
+    # -- strings ----------------------------------------------------------------------------------
+
+    def _start_string(self, *, is_key: bool):
+        self._token = "string"
+        self._token_is_key = is_key
+        self._decoded = ""
+        self._raw = []
+        self._raw_len = 0
+        self._escape_start = -1
+        self._escape = ""
+        self._high_surrogate_start = -1
+        if is_key:
+            frame = self._stack[-1]
+            frame.has_key = True
+            frame.key = None
+
+    def _append_raw(self, text: str):
+        if text:
+            self._raw.append(text)
+            self._raw_len += len(text)
+
+    def _consume_string(self, text: str, pos: int) -> int:  # pylint: disable=too-many-branches
+        length = len(text)
+        while pos < length:
+            if self._escape_start != -1:
+                # inside an escape sequence: '\\' followed by one char or 'u' and four hex digits
+                needed = 6 - len(self._escape) if self._escape[1:2] == "u" else 2 - len(self._escape)
+                taken = text[pos:pos + needed]
+                self._escape += taken
+                self._append_raw(taken)
+                pos += len(taken)
+                if self._escape == "\\u":
+                    continue
+                if len(taken) == needed:
+                    is_high_surrogate = (
+                        len(self._escape) == 6 and
+                        self._escape[2] in "dD" and
+                        self._escape[3] in "89abAB"
+                    )
+                    self._high_surrogate_start = self._escape_start if is_high_surrogate else -1
+                    self._escape_start = -1
+                continue
+
+            match = _STRING_SPECIAL.search(text, pos)
+            index = length if match is None else match.start()
+            if index > pos:
+                self._append_raw(text[pos:index])
+                self._high_surrogate_start = -1
+            if match is None:
+                return length
+
+            if text[index] == "\\":
+                self._escape_start = self._raw_len
+                self._escape = "\\"
+                self._append_raw("\\")
+                pos = index + 1
+                continue
+
+            # closing quote
+            self._flush_string(complete=True)
+            value = self._decoded
+            if self._token_is_key:
+                frame = self._stack[-1]
+                frame.key = value
+                frame.expect = "colon"
+                self._token = None
+            else:
+                self._complete_value(value)
+            return index + 1
+        return pos
+
+    def _flush_string(self, *, complete: bool):
+        """Decode the raw string text up to the last position that is safe to decode on its own"""
+        raw = "".join(self._raw)
+        if complete:
+            cut = len(raw)
+        elif self._high_surrogate_start != -1:
+            # keep a trailing high surrogate so it can be combined with a following low surrogate
+            cut = self._high_surrogate_start
+        elif self._escape_start != -1:
+            cut = self._escape_start
+        else:
+            # trailing whitespace may be stripped from partial strings, so keep it undecoded
+            cut = len(raw.rstrip())
+
+        if cut:
+            self._decoded += _decode_string(raw[:cut])
+
+        rest = raw[cut:]
+        self._raw = [rest] if rest else []
+        self._raw_len = len(rest)
+        if self._escape_start != -1:
+            self._escape_start -= cut
+        if self._high_surrogate_start != -1:
+            self._high_surrogate_start -= cut
+
+    def _partial_string(self) -> str:
+        try:
+            self._flush_string(complete=False)
+        except ValueError as exc:
+            self._error = str(exc)
+            raise
+        raw = "".join(self._raw)
+        if self._stack:
+            # partialjson strips trailing whitespace from strings inside objects and arrays
+            raw = raw.rstrip()
+        # an incomplete escape sequence can not be decoded; this raises like partialjson does
+        return self._decoded + _decode_string(raw) if raw else self._decoded
+
+    # -- snapshots --------------------------------------------------------------------------------
+
+    def _number_value(self, chars: str, *, partial: bool) -> Any:
+        if any(c in chars for c in "eE+"):
+            if partial:
+                raise ValueError("Incomplete number with exponent")
+            self._incomplete_unsupported = True
+            return json.loads(chars)
+        if partial and chars in ("-", "."):
+            return chars
+        if chars.endswith("."):
+            return int(chars[:-1])
+        return float(chars) if "." in chars else int(chars)
+
+    def _build_snapshot(self) -> Any:  # pylint: disable=too-many-branches
+        if self._root is not _MISSING:
+            return self._root
+        if self._error is not None:
+            raise ValueError(self._error)
+        if not self._fed_any:
+            return {}
+        if self._incomplete_unsupported:
+            raise ValueError("Incomplete number with exponent")
+        if not self._started:
+            raise ValueError("Empty JSON document")
+
+        leaf: Any = _MISSING
+        partial_key: Any = _MISSING
+        if self._token == "string":
+            if self._token_is_key:
+                partial_key = self._partial_string()
+            else:
+                leaf = self._partial_string()
+        elif self._token == "number":
+            leaf = self._number_value(self._token_chars, partial=True)
+        elif self._token == "literal":
+            leaf = _LITERALS[self._token_chars[0]][1]
+
+        for frame in reversed(self._stack):
+            if frame.is_object:
+                copy = dict(frame.container)
+                if partial_key is not _MISSING:
+                    copy[partial_key] = None
+                    partial_key = _MISSING
+                elif frame.has_key:
+                    copy[frame.key] = None if leaf is _MISSING else leaf
+            else:
+                copy = list(frame.container)
+                if leaf is not _MISSING:
+                    copy.append(leaf)
+            leaf = copy
+
+        return leaf
+
+
+def _decode_string(raw: str) -> str:
+    return json.loads('"' + raw + '"')
@@ -2,10 +2,10 @@
 CopilotKit Protocol
 """
 
-import json
 from enum import Enum
 from typing import Union, Optional
 from typing_extensions import TypedDict, Literal, Any, Dict
+from .serializer import encode_runtime_events
 
 class RuntimeEventTypes(Enum):
     """CopilotKit Runtime Event Types"""
@@ -253,16 +253,10 @@ def meta_event(*, name: RuntimeMetaEventName, value: Any) -> MetaEvent:
         "value": value
     }
 
-def emit_runtime_events(*events: RuntimeProtocolEvent) -> str:
+def emit_runtime_events(*events: RuntimeProtocolEvent) -> Union[str, bytes]:
     """Emit a list of runtime events"""
-    def serialize_event(event):
-        # Convert enum values to their string representation
-        if isinstance(event, dict):
-            return {k: (v.value if isinstance(v, Enum) else v) for k, v in event.items()}
-        return event
+    return encode_runtime_events(*events)
 
-    return "\n".join(json.dumps(serialize_event(event)) for event in events) + "\n"
-
-def emit_runtime_event(event: RuntimeProtocolEvent) -> str:
+def emit_runtime_event(event: RuntimeProtocolEvent) -> Union[str, bytes]:
     """Emit a single runtime event"""
     return emit_runtime_events(event)
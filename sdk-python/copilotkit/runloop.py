@@ -8,8 +8,7 @@ import json
 import traceback
 from typing import Callable
 from pydantic import BaseModel
-from typing_extensions import Any, Dict, Optional, List, TypedDict, cast
-from partialjson.json_parser import JSONParser as PartialJSONParser
+from typing_extensions import Any, Dict, Optional, List, TypedDict, NotRequired, Union, cast
 
 from .protocol import (
     RuntimeEvent,
@@ -22,6 +21,8 @@ from .protocol import (
     PredictStateConfig,
     RuntimeProtocolEvent
 )
+from .partial_json import IncrementalJSONParser
+from .metrics import get_metrics
 
 async def yield_control():
     """
@@ -46,6 +47,7 @@ class CopilotKitRunExecution(TypedDict):
     predict_state_configuration: Dict[str, PredictStateConfig]
     predicted_state: Dict[str, Any]
     argument_buffer: str
+    argument_parser: NotRequired[Optional[IncrementalJSONParser]]
     current_tool_call: Optional[str]
     state: Dict[str, Any]
 
@@ -133,26 +135,35 @@ async def copilotkit_run(
 ):
     """
     Run a task with a local queue.
+
+    The task is cancelled when the run is closed before it finished, e.g. because the client
+    disconnected.
     """
     local_queue = asyncio.Queue()
+    # the task gets a copy of the context, so the queue and execution are only set for the task.
+    # the steps of this generator may run in different contexts.
     token_queue = set_context_queue(local_queue)
     token_execution = set_context_execution(execution)
+    try:
+        task = asyncio.create_task(
+            fn()
+        )
+    finally:
+        reset_context_queue(token_queue)
+        reset_context_execution(token_execution)
 
-    task = asyncio.create_task(
-        fn()
-    )
     try:
         while True:
             event = await local_queue.get()
             local_queue.task_done()
 
-            json_lines = handle_runtime_event(
+            encoded = handle_runtime_event(
                 event=event,
                 execution=execution
             )
 
-            if json_lines is not None:
-                yield json_lines
+            if encoded is not None:
+                yield encoded
 
             if execution["is_finished"]:
                 break
@@ -163,16 +174,19 @@ async def copilotkit_run(
         await task
 
     finally:
-        reset_context_queue(token_queue)
-        reset_context_execution(token_execution)
+        if not task.done():
+            get_metrics().increment("agent_runs_cancelled", agent=execution["agent_name"])
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
 
 def handle_runtime_event(
         *,
         event: RuntimeEvent,
         execution: CopilotKitRunExecution
-) -> Optional[str]:
+) -> Optional[Union[str, bytes]]:
     """
-    Handle a runtime event.
+    Handle a runtime event. Returns the events to send, encoded in the current event format
+    (JSON lines or MessagePack frames), or None.
     """
 
     if event["type"] in [
@@ -237,6 +251,7 @@ def handle_runtime_event(
         execution["predict_state_configuration"] = {}
         execution["current_tool_call"] = None
         execution["argument_buffer"] = ""
+        execution["argument_parser"] = None
         execution["predicted_state"] = {}
         execution["state"] = event["state"]
 
@@ -294,6 +309,7 @@ def predict_state(
     if event["type"] == RuntimeEventTypes.ACTION_EXECUTION_START:
         execution["current_tool_call"] = event["actionName"]
         execution["argument_buffer"] = ""
+        execution["argument_parser"] = None
     elif event["type"] == RuntimeEventTypes.ACTION_EXECUTION_ARGS:
         execution["argument_buffer"] += event["args"]
 
@@ -305,9 +321,18 @@ def predict_state(
         if execution["current_tool_call"] not in tool_names:
             return None
 
+        # parse incrementally instead of re-parsing the whole buffer on every chunk
+        parser = execution.get("argument_parser")
+        if parser is None:
+            parser = IncrementalJSONParser()
+            parser.feed(execution["argument_buffer"])
+            execution["argument_parser"] = parser
+        else:
+            parser.feed(event["args"])
+
         current_arguments = {}
         try:
-            current_arguments = PartialJSONParser().parse(execution["argument_buffer"])
+            current_arguments = parser.get_value()
         except:  # pylint: disable=bare-except
             return None
 
@@ -0,0 +1,389 @@
+"""
+Resumable agent runs.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import (
+    Any, AsyncIterator, Callable, Deque, Dict, Hashable, List, Mapping, Optional, Tuple, cast
+)
+from typing_extensions import TypedDict
+
+from .exc import IdempotencyKeyConflictException, RunEventsExpiredException
+from .logging import get_logger
+from .metrics import get_metrics
+from .serializer import EventFormat, encode_error_event, use_event_format
+from .streaming import count_events, skip_events
+
+logger = get_logger(__name__)
+
+DEFAULT_RUN_BUFFER_SIZE = 1000
+DEFAULT_RUN_BUFFER_BYTES = 8 * 1024 * 1024
+DEFAULT_RUN_RETENTION = 60
+DEFAULT_RUN_LINGER_TIMEOUT = 60
+DEFAULT_MAX_RUNS = 1000
+
+
+class ResumableRunsConfig(TypedDict, total=False):
+    """
+    Resumable runs configuration
+
+    Parameters
+    ----------
+    buffer_size : int
+        The number of events buffered per run. Defaults to 1000.
+    max_buffer_bytes : int
+        The maximum size, in bytes (characters for JSON events), of the events buffered per run.
+        Defaults to 8 MiB.
+    retention : float
+        How long, in seconds, a finished run can still be attached to. Defaults to 60.
+    linger_timeout : Optional[float]
+        How long, in seconds, a run keeps running after its last client disconnected. Defaults
+        to 60, None lets runs finish even if nobody attaches again.
+    max_runs : int
+        The maximum number of retained runs. When there are more, the oldest finished runs are
+        dropped. Defaults to 1000.
+    idempotency_scope : Callable[[Mapping[str, Any]], Hashable]
+        The caller a run belongs to, given the request context. Requests with the same
+        idempotency key only attach to runs of the same caller. By default, the `Authorization`
+        and `Cookie` headers and the `properties` of the context identify the caller.
+    """
+    buffer_size: int
+    max_buffer_bytes: int
+    retention: float
+    linger_timeout: Optional[float]
+    max_runs: int
+    idempotency_scope: Callable[[Mapping[str, Any]], Hashable]
+
+
+def default_idempotency_scope(context: Mapping[str, Any]) -> Hashable:
+    """
+    Fingerprint of the caller: the `Authorization` and `Cookie` headers and the `properties` of
+    the context
+    """
+    headers = context.get("headers") or {}
+    return hashlib.sha256(
+        json.dumps(
+            [
+                headers.get("authorization"),
+                headers.get("cookie"),
+                context.get("properties"),
+            ],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=repr
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+class AgentRun:
+    """
+    An agent run whose events are recorded, so that clients can attach to it while it runs and
+    shortly after it finished.
+
+    Every event (line) of the run gets a sequence number, starting at 1. The last `buffer_size`
+    events are kept, as long as they fit in `max_buffer_bytes`. Clients can attach from any
+    sequence number that is still buffered.
+    """
+
+    def __init__( # pylint: disable=too-many-arguments
+            self,
+            *,
+            run_id: str,
+            agent_name: str,
+            thread_id: str,
+            idempotency_key: Optional[str] = None,
+            buffer_size: int = DEFAULT_RUN_BUFFER_SIZE,
+            max_buffer_bytes: int = DEFAULT_RUN_BUFFER_BYTES,
+            linger_timeout: Optional[float] = DEFAULT_RUN_LINGER_TIMEOUT,
+            event_format: EventFormat = "json",
+        ):
+        self.run_id = run_id
+        self.agent_name = agent_name
+        self.thread_id = thread_id
+        self.idempotency_key = idempotency_key
+        self.buffer_size = buffer_size
+        self.max_buffer_bytes = max_buffer_bytes
+        self.linger_timeout = linger_timeout
+        # the events are recorded in the format of the request that started the run
+        self.event_format = event_format
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+        # (sequence number of the first event, number of events, chunk, size of the chunk)
+        self._entries: Deque[Tuple[int, int, Any, int]] = deque()
+        self._buffered = 0
+        self._buffered_bytes = 0
+        self._first_seq = 1
+        self._next_seq = 1
+        self._waiters: List[Future] = []
+        self._subscribers = 0
+        self._attach_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def finished(self) -> bool:
+        """Whether the run has finished"""
+        return self.finished_at is not None
+
+    @property
+    def last_seq(self) -> int:
+        """The sequence number of the last recorded event, 0 if there is none yet"""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """The sequence number of the oldest buffered event"""
+        return self._first_seq
+
+    def start(self, events: Any):
+        """Start recording the events of the run in the background"""
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(self._record(events))
+
+    def fail(self, exc: Exception):
+        """Finish a run that could not be started with an error event"""
+        self._append(self._error_event(exc))
+        self._finish()
+
+    async def _record(self, events: Any):
+        try:
+            async for chunk in events:
+                self._append(chunk)
+        except asyncio.CancelledError:
+            pass
+        except Exception as exc: # pylint: disable=broad-except
+            logger.error("Agent run %s failed: %s", self.run_id, exc, exc_info=True)
+            self._append(self._error_event(exc))
+        finally:
+            try:
+                if hasattr(events, "aclose"):
+                    await events.aclose()
+            finally:
+                self._finish()
+
+    def _error_event(self, exc: Exception) -> Any:
+        with use_event_format(self.event_format):
+            return encode_error_event(exc, agent_name=self.agent_name, thread_id=self.thread_id)
+
+    def _append(self, chunk: Any):
+        count = count_events(chunk)
+        size = len(chunk) if isinstance(chunk, (str, bytes, bytearray)) else 0
+        with self._lock:
+            self._entries.append((self._next_seq, count, chunk, size))
+            self._next_seq += count
+            self._buffered += count
+            self._buffered_bytes += size
+            while (
+                self._buffered > self.buffer_size or
+                self._buffered_bytes > self.max_buffer_bytes
+            ) and len(self._entries) > 1:
+                _, dropped, _, dropped_size = self._entries.popleft()
+                self._buffered -= dropped
+                self._buffered_bytes -= dropped_size
+                self._first_seq = self._entries[0][0]
+            waiters, self._waiters = self._waiters, []
+        _notify(waiters)
+
+    def _finish(self):
+        with self._lock:
+            if self.finished_at is not None:
+                return
+            self.finished_at = time.monotonic()
+            waiters, self._waiters = self._waiters, []
+        _notify(waiters)
+
+    def check(self, after: int):
+        """Raise `RunEventsExpiredException` if the events after `after` are no longer buffered"""
+        if after + 1 < self._first_seq:
+            raise RunEventsExpiredException(self.run_id, after, self._first_seq)
+
+    async def stream(self, after: int = 0) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Stream the recorded events after sequence number `after` until the run finishes, as
+        `(sequence number of the last event in the chunk, chunk)` tuples.
+        """
+        position = after
+        self._attach()
+        try:
+            while True:
+                with self._lock:
+                    expired = position + 1 < self._first_seq
+                    pending = []
+                    for entry in reversed(self._entries):
+                        if entry[0] + entry[1] - 1 <= position:
+                            break
+                        pending.append(entry)
+                    pending.reverse()
+                    done = self.finished_at is not None
+                    waiter: Optional[Future] = None
+                    if not expired and not pending and not done:
+                        waiter = Future()
+                        self._waiters.append(waiter)
+
+                if expired:
+                    # the client fell too far behind
+                    yield position, self._error_event(
+                        RunEventsExpiredException(self.run_id, position, self._first_seq)
+                    )
+                    return
+
+                for seq, count, chunk, _ in pending:
+                    if seq <= position:
+                        chunk = skip_events(chunk, position - seq + 1)
+                    position = seq + count - 1
+                    yield position, chunk
+
+                if waiter is not None:
+                    await asyncio.wrap_future(waiter)
+                elif not pending and done:
+                    return
+        finally:
+            self._detach()
+
+    def _attach(self):
+        with self._lock:
+            self._subscribers += 1
+            self._attach_count += 1
+
+    def _detach(self):
+        with self._lock:
+            self._subscribers -= 1
+            abandoned = self._subscribers == 0 and self.finished_at is None
+            attach_count = self._attach_count
+        if not abandoned or self.linger_timeout is None or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(
+                self._loop.call_later,
+                self.linger_timeout,
+                self._cancel_if_abandoned,
+                attach_count
+            )
+        except RuntimeError:
+            # the event loop of the run is closed
+            pass
+
+    def _cancel_if_abandoned(self, attach_count: int):
+        with self._lock:
+            abandoned = self._subscribers == 0 and self._attach_count == attach_count
+        if abandoned and self._task is not None and not self._task.done():
+            logger.info("Nobody attached to run %s, cancelling it", self.run_id)
+            get_metrics().increment("agent_runs_abandoned", agent=self.agent_name)
+            self._task.cancel()
+
+
+def _notify(waiters: List[Future]):
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class AgentRunRegistry:
+    """
+    Keeps the resumable runs by id and by idempotency key. Idempotency keys are scoped to the
+    agent and the caller (see `idempotency_scope`), and bound to the thread of their run.
+
+    Runs are recorded in the background, independently of the client that started them: when
+    the client disconnects, the run keeps going for `linger_timeout` seconds so that the client
+    can attach to it again. Finished runs are retained for `retention` seconds.
+    """
+
+    def __init__(self, config: Optional[ResumableRunsConfig] = None):
+        config = config or {}
+        self.buffer_size = config.get("buffer_size", DEFAULT_RUN_BUFFER_SIZE)
+        self.max_buffer_bytes = config.get("max_buffer_bytes", DEFAULT_RUN_BUFFER_BYTES)
+        self.retention = config.get("retention", DEFAULT_RUN_RETENTION)
+        self.linger_timeout = config.get("linger_timeout", DEFAULT_RUN_LINGER_TIMEOUT)
+        self.max_runs = config.get("max_runs", DEFAULT_MAX_RUNS)
+        self.idempotency_scope = config.get("idempotency_scope", default_idempotency_scope)
+        self._lock = threading.Lock()
+        self._runs: "OrderedDict[str, AgentRun]" = OrderedDict()
+        # (agent name, caller, idempotency key) -> run
+        self._by_key: Dict[Tuple[str, Hashable, str], AgentRun] = {}
+        self._keys: Dict[str, Tuple[str, Hashable, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._runs)
+
+    def get(self, run_id: str) -> Optional[AgentRun]:
+        """Get a run by id"""
+        with self._lock:
+            self._purge()
+            return self._runs.get(run_id)
+
+    def create(
+            self,
+            *,
+            agent_name: str,
+            thread_id: str,
+            idempotency_key: Optional[str] = None,
+            context: Optional[Mapping[str, Any]] = None,
+            event_format: EventFormat = "json",
+        ) -> Tuple[AgentRun, bool]:
+        """
+        Create a run, or return the existing run of the same agent and caller (see
+        `idempotency_scope`) with the same idempotency key. Returns the run and whether it was
+        created.
+
+        Raises `IdempotencyKeyConflictException` if the existing run is on another thread.
+        """
+        key = (
+            (agent_name, self.idempotency_scope(context or {}), idempotency_key)
+            if idempotency_key is not None
+            else None
+        )
+        with self._lock:
+            self._purge()
+            existing = self._by_key.get(key) if key is not None else None
+            if existing is not None:
+                if existing.thread_id != thread_id:
+                    raise IdempotencyKeyConflictException(
+                        agent_name,
+                        cast(str, idempotency_key),
+                        existing.thread_id
+                    )
+                get_metrics().increment("agent_runs_deduplicated", agent=agent_name)
+                return existing, False
+            run = AgentRun(
+                run_id=str(uuid.uuid4()),
+                agent_name=agent_name,
+                thread_id=thread_id,
+                idempotency_key=idempotency_key,
+                buffer_size=self.buffer_size,
+                max_buffer_bytes=self.max_buffer_bytes,
+                linger_timeout=self.linger_timeout,
+                event_format=event_format,
+            )
+            self._runs[run.run_id] = run
+            if key is not None:
+                self._by_key[key] = run
+                self._keys[run.run_id] = key
+            return run, True
+
+    def discard(self, run: AgentRun):
+        """Remove a run, e.g. because it could not be started"""
+        with self._lock:
+            self._remove(run)
+
+    def _remove(self, run: AgentRun):
+        self._runs.pop(run.run_id, None)
+        key = self._keys.pop(run.run_id, None)
+        if key is not None and self._by_key.get(key) is run:
+            del self._by_key[key]
+
+    def _purge(self):
+        now = time.monotonic()
+        finished = [run for run in self._runs.values() if run.finished_at is not None]
+        excess = len(self._runs) - self.max_runs
+        for run in finished:
+            if excess > 0 or now - cast(float, run.finished_at) > self.retention:
+                self._remove(run)
+                excess -= 1
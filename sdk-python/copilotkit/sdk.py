@@ -1,21 +1,39 @@
 """CopilotKit SDK"""
 
+import asyncio
+import copy
+import hashlib
+import json
 import warnings
 from importlib import metadata
 
-from pprint import pformat
-from typing import List, Callable, Union, Optional, Any, Coroutine
+from typing import List, Callable, Union, Optional, Any, Coroutine, Dict, Hashable, Sequence
 from typing_extensions import TypedDict, Tuple, cast, Mapping
 from .agent import Agent, AgentDict
 from .action import Action, ActionDict, ActionResultDict
-from .types import Message, MetaEvent
+from .types import Message, MetaEvent, EventFilter
 from .exc import (
     ActionNotFoundException,
     AgentNotFoundException,
     ActionExecutionException,
-    AgentExecutionException
+    ActionTimeoutException,
+    AgentExecutionException,
+    AgentResyncRequiredException,
+    RunQueueTimeoutException,
+    RunNotFoundException,
 )
-from .logging import get_logger, bold
+from .logging import get_logger, RequestLogger, RequestLoggingConfig
+from .cache import LRUCache
+from .admission import (
+    AdmissionController,
+    RunTicket,
+    DEFAULT_RUN_QUEUE_SIZE,
+    DEFAULT_RUN_QUEUE_TIMEOUT,
+)
+from .serializer import encode_event, encode_error_event, EventFormat
+from .thread_runs import ThreadRunRegistry, ThreadRunPolicy, ThreadRun
+from .runs import AgentRun, AgentRunRegistry, ResumableRunsConfig
+from .streaming import with_event_format
 
 
 try:
@@ -29,6 +47,12 @@ COPILOTKIT_SDK_VERSION = __version__
 
 logger = get_logger(__name__)
 
+DEFAULT_MAX_BATCH_CONCURRENCY = 10
+DEFAULT_INFO_CACHE_SIZE = 1000
+DEFAULT_INFO_CACHE_TTL = 60
+DEFAULT_FACTORY_CACHE_SIZE = 100
+DEFAULT_FACTORY_CACHE_TTL = 300
+
 class InfoDict(TypedDict):
     """
     Info dictionary
@@ -57,6 +81,84 @@ class CopilotKitContext(TypedDict):
 # Alias for backwards compatibility
 CopilotKitSDKContext = CopilotKitContext
 
+class InfoPayload:
+    """
+    Precomputed info response: the info dict, its JSON encoding and a strong ETag.
+
+    Payloads are cached and shared between requests, don't modify them.
+    """
+
+    def __init__(self, info: InfoDict, sources: Tuple[Any, ...] = ()):
+        self.info = info
+        self.body = json.dumps(
+            info,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+            default=str
+        ).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        # keep the actions and agents the payload was built from alive, so that their ids (used
+        # in the cache key) are not reused
+        self._sources = sources
+        self._html: Optional[str] = None
+
+    @property
+    def html(self) -> str:
+        """The HTML view of the info, rendered once"""
+        if self._html is None:
+            from .html import generate_info_html # pylint: disable=import-outside-toplevel
+            self._html = generate_info_html(self.info)
+        return self._html
+
+    @property
+    def html_etag(self) -> str:
+        """ETag of the HTML view"""
+        return self.etag[:-1] + '-html"'
+
+# request headers that identify the caller
+DEFAULT_FINGERPRINT_HEADERS = ("authorization", "cookie")
+
+def default_context_fingerprint(
+        context: CopilotKitContext,
+        headers: Sequence[str] = DEFAULT_FINGERPRINT_HEADERS,
+    ) -> Hashable:
+    """
+    Fingerprint of the caller: the `properties` and `frontend_url` of the context and the
+    request `headers` that identify the caller, `Authorization` and `Cookie` by default.
+
+    Other headers are left out, since most of them differ between requests of the same caller
+    (e.g. `x-request-id` or `traceparent`). To key on other headers, pass e.g.
+    `functools.partial(default_context_fingerprint, headers=("authorization", "x-tenant-id"))`.
+    """
+    request_headers = {
+        key.lower(): value for key, value in (context.get("headers") or {}).items()
+    }
+    return hashlib.sha256(
+        json.dumps(
+            [
+                context.get("properties"),
+                context.get("frontend_url"),
+                [request_headers.get(header.lower()) for header in headers],
+            ],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=repr
+        ).encode("utf-8")
+    ).hexdigest()
+
+class ActionBatchItemDict(TypedDict):
+    """An action to execute in a batch"""
+    name: str
+    arguments: dict
+
+class ActionBatchResultDict(TypedDict, total=False):
+    """The result of an action in a batch, either `result` or `error` and `code` is set"""
+    name: str
+    result: Any
+    error: str
+    code: str
+
 
 class CopilotKitRemoteEndpoint:
     """
@@ -205,9 +307,50 @@ class CopilotKitRemoteEndpoint:
         The actions to make available to the Copilot.
     agents : Optional[Union[List[Agent], Callable[[CopilotKitContext], List[Agent]]]]
         The agents to make available to the Copilot.
+    max_batch_concurrency : int
+        The maximum number of actions of a batch (see `execute_actions`) that run concurrently.
+    info_cache_size : int
+        The maximum number of cached info payloads.
+    info_cache_ttl : Optional[float]
+        How long, in seconds, info payloads built by calling `actions` or `agents` are cached.
+        Info payloads of lists are cached until the lists change.
+    info_cache_key : Callable[[CopilotKitContext], Hashable]
+        Fingerprint of the context used to cache info payloads built by calling `actions` or
+        `agents`. By default, `default_context_fingerprint`: the `properties`, the
+        `frontend_url` and the `Authorization` and `Cookie` headers, so that payloads are not
+        shared between callers. Return None to disable caching for a request.
+    request_logging : Optional[RequestLoggingConfig]
+        Level, sampling and truncation of the request logs.
+    factory_cache_size : int
+        The maximum number of cached results of `actions` and `agents` callables.
+    factory_cache_ttl : Optional[float]
+        How long, in seconds, the results of `actions` and `agents` callables are reused.
+    factory_cache_key : Optional[Callable[[CopilotKitContext], Hashable]]
+        Fingerprint of the context the results of `actions` and `agents` callables are cached
+        by, e.g. `default_context_fingerprint`. Return None to call the callable for a request.
+        By default, the results are not cached and the callables are called on every request.
+    max_concurrent_runs : Optional[int]
+        The maximum number of agent runs executing at the same time.
+    max_concurrent_runs_per_agent : Optional[Union[int, Dict[str, int]]]
+        The maximum number of runs executing at the same time per agent, or a limit per agent
+        name.
+    run_queue_size : int
+        The maximum number of runs waiting for a slot when a limit is reached. Further runs are
+        rejected with `RunQueueFullException` (429 Too Many Requests).
+    run_queue_timeout : Optional[float]
+        How long, in seconds, a run waits for a slot, or for the previous run on its thread,
+        before it fails.
+    thread_run_policy : Optional[ThreadRunPolicy]
+        What to do when a run starts on a thread where the agent is already running: `"queue"`
+        (wait for the previous run), `"reject"` (raise `ThreadBusyException`, 409 Conflict) or
+        `"cancel_previous"`. By default (None), runs on the same thread are not coordinated.
+    resumable_runs : Optional[ResumableRunsConfig]
+        Record the events of agent runs, so that clients can attach to a run again after their
+        connection dropped, and requests repeated with the same idempotency key attach to the
+        existing run. Pass `{}` to enable with the default settings.
     """
 
-    def __init__(
+    def __init__( # pylint: disable=too-many-arguments
         self,
         *,
         actions: Optional[
@@ -222,9 +365,67 @@ class CopilotKitRemoteEndpoint:
                 Callable[[CopilotKitContext], List[Agent]]
             ]
         ] = None,
+        max_batch_concurrency: int = DEFAULT_MAX_BATCH_CONCURRENCY,
+        info_cache_size: int = DEFAULT_INFO_CACHE_SIZE,
+        info_cache_ttl: Optional[float] = DEFAULT_INFO_CACHE_TTL,
+        info_cache_key: Callable[[CopilotKitContext], Hashable] = default_context_fingerprint,
+        request_logging: Optional[RequestLoggingConfig] = None,
+        factory_cache_size: int = DEFAULT_FACTORY_CACHE_SIZE,
+        factory_cache_ttl: Optional[float] = DEFAULT_FACTORY_CACHE_TTL,
+        factory_cache_key: Optional[Callable[[CopilotKitContext], Hashable]] = None,
+        max_concurrent_runs: Optional[int] = None,
+        max_concurrent_runs_per_agent: Optional[Union[int, Dict[str, int]]] = None,
+        run_queue_size: int = DEFAULT_RUN_QUEUE_SIZE,
+        run_queue_timeout: Optional[float] = DEFAULT_RUN_QUEUE_TIMEOUT,
+        thread_run_policy: Optional[ThreadRunPolicy] = None,
+        resumable_runs: Optional[ResumableRunsConfig] = None,
     ):
         self.agents = agents or []
         self.actions = actions or []
+        self.max_batch_concurrency = max_batch_concurrency
+        self.info_cache_ttl = info_cache_ttl
+        self.info_cache_key = info_cache_key
+        self.info_cache: LRUCache[InfoPayload] = LRUCache(max_entries=info_cache_size)
+        self.request_logger = RequestLogger(logger, request_logging)
+        self.factory_cache_key = factory_cache_key
+        # agents created by a callable keep their caches (e.g. thread state) between requests
+        self.factory_cache: LRUCache[list] = LRUCache(
+            max_entries=factory_cache_size,
+            ttl=factory_cache_ttl
+        )
+        self.admission = AdmissionController(
+            max_concurrent_runs=max_concurrent_runs,
+            max_concurrent_runs_per_agent=max_concurrent_runs_per_agent,
+            queue_size=run_queue_size,
+            queue_timeout=run_queue_timeout,
+        )
+        self.thread_runs = (
+            ThreadRunRegistry(thread_run_policy, queue_timeout=run_queue_timeout)
+            if thread_run_policy is not None
+            else None
+        )
+        self.runs = AgentRunRegistry(resumable_runs) if resumable_runs is not None else None
+
+    def _resolve(self, kind: str, source: Any, context: CopilotKitContext) -> list:
+        if not callable(source):
+            return source
+        fingerprint = (
+            self.factory_cache_key(context) if self.factory_cache_key is not None else None
+        )
+        if fingerprint is None:
+            return source(context)
+        key = (kind, fingerprint)
+        result = self.factory_cache.get(key)
+        if result is None:
+            result = source(context)
+            self.factory_cache.set(key, result)
+        return result
+
+    def _get_actions(self, context: CopilotKitContext) -> List[Action]:
+        return self._resolve("actions", self.actions, context)
+
+    def _get_agents(self, context: CopilotKitContext) -> List[Agent]:
+        return self._resolve("agents", self.agents, context)
 
     def info(
         self,
@@ -234,9 +435,34 @@ class CopilotKitRemoteEndpoint:
         """
         Returns information about available actions and agents
         """
+        # the cached payload is shared between requests
+        return copy.deepcopy(self.info_payload(context=context).info)
+
+    def info_payload(
+        self,
+        *,
+        context: CopilotKitContext
+    ) -> InfoPayload:
+        """
+        Returns the cached info payload, building it if needed
+        """
+        dynamic = callable(self.actions) or callable(self.agents)
+        key: Optional[Hashable] = (
+            # lists are identified by their items, so that changes to them are picked up
+            tuple(id(action) for action in self.actions) if not callable(self.actions) else None,
+            tuple(id(agent) for agent in self.agents) if not callable(self.agents) else None,
+        )
+        if dynamic:
+            fingerprint = self.info_cache_key(context)
+            key = (key, fingerprint) if fingerprint is not None else None
 
-        actions = self.actions(context) if callable(self.actions) else self.actions
-        agents = self.agents(context) if callable(self.agents) else self.agents
+        if key is not None:
+            payload = self.info_cache.get(key)
+            if payload is not None:
+                return payload
+
+        actions = self._get_actions(context)
+        agents = self._get_agents(context)
 
         actions_list = [action.dict_repr() for action in actions]
         agents_list = [agent.dict_repr() for agent in agents]
@@ -250,11 +476,17 @@ class CopilotKitRemoteEndpoint:
             ]
         )
 
-        return {
-            "actions": actions_list,
-            "agents": agents_list,
-            "sdkVersion": COPILOTKIT_SDK_VERSION
-        }
+        payload = InfoPayload(
+            {
+                "actions": actions_list,
+                "agents": agents_list,
+                "sdkVersion": COPILOTKIT_SDK_VERSION
+            },
+            sources=(tuple(actions), tuple(agents))
+        )
+        if key is not None:
+            self.info_cache.set(key, payload, ttl=self.info_cache_ttl if dynamic else None)
+        return payload
 
     def _get_action(
         self,
@@ -265,7 +497,7 @@ class CopilotKitRemoteEndpoint:
         """
         Get an action by name
         """
-        actions = self.actions(context) if callable(self.actions) else self.actions
+        actions = self._get_actions(context)
         action = next((action for action in actions if action.name == name), None)
         if action is None:
             raise ActionNotFoundException(name)
@@ -288,17 +520,72 @@ class CopilotKitRemoteEndpoint:
             title="Handling execute action request:",
             data=[
                 ("Context", context),
-                ("Action", action.dict_repr()),
+                ("Action", action.dict_repr),
                 ("Arguments", arguments),
             ]
         )
 
         try:
-            result = action.execute(arguments=arguments)
+            result = action.execute(arguments=arguments, context=context)
             return result
         except Exception as error:
             raise ActionExecutionException(name, error) from error
 
+    async def execute_actions(
+            self,
+            *,
+            context: CopilotKitContext,
+            actions: List[ActionBatchItemDict],
+            max_concurrency: Optional[int] = None,
+    ) -> List[ActionBatchResultDict]:
+        """
+        Execute a batch of actions concurrently
+
+        At most `max_concurrency` (by default `max_batch_concurrency`) actions run at the same
+        time. Results are returned in the order of `actions`, a failing action does not fail the
+        batch.
+        """
+        available_actions = self._get_actions(context)
+        actions_by_name: Dict[str, Action] = {}
+        for action in available_actions:
+            actions_by_name.setdefault(action.name, action)
+
+        self._log_request_info(
+            title="Handling execute actions request:",
+            data=[
+                ("Context", context),
+                ("Actions", actions),
+            ]
+        )
+
+        limit = min(
+            max_concurrency or self.max_batch_concurrency,
+            self.max_batch_concurrency
+        )
+        semaphore = asyncio.Semaphore(max(limit, 1))
+
+        async def execute(item: ActionBatchItemDict) -> ActionBatchResultDict:
+            name = item.get("name")
+            action = actions_by_name.get(name) if isinstance(name, str) else None
+            if action is None:
+                exc = ActionNotFoundException(str(name))
+                return {"name": str(name), "error": str(exc), "code": "action_not_found"}
+            async with semaphore:
+                try:
+                    result = await action.execute(
+                        arguments=item.get("arguments") or {},
+                        context=context
+                    )
+                    return {"name": name, "result": result["result"]}
+                except ActionTimeoutException as exc:
+                    return {"name": name, "error": str(exc), "code": "action_timeout"}
+                except Exception as error: # pylint: disable=broad-except
+                    exc = ActionExecutionException(name, error)
+                    logger.error("Action execution error: %s", exc)
+                    return {"name": name, "error": str(exc), "code": "action_error"}
+
+        return list(await asyncio.gather(*[execute(item) for item in actions]))
+
     def execute_agent( # pylint: disable=too-many-arguments
         self,
         *,
@@ -311,11 +598,18 @@ class CopilotKitRemoteEndpoint:
         actions: List[ActionDict],
         node_name: str,
         meta_events: Optional[List[MetaEvent]] = None,
+        event_filter: Optional[EventFilter] = None,
+        last_message_id: Optional[str] = None,
+        messages_after: Optional[str] = None,
+        event_format: EventFormat = "json",
     ) -> Any:
         """
         Execute an agent
+
+        Events are streamed as newline delimited JSON, or with `event_format="msgpack"` as
+        length-prefixed MessagePack frames.
         """
-        agents = self.agents(context) if callable(self.agents) else self.agents
+        agents = self._get_agents(context)
         agent = next((agent for agent in agents if agent.name == name), None)
         if agent is None:
             raise AgentNotFoundException(name)
@@ -324,7 +618,7 @@ class CopilotKitRemoteEndpoint:
             title="Handling execute agent request:",
             data=[
                 ("Context", context),
-                ("Agent", agent.dict_repr()),
+                ("Agent", agent.dict_repr),
                 ("Thread ID", thread_id),
                 ("Node Name", node_name),
                 ("State", state),
@@ -332,22 +626,118 @@ class CopilotKitRemoteEndpoint:
                 ("Messages", messages),
                 ("Actions", actions),
                 ("MetaEvents", meta_events),
+                ("Event Filter", event_filter),
+                ("Last Message ID", last_message_id),
+                ("Messages After", messages_after),
             ]
         )
 
         try:
-            return agent.execute(
+            events = agent.execute(
                 thread_id=thread_id,
                 node_name=node_name,
                 state=state,
                 config=config,
                 messages=messages,
                 actions=actions,
-                meta_events=meta_events
+                meta_events=meta_events,
+                event_filter=event_filter,
+                last_message_id=last_message_id,
+                messages_after=messages_after
             )
+        except AgentResyncRequiredException:
+            raise
         except Exception as error:
             raise AgentExecutionException(name, error) from error
 
+        if (self.thread_runs is not None and thread_id) or self.admission.enabled:
+            events = self._run_admitted(events, name=name, thread_id=thread_id)
+        if event_format != "json":
+            events = with_event_format(events, event_format)
+        return events
+
+    async def _run_admitted(self, events: Any, *, name: str, thread_id: str):
+        """
+        Stream the events of a run once it is admitted: reserve its thread and take a run slot,
+        waiting in the queue if needed.
+
+        Both are only taken while the stream is iterated and are released when it ends or is
+        closed, so a stream that is never iterated holds nothing. Raises `ThreadBusyException`
+        or `RunQueueFullException` on the first iteration if the run is rejected.
+        """
+        thread_run: Optional[ThreadRun] = None
+        ticket: Optional[RunTicket] = None
+        try:
+            # raises ThreadBusyException if the thread is busy and the policy is "reject"
+            if self.thread_runs is not None and thread_id:
+                thread_run = self.thread_runs.reserve(name, thread_id)
+            # raises RunQueueFullException if the run can't be queued
+            ticket = self.admission.admit(name) if self.admission.enabled else None
+
+            if ticket is not None and ticket.queued:
+                try:
+                    async for event in self._wait_for_slot(ticket, name=name, thread_id=thread_id):
+                        yield event
+                except RunQueueTimeoutException as exc:
+                    yield encode_error_event(exc, agent_name=name, thread_id=thread_id)
+                    return
+
+            # runs hold their admission slot while waiting for their thread, so that a run
+            # holding its thread never waits for a slot
+            if thread_run is not None:
+                events = thread_run.stream(events)
+            async for event in events:
+                yield event
+        finally:
+            try:
+                if hasattr(events, "aclose"):
+                    await events.aclose()
+            finally:
+                if ticket is not None:
+                    ticket.release()
+                if thread_run is not None:
+                    thread_run.close()
+
+    async def _wait_for_slot(self, ticket: RunTicket, *, name: str, thread_id: str):
+        """
+        Wait for the slot of a queued run, letting the client know its position in the queue
+        whenever it changes
+        """
+        wait = asyncio.ensure_future(ticket.wait())
+        position_changed: Optional[asyncio.Future] = None
+        position = 0
+        try:
+            while not wait.done():
+                position_changed = asyncio.wrap_future(ticket.watch_position())
+                if 0 < ticket.position != position:
+                    position = ticket.position
+                    yield encode_event({
+                        "event": "on_copilotkit_run_queued",
+                        "data": {
+                            "position": position,
+                            "thread_id": thread_id,
+                            "agent_name": name,
+                        }
+                    })
+                await asyncio.wait({wait, position_changed}, return_when=asyncio.FIRST_COMPLETED)
+            # raises RunQueueTimeoutException if the queue timeout passed
+            await wait
+        finally:
+            if position_changed is not None:
+                position_changed.cancel()
+            if not wait.done():
+                wait.cancel()
+                await asyncio.gather(wait, return_exceptions=True)
+
+    def get_agent_run(self, *, run_id: str) -> AgentRun:
+        """
+        Get a resumable agent run
+        """
+        run = self.runs.get(run_id) if self.runs is not None else None
+        if run is None:
+            raise RunNotFoundException(run_id)
+        return run
+
     async def get_agent_state(
         self,
         *,
@@ -358,7 +748,7 @@ class CopilotKitRemoteEndpoint:
         """
         Get agent state
         """
-        agents = self.agents(context) if callable(self.agents) else self.agents
+        agents = self._get_agents(context)
         agent = next((agent for agent in agents if agent.name == name), None)
         if agent is None:
             raise AgentNotFoundException(name)
@@ -367,7 +757,7 @@ class CopilotKitRemoteEndpoint:
             title="Handling get agent state request:",
             data=[
                 ("Context", context),
-                ("Agent", agent.dict_repr()),
+                ("Agent", agent.dict_repr),
                 ("Thread ID", thread_id),
             ]
         )
@@ -378,14 +768,10 @@ class CopilotKitRemoteEndpoint:
 
     def _log_request_info(self, title: str, data: List[Tuple[str, Any]]):
         """
-        Log request info
+        Log request info. Values are only formatted (and called, if callable) when the request is
+        logged.
         """
-        logger.info(bold(title))
-        logger.info("--------------------------")
-        for key, value in data:
-            logger.info(bold(key+":"))
-            logger.info(pformat(value))
-        logger.info("--------------------------")
+        self.request_logger.log(title, data)
 
 # Alias for backwards compatibility
 class CopilotKitSDK(CopilotKitRemoteEndpoint):
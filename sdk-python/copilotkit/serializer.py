@@ -0,0 +1,379 @@
+"""
+Event serialization for CopilotKit streams.
+
+All events streamed by CopilotKit agents (LangGraph events, state syncs and runtime protocol
+events) are serialized through the serializer returned by `get_event_serializer`.
+
+The default serializer produces exactly the same output as `langchain.load.dump.dumps`, but
+serializes LangChain objects (e.g. message chunks) with a per-class cached plan instead of
+calling `Serializable.to_json` for every object. If `orjson` is installed, it can be enabled with
+`set_event_serializer("orjson")` or by setting `COPILOTKIT_EVENT_SERIALIZER=orjson`. The orjson
+serializer produces equivalent, but more compact JSON (no whitespace after separators and
+non-ASCII characters are not escaped).
+
+Events are streamed in one of two event formats, selected per request with `use_event_format`:
+`"json"` (newline delimited JSON, the default) or `"msgpack"` (length-prefixed MessagePack
+frames, see `copilotkit.framing`). Both encode the same objects.
+"""
+
+import contextvars
+import json
+import os
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Literal, Optional, Tuple, Union
+
+from langchain_core.load.serializable import Serializable, to_json_not_implemented
+from langchain_core.load.dump import dumps as langchain_dumps
+
+from .logging import get_logger
+from .framing import frame, packb
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+logger = get_logger(__name__)
+
+
+class EventSerializer(ABC):
+    """Serializes a single event to a JSON string"""
+    name: str
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> str:
+        """Serialize a LangChain/LangGraph event"""
+
+    def dumps_runtime_event(self, event: Any) -> str:
+        """Serialize a CopilotKit runtime protocol event"""
+        if isinstance(event, dict):
+            event = {k: (v.value if isinstance(v, Enum) else v) for k, v in event.items()}
+        return self.dumps(event)
+
+
+class _SerializablePlan:  # pylint: disable=too-few-public-methods
+    """Cached information needed to serialize instances of a `Serializable` class"""
+    __slots__ = ("lc_id", "fields", "attribute_getters")
+
+    def __init__(
+            self,
+            lc_id: List[str],
+            fields: Dict[str, Any],
+            attribute_getters: List[Callable]
+        ):
+        self.lc_id = lc_id
+        self.fields = fields
+        self.attribute_getters = attribute_getters
+
+
+_PLANS: Dict[type, Optional[_SerializablePlan]] = {}
+
+
+def _resolve_getter(mro: Tuple[type, ...], attr: str) -> Optional[Callable]:
+    for cls in mro:
+        if attr in cls.__dict__:
+            prop = cls.__dict__[attr]
+            return getattr(prop, "fget", None)
+    return None
+
+
+def _make_plan(cls: type) -> Optional[_SerializablePlan]:
+    """
+    Build a serialization plan mirroring `Serializable.to_json`, or return None if instances
+    of this class must be serialized with `to_json`.
+    """
+    try:
+        if not cls.is_lc_serializable():  # type: ignore
+            return None
+
+        mro = cls.mro()
+        base_index = mro.index(Serializable)
+        base_secrets = Serializable.__dict__["lc_secrets"].fget
+        base_attributes = Serializable.__dict__["lc_attributes"].fget
+
+        attribute_getters = []
+        # to_json visits `self` and then `super(cls, self)` for every class before Serializable
+        for start in range(0, base_index + 1):
+            if start > 0 and (
+                hasattr(mro[start - 1], "lc_namespace") or
+                hasattr(mro[start - 1], "lc_serializable")
+            ):
+                # deprecated attributes: let to_json raise the appropriate error
+                return None
+            secrets_getter = _resolve_getter(tuple(mro[start:]), "lc_secrets")
+            if secrets_getter is not base_secrets:
+                return None
+            attributes_getter = _resolve_getter(tuple(mro[start:]), "lc_attributes")
+            if attributes_getter is None:
+                return None
+            if attributes_getter is not base_attributes:
+                attribute_getters.append(attributes_getter)
+
+        fields = {
+            name: field
+            for name, field in cls.model_fields.items()  # type: ignore
+            if not field.exclude
+        }
+        return _SerializablePlan(cls.lc_id(), fields, attribute_getters)  # type: ignore
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def _try_neq_default(value: Any, field: Any) -> bool:
+    try:
+        return bool(field.get_default() != value)
+    except Exception:  # pylint: disable=broad-except
+        try:
+            return all(field.get_default() != value)
+        except Exception:  # pylint: disable=broad-except
+            try:
+                return value is not field.default
+            except Exception:  # pylint: disable=broad-except
+                return False
+
+
+def _is_field_useful(field: Any, value: Any) -> bool:
+    if field.is_required():
+        return True
+    try:
+        if value:
+            return True
+    except Exception:  # pylint: disable=broad-except
+        pass
+    if field.default_factory is dict and isinstance(value, dict):
+        return False
+    if field.default_factory is list and isinstance(value, list):
+        return False
+    return _try_neq_default(value, field)
+
+
+def serializable_to_json(obj: Serializable) -> Any:
+    """Equivalent of `obj.to_json()` using a cached per-class plan"""
+    cls = type(obj)
+    try:
+        plan = _PLANS[cls]
+    except KeyError:
+        plan = _PLANS[cls] = _make_plan(cls)
+
+    if plan is None:
+        return obj.to_json()
+
+    lc_kwargs = {}
+    fields = plan.fields
+    for key, value in obj.__dict__.items():
+        field = fields.get(key)
+        if field is None or not _is_field_useful(field, value):
+            continue
+        lc_kwargs[key] = value
+
+    for getter in plan.attribute_getters:
+        lc_kwargs.update(getter(obj))
+
+    return {
+        "lc": 1,
+        "type": "constructor",
+        "id": plan.lc_id,
+        "kwargs": lc_kwargs,
+    }
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Serializable):
+        return serializable_to_json(obj)
+    return to_json_not_implemented(obj)
+
+
+def _runtime_event_default(obj: Any) -> Any:
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JSONEventSerializer(EventSerializer):
+    """Standard library serializer, byte-for-byte compatible with `langchain_dumps`"""
+    name = "json"
+
+    def dumps(self, obj: Any) -> str:
+        if not isinstance(obj, dict):
+            return langchain_dumps(obj)
+        try:
+            return json.dumps(obj, default=_default)
+        except TypeError:
+            return json.dumps(to_json_not_implemented(obj))
+
+    def dumps_runtime_event(self, event: Any) -> str:
+        return json.dumps(event, default=_runtime_event_default)
+
+
+def _orjson_default(obj: Any) -> Any:
+    # unlike json, orjson serializes enums by value natively
+    if isinstance(obj, Serializable):
+        return serializable_to_json(obj)
+    return to_json_not_implemented(obj)
+
+
+class OrjsonEventSerializer(EventSerializer):
+    """orjson based serializer, produces compact JSON"""
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("orjson is not installed, run `pip install orjson`")
+        self._fallback = JSONEventSerializer()
+
+    def dumps(self, obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, default=_orjson_default).decode("utf-8")
+        except TypeError:
+            # e.g. integers larger than 64 bit or non-string keys
+            return self._fallback.dumps(obj)
+
+    def dumps_runtime_event(self, event: Any) -> str:
+        try:
+            # orjson serializes enums by value
+            return orjson.dumps(event).decode("utf-8")
+        except TypeError:
+            return self._fallback.dumps_runtime_event(event)
+
+
+def _make_serializer(name: str) -> EventSerializer:
+    if name == "json":
+        return JSONEventSerializer()
+    if name == "orjson":
+        return OrjsonEventSerializer()
+    raise ValueError(f"Unknown event serializer '{name}'")
+
+
+def _serializer_from_env() -> EventSerializer:
+    name = os.getenv("COPILOTKIT_EVENT_SERIALIZER", "json").lower()
+    try:
+        return _make_serializer(name)
+    except (ImportError, ValueError) as exc:
+        logger.warning("Falling back to the json event serializer: %s", exc)
+        return JSONEventSerializer()
+
+
+_SERIALIZER: EventSerializer = _serializer_from_env()
+
+
+def get_event_serializer() -> EventSerializer:
+    """Get the event serializer"""
+    return _SERIALIZER
+
+
+def set_event_serializer(serializer: Union[EventSerializer, str]):
+    """
+    Set the event serializer used for all streamed events.
+
+    Pass an `EventSerializer` instance or one of the built-in names: "json" (default) or
+    "orjson" (requires orjson to be installed).
+    """
+    global _SERIALIZER  # pylint: disable=global-statement
+    _SERIALIZER = (
+        _make_serializer(serializer)
+        if isinstance(serializer, str)
+        else serializer
+    )
+
+
+def dumps_event(obj: Any) -> str:
+    """Serialize a LangChain/LangGraph event with the current event serializer"""
+    return _SERIALIZER.dumps(obj)
+
+
+def dumps_runtime_event(event: Any) -> str:
+    """Serialize a runtime protocol event with the current event serializer"""
+    return _SERIALIZER.dumps_runtime_event(event)
+
+
+EventFormat = Literal["json", "msgpack"]
+
+_EVENT_FORMAT: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "copilotkit_event_format",
+    default="json"
+)
+
+
+def get_event_format() -> str:
+    """Get the event format of the current request"""
+    return _EVENT_FORMAT.get()
+
+
+@contextmanager
+def use_event_format(event_format: EventFormat) -> Iterator[None]:
+    """Encode the events in the given format within this block"""
+    if event_format not in ("json", "msgpack"):
+        raise ValueError(f"Unknown event format '{event_format}'")
+    token = _EVENT_FORMAT.set(event_format)
+    try:
+        yield
+    finally:
+        _EVENT_FORMAT.reset(token)
+
+
+def _msgpack_event_default(obj: Any) -> Any:
+    # mirrors the json serializer
+    if type(obj) is int:  # pylint: disable=unidiomatic-typecheck
+        # larger than 64 bit
+        return str(obj)
+    if isinstance(obj, Serializable):
+        return serializable_to_json(obj)
+    if isinstance(obj, Enum) and isinstance(obj, (str, int, float)):
+        # json serializes str, int and float enums by value
+        return obj.value
+    return to_json_not_implemented(obj)
+
+
+def _msgpack_runtime_event_default(obj: Any) -> Any:
+    if type(obj) is int:  # pylint: disable=unidiomatic-typecheck
+        return str(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _pack(obj: Any, default: Callable[[Any], Any], dumps: Callable[[Any], str]) -> bytes:
+    try:
+        return packb(obj, default)
+    except (TypeError, OverflowError):
+        # e.g. non-string keys: pack what json would send
+        return packb(json.loads(dumps(obj)), default)
+
+
+def encode_event(obj: Any) -> Union[str, bytes]:
+    """
+    Encode a LangChain/LangGraph event in the current event format: a JSON line (terminated by a
+    newline) or a MessagePack frame
+    """
+    if _EVENT_FORMAT.get() == "msgpack":
+        return frame(_pack(obj, _msgpack_event_default, dumps_event))
+    return dumps_event(obj) + "\n"
+
+
+def encode_runtime_events(*events: Any) -> Union[str, bytes]:
+    """Encode runtime protocol events in the current event format"""
+    if _EVENT_FORMAT.get() == "msgpack":
+        return b"".join(
+            frame(_pack(event, _msgpack_runtime_event_default, dumps_runtime_event))
+            for event in events
+        )
+    return "\n".join(dumps_runtime_event(event) for event in events) + "\n"
+
+
+def encode_error_event(exc: Exception, *, agent_name: str, thread_id: str) -> Union[str, bytes]:
+    """Encode an `on_copilotkit_error` event in the current event format"""
+    return encode_event({
+        "event": "on_copilotkit_error",
+        "data": {
+            "error": {
+                "message": str(exc),
+                "type": type(exc).__name__,
+                "agent_name": agent_name,
+            },
+            "thread_id": thread_id,
+            "agent_name": agent_name,
+            "node_name": "unknown"
+        }
+    })
@@ -0,0 +1,486 @@
+"""
+Stream processing stages for CopilotKit agents.
+"""
+
+import asyncio
+import zlib
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+from .types import EventFilter, EventFilterRule
+from .framing import count_frames, skip_frames
+from .serializer import EventFormat, use_event_format
+
+DEFAULT_COALESCE_MAX_CHARS = 512
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# preferred first
+STREAM_ENCODINGS = ("gzip", "deflate")
+
+_MISSING = object()
+
+def _content_chunk_key(event: Any) -> Optional[Tuple[Any, Any]]:
+    """
+    Return the (run id, message id) of a content-only chat model stream event, or None if the
+    event can not be merged with its neighbours.
+    """
+    if not isinstance(event, dict) or event.get("event") != "on_chat_model_stream":
+        return None
+    data = event.get("data")
+    chunk = data.get("chunk") if isinstance(data, dict) else None
+    if (
+        not isinstance(chunk, AIMessageChunk) or
+        not isinstance(chunk.content, str) or
+        not chunk.content or
+        chunk.tool_call_chunks or
+        chunk.additional_kwargs
+    ):
+        return None
+    return (event.get("run_id"), chunk.id)
+
+def _merge_content_chunks(pending: dict, event: dict) -> dict:
+    merged_chunk = pending["data"]["chunk"] + event["data"]["chunk"]
+    return {
+        **pending,
+        "data": {
+            **pending["data"],
+            "chunk": merged_chunk,
+        }
+    }
+
+async def coalesce_chat_model_stream(
+        events: AsyncIterator[Any],
+        *,
+        window: float,
+        max_chars: int = DEFAULT_COALESCE_MAX_CHARS,
+    ) -> AsyncIterator[Any]:
+    """
+    Merge consecutive `on_chat_model_stream` content deltas of the same run and message into a
+    single event.
+
+    Buffered content is flushed when `window` seconds have passed since the first buffered
+    delta, when the buffered content reaches `max_chars` characters, or as soon as any other
+    event arrives, so that coalescing never reorders events. Tool call chunks are passed
+    through unchanged.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    pending: Optional[dict] = None
+    pending_key: Optional[Tuple[Any, Any]] = None
+    deadline = 0.0
+    next_event: Optional[asyncio.Future] = None
+
+    try:
+        while True:
+            if pending is None and next_event is None:
+                try:
+                    event = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+            else:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(iterator.__anext__())
+                if pending is not None:
+                    done, _ = await asyncio.wait(
+                        {next_event},
+                        timeout=max(deadline - loop.time(), 0)
+                    )
+                    if not done:
+                        # the window has passed, flush while we keep waiting for the next event
+                        flushed, pending = pending, None
+                        yield flushed
+                        continue
+                future, next_event = next_event, None
+                try:
+                    event = await future
+                except StopAsyncIteration:
+                    break
+
+            key = _content_chunk_key(event)
+            if key is not None and pending is not None and key == pending_key:
+                pending = _merge_content_chunks(pending, event)
+            else:
+                if pending is not None:
+                    flushed, pending = pending, None
+                    yield flushed
+                if key is None:
+                    yield event
+                    continue
+                pending = event
+                pending_key = key
+                deadline = loop.time() + window
+
+            if len(pending["data"]["chunk"].content) >= max_chars:
+                flushed, pending = pending, None
+                yield flushed
+
+        if pending is not None:
+            flushed, pending = pending, None
+            yield flushed
+    except Exception:
+        # don't lose buffered content when the underlying stream fails
+        if pending is not None:
+            flushed, pending = pending, None
+            yield flushed
+        raise
+    finally:
+        if next_event is not None and not next_event.done():
+            next_event.cancel()
+            await asyncio.gather(next_event, return_exceptions=True)
+        # close the source right away, e.g. to stop the graph run when the client went away
+        if hasattr(iterator, "aclose"):
+            await iterator.aclose()
+
+
+async def prime_stream(events: Any) -> Any:
+    """
+    Start an event stream and wait for its first event, so that errors raised before streaming
+    starts can be reported as regular errors. Returns a stream with the same events.
+    """
+    if not hasattr(events, "__aiter__"):
+        return events
+
+    iterator = events.__aiter__()
+    try:
+        first_event = await iterator.__anext__()
+    except StopAsyncIteration:
+        first_event = _MISSING
+
+    async def _primed_stream():
+        try:
+            if first_event is not _MISSING:
+                yield first_event
+                async for event in iterator:
+                    yield event
+        finally:
+            if hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    return _primed_stream()
+
+
+class CancellableStream:
+    """
+    Iterates an event stream in a single background task and hands the events over one at a
+    time, so that the stream can be cancelled with `cancel` from any thread, even while it is
+    waiting for its next event.
+
+    Must be created and iterated on the event loop the stream runs on. After iterating,
+    `cancelled` tells whether the stream ended because it was cancelled.
+    """
+
+    def __init__(self, events: Any):
+        self._events = events
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.ensure_future(self._produce())
+        self._task.add_done_callback(lambda _: self._queue.put_nowait(_MISSING))
+        self.cancelled = False
+
+    async def _produce(self):
+        try:
+            async for event in self._events:
+                self._queue.put_nowait(event)
+                # wait until the consumer asks for the next event
+                await self._queue.join()
+        finally:
+            if hasattr(self._events, "aclose"):
+                await self._events.aclose()
+
+    def cancel(self):
+        """Cancel the stream, can be called from any thread"""
+        self._loop.call_soon_threadsafe(self._cancel)
+
+    def _cancel(self):
+        if not self._task.done():
+            self.cancelled = True
+            self._task.cancel()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        try:
+            while True:
+                event = await self._queue.get()
+                if self.cancelled:
+                    return
+                if event is _MISSING:
+                    error = None if self._task.cancelled() else self._task.exception()
+                    if error is not None:
+                        raise error
+                    return
+                yield event
+                self._queue.task_done()
+        finally:
+            if not self._task.done():
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+
+
+def count_events(chunk: Any) -> int:
+    """
+    The number of events in a chunk, usually one. Text chunks hold newline delimited JSON events,
+    binary chunks hold MessagePack frames.
+    """
+    if isinstance(chunk, (bytes, bytearray)):
+        return max(count_frames(chunk), 1)
+    return max(chunk.count("\n"), 1)
+
+
+def skip_events(chunk: Any, count: int) -> Any:
+    """Drop the first `count` events of a chunk"""
+    if isinstance(chunk, (bytes, bytearray)):
+        return skip_frames(chunk, count)
+    index = -1
+    for _ in range(count):
+        index = chunk.find("\n", index + 1)
+        if index == -1:
+            return chunk[:0]
+    return chunk[index + 1:]
+
+
+async def _aclose(events: Any):
+    if hasattr(events, "aclose"):
+        await events.aclose()
+
+
+async def with_event_format(events: Any, event_format: EventFormat) -> AsyncIterator[Any]:
+    """
+    Produce the events of a stream in the given event format, by running every step of the
+    stream with the format set.
+    """
+    if not hasattr(events, "__aiter__"):
+        for event in events:
+            yield event
+        return
+
+    iterator = events.__aiter__()
+    try:
+        while True:
+            with use_event_format(event_format):
+                try:
+                    event = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield event
+    finally:
+        with use_event_format(event_format):
+            await _aclose(iterator)
+
+
+async def number_events(events: Any, *, after: int = 0) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Number the newline delimited events of a stream, starting after `after`. Yields
+    `(sequence number of the last event in the chunk, chunk)` tuples.
+    """
+    seq = after
+    try:
+        if not hasattr(events, "__aiter__"):
+            for chunk in events:
+                seq += count_events(chunk)
+                yield seq, chunk
+            return
+        async for chunk in events:
+            seq += count_events(chunk)
+            yield seq, chunk
+    finally:
+        await _aclose(events)
+
+
+async def drop_numbers(events: AsyncIterator[Tuple[int, Any]]) -> AsyncIterator[Any]:
+    """Turn numbered events back into plain chunks"""
+    try:
+        async for _, chunk in events:
+            yield chunk
+    finally:
+        await _aclose(events)
+
+
+async def format_server_sent_events(
+        events: AsyncIterator[Tuple[int, Any]]
+    ) -> AsyncIterator[str]:
+    """
+    Format numbered events as server-sent events, one per event with its sequence number as id,
+    so that clients can resume with `Last-Event-ID`.
+    """
+    try:
+        async for seq, chunk in events:
+            if isinstance(chunk, (bytes, bytearray)):
+                chunk = chunk.decode("utf-8")
+            lines = chunk.split("\n")
+            if lines[-1] == "":
+                lines.pop()
+            first_seq = seq - len(lines) + 1
+            yield "".join(
+                f"id: {first_seq + index}\ndata: {line}\n\n"
+                for index, line in enumerate(lines)
+            )
+    finally:
+        await _aclose(events)
+
+
+def negotiate_stream_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the content encoding for a streamed response from an `Accept-Encoding` header, or None
+    if the response should not be compressed.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for encoding in STREAM_ENCODINGS:
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _parse_accept(accept: str) -> Dict[str, float]:
+    """The quality of each media range of an `Accept` header"""
+    qualities: Dict[str, float] = {}
+    for part in accept.split(","):
+        media_range, *params = part.split(";")
+        media_range = media_range.strip().lower()
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value.strip()), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        # a repeated media range keeps its first quality
+        qualities.setdefault(media_range, quality)
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str], offers: Sequence[str]) -> Optional[str]:
+    """
+    Pick the offered media type the client prefers from an `Accept` header, or None if the
+    header names none of them with a quality above 0.
+
+    Only media types named in the header are picked, wildcards such as `*/*` are ignored, so that
+    alternative formats are only used when the client asks for them. On equal quality, the
+    earlier offer wins.
+    """
+    if not accept:
+        return None
+    qualities = _parse_accept(accept)
+    best: Optional[str] = None
+    best_quality = 0.0
+    for offer in offers:
+        quality = qualities.get(offer.lower(), 0.0)
+        if quality > best_quality:
+            best, best_quality = offer, quality
+    return best
+
+
+async def compress_stream(
+        chunks: Any,
+        encoding: str,
+        *,
+        level: int = DEFAULT_COMPRESSION_LEVEL,
+    ) -> AsyncIterator[bytes]:
+    """
+    Compress a stream with `gzip` or `deflate`.
+
+    The compressor is flushed (`Z_SYNC_FLUSH`) after every chunk, so each batch of events can be
+    decoded as soon as it arrives, while the compression window is kept across the stream.
+    """
+    if encoding not in STREAM_ENCODINGS:
+        raise ValueError(f"Unsupported stream encoding '{encoding}'")
+    # gzip container for gzip, zlib container for deflate (RFC 9110)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31 if encoding == "gzip" else 15)
+    try:
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush(zlib.Z_FINISH)
+    finally:
+        await _aclose(chunks)
+
+
+class _CompiledEventFilterRule:  # pylint: disable=too-few-public-methods
+    __slots__ = ("event_types", "event_type_prefixes", "nodes", "tags")
+
+    def __init__(self, rule: EventFilterRule):
+        if not isinstance(rule, dict):
+            raise ValueError("Event filter rules must be objects")
+        for key in rule:
+            if key not in ("events", "nodes", "tags"):
+                raise ValueError(f"Unknown event filter criterion '{key}'")
+            if not isinstance(rule[key], list) or not all(
+                isinstance(value, str) for value in rule[key]
+            ):
+                raise ValueError(f"Event filter criterion '{key}' must be a list of strings")
+
+        events = rule.get("events")
+        self.event_types: Optional[FrozenSet[str]] = None
+        self.event_type_prefixes: Tuple[str, ...] = ()
+        if events is not None:
+            self.event_types = frozenset(event for event in events if not event.endswith("*"))
+            self.event_type_prefixes = tuple(event[:-1] for event in events if event.endswith("*"))
+        nodes = rule.get("nodes")
+        self.nodes = frozenset(nodes) if nodes is not None else None
+        tags = rule.get("tags")
+        self.tags = frozenset(tags) if tags is not None else None
+
+    def matches(self, event_type: Any, node: Any, tags: Any) -> bool:
+        """Whether the event matches all criteria of this rule"""
+        if self.event_types is not None and not (
+            event_type in self.event_types or
+            (isinstance(event_type, str) and event_type.startswith(self.event_type_prefixes))
+        ):
+            return False
+        if self.nodes is not None and node not in self.nodes:
+            return False
+        if self.tags is not None and self.tags.isdisjoint(tags or ()):
+            return False
+        return True
+
+
+class EventFilterMatcher:  # pylint: disable=too-few-public-methods
+    """
+    Decides which LangGraph events are streamed to the client.
+
+    An event is streamed if it matches the `include` rule (when given) and does not match the
+    `exclude` rule (when given). Nodes are matched against the `langgraph_node` metadata, tags
+    against the event tags. CopilotKit's own custom events (`copilotkit_*`) are always streamed,
+    since the runtime depends on them.
+
+    Raises `ValueError` if the filter is malformed.
+    """
+
+    def __init__(self, event_filter: EventFilter):
+        if not isinstance(event_filter, dict):
+            raise ValueError("Event filter must be an object")
+        for key in event_filter:
+            if key not in ("include", "exclude"):
+                raise ValueError(f"Unknown event filter key '{key}'")
+        include = event_filter.get("include")
+        exclude = event_filter.get("exclude")
+        self.include = _CompiledEventFilterRule(include) if include is not None else None
+        self.exclude = _CompiledEventFilterRule(exclude) if exclude is not None else None
+
+    def __call__(self, event: Any) -> bool:
+        event_type = event.get("event")
+        if event_type == "on_custom_event" and str(event.get("name", "")).startswith("copilotkit_"):
+            return True
+        metadata = event.get("metadata") or {}
+        node = metadata.get("langgraph_node")
+        tags = event.get("tags")
+        if self.include is not None and not self.include.matches(event_type, node, tags):
+            return False
+        if self.exclude is not None and self.exclude.matches(event_type, node, tags):
+            return False
+        return True
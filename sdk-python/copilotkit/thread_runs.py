@@ -0,0 +1,177 @@
+"""
+Serialization of agent runs on the same thread.
+"""
+
+import threading
+from typing import Any, AsyncIterator, Dict, Literal, Optional, Tuple
+
+from .concurrency import ThreadSafeSemaphore
+from .exc import ThreadBusyException
+from .metrics import get_metrics
+from .serializer import encode_event, encode_error_event
+from .streaming import CancellableStream
+
+ThreadRunPolicy = Literal["queue", "reject", "cancel_previous"]
+
+
+class _ThreadLock:  # pylint: disable=too-few-public-methods
+    __slots__ = ("semaphore", "users", "current")
+
+    def __init__(self):
+        self.semaphore = ThreadSafeSemaphore(1)
+        # runs holding or waiting for the lock, the lock is evicted when there are none
+        self.users = 0
+        # the run holding the lock, cancelled by newer runs with the "cancel_previous" policy
+        self.current: Optional["ThreadRun"] = None
+
+
+class ThreadRunRegistry:
+    """
+    Makes sure only one run per agent and thread executes at a time, so that overlapping
+    requests don't read and write the same checkpoints concurrently.
+
+    What happens when a thread is busy depends on the policy:
+
+    - `"queue"`: the run waits for the previous runs to finish (at most `queue_timeout` seconds)
+    - `"reject"`: the run is rejected with `ThreadBusyException`
+    - `"cancel_previous"`: the running run is cancelled, then the new run starts
+
+    Locks work across event loops and are dropped as soon as no run holds or waits for them.
+    """
+
+    def __init__(
+            self,
+            policy: ThreadRunPolicy = "reject",
+            *,
+            queue_timeout: Optional[float] = None,
+        ):
+        if policy not in ("queue", "reject", "cancel_previous"):
+            raise ValueError(f"Unknown thread run policy '{policy}'")
+        self.policy = policy
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._locks: Dict[Tuple[str, str], _ThreadLock] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def reserve(self, agent_name: str, thread_id: str) -> "ThreadRun":
+        """
+        Register a run. With the `"reject"` policy, raises `ThreadBusyException` if another run
+        is executing on the thread.
+        """
+        key = (agent_name, thread_id)
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = _ThreadLock()
+            lock.users += 1
+        run = ThreadRun(self, key, lock)
+        if lock.semaphore.try_acquire():
+            run.mark_acquired()
+        elif self.policy == "reject":
+            run.close()
+            get_metrics().increment("agent_runs_thread_busy", agent=agent_name)
+            raise ThreadBusyException(agent_name, thread_id)
+        return run
+
+    def _leave(self, key: Tuple[str, str], lock: _ThreadLock):
+        with self._lock:
+            lock.users -= 1
+            if lock.users == 0 and self._locks.get(key) is lock:
+                del self._locks[key]
+
+
+class ThreadRun:
+    """A run registered with a `ThreadRunRegistry`"""
+
+    def __init__(self, registry: ThreadRunRegistry, key: Tuple[str, str], lock: _ThreadLock):
+        self.registry = registry
+        self.key = key
+        self.lock = lock
+        self.acquired = False
+        self._closed = False
+        self._cancel_lock = threading.Lock()
+        self._cancel_requested = False
+        self._stream: Optional[CancellableStream] = None
+
+    def mark_acquired(self):
+        """Record that the run holds the thread"""
+        self.acquired = True
+        self.lock.current = self
+
+    def cancel(self):
+        """Cancel the run, can be called from any thread"""
+        with self._cancel_lock:
+            self._cancel_requested = True
+            stream = self._stream
+        if stream is not None:
+            stream.cancel()
+
+    def close(self):
+        """Release the thread and unregister the run"""
+        if self._closed:
+            return
+        self._closed = True
+        if self.acquired:
+            self.acquired = False
+            if self.lock.current is self:
+                self.lock.current = None
+            self.lock.semaphore.release()
+        self.registry._leave(self.key, self.lock) # pylint: disable=protected-access
+
+    async def stream(self, events: Any) -> AsyncIterator[Any]:
+        """Stream the events of the run once the thread is free"""
+        agent_name, thread_id = self.key
+        try:
+            if not self.acquired:
+                if self.registry.policy == "cancel_previous":
+                    current = self.lock.current
+                    if current is not None:
+                        current.cancel()
+                if await self.lock.semaphore.acquire(self.registry.queue_timeout):
+                    self.mark_acquired()
+                else:
+                    get_metrics().increment("agent_runs_thread_busy", agent=agent_name)
+                    yield encode_error_event(
+                        ThreadBusyException(agent_name, thread_id),
+                        agent_name=agent_name,
+                        thread_id=thread_id
+                    )
+                    return
+
+            if self.registry.policy != "cancel_previous":
+                async for event in events:
+                    yield event
+                return
+
+            # a single task runs the stream, so that newer runs can cancel it while it waits
+            stream = CancellableStream(events)
+            with self._cancel_lock:
+                self._stream = stream
+                cancel_requested = self._cancel_requested
+            if cancel_requested:
+                stream.cancel()
+            async for event in stream:
+                yield event
+            if not stream.cancelled:
+                return
+
+            # a newer run on the same thread took over
+            get_metrics().increment("agent_runs_superseded", agent=agent_name)
+            # let the newer run start right away
+            self.close()
+            yield encode_event({
+                "event": "on_copilotkit_run_superseded",
+                "data": {
+                    "thread_id": thread_id,
+                    "agent_name": agent_name,
+                }
+            })
+        finally:
+            try:
+                # stop the run before the next one can start
+                if hasattr(events, "aclose"):
+                    await events.aclose()
+            finally:
+                self.close()
@@ -1,6 +1,6 @@
 """State for CopilotKit"""
 
-from typing import TypedDict
+from typing import TypedDict, List
 from enum import Enum
 from typing_extensions import NotRequired
 
@@ -42,4 +42,19 @@ class IntermediateStateConfig(TypedDict):
 class MetaEvent(TypedDict):
     """Type definition for meta events"""
     name: str
-    response: NotRequired[str]
\ No newline at end of file
+    response: NotRequired[str]
+
+class EventFilterRule(TypedDict):
+    """
+    Event filter rule. All criteria given must match for the rule to match.
+
+    Event types ending in `*` match by prefix, e.g. `on_chain_*`.
+    """
+    events: NotRequired[List[str]]
+    nodes: NotRequired[List[str]]
+    tags: NotRequired[List[str]]
+
+class EventFilter(TypedDict):
+    """Event filter declared by the client when executing an agent"""
+    include: NotRequired[EventFilterRule]
+    exclude: NotRequired[EventFilterRule]
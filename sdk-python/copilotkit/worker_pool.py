@@ -0,0 +1,174 @@
+"""
+Worker pool for running CopilotKit requests off the server's event loop.
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_END_OF_STREAM = object()
+
+
+class _Worker:
+    """A thread running its own event loop"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop = asyncio.new_event_loop()
+        self.active = 0
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            try:
+                pending = asyncio.all_tasks(self.loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    self.loop.run_until_complete(
+                        asyncio.gather(*pending, return_exceptions=True)
+                    )
+                self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            finally:
+                self.loop.close()
+
+    def stop(self):
+        """Stop the event loop and wait for the thread to finish"""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class WorkerPool:
+    """
+    Long-lived pool of worker threads, each with its own persistent event loop.
+
+    Work is dispatched to the least busy worker. Streams created on a worker keep running on it
+    and are bridged back to the caller's event loop one event at a time, so responses are never
+    buffered.
+
+    ```python
+    pool = WorkerPool(max_workers=4)
+    result = await pool.run(lambda: some_coroutine())
+    pool.shutdown()
+    ```
+    """
+
+    def __init__(self, max_workers: int = 10, *, thread_name_prefix: str = "copilotkit-worker"):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._lock = threading.Lock()
+        self._workers: List[_Worker] = []
+        self._workers_by_loop: Dict[asyncio.AbstractEventLoop, _Worker] = {}
+        self._shutdown = False
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("WorkerPool has been shut down")
+            idle = [worker for worker in self._workers if worker.active == 0]
+            if idle:
+                worker = idle[0]
+            elif len(self._workers) < self.max_workers:
+                # workers are started lazily
+                worker = _Worker(f"{self.thread_name_prefix}-{len(self._workers)}")
+                self._workers.append(worker)
+                self._workers_by_loop[worker.loop] = worker
+            else:
+                worker = min(self._workers, key=lambda worker: worker.active)
+            worker.active += 1
+            return worker
+
+    def _release(self, worker: _Worker):
+        with self._lock:
+            worker.active -= 1
+
+    def _current_worker(self) -> _Worker:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        worker = self._workers_by_loop.get(loop) if loop is not None else None
+        if worker is None:
+            raise RuntimeError("Not running on a worker of this pool")
+        return worker
+
+    async def run(self, coro_fn: Callable[[], Awaitable[T]]) -> T:
+        """Run a coroutine on a worker and wait for its result"""
+        worker = self._acquire()
+        try:
+            async def _call():
+                return await coro_fn()
+            future = asyncio.run_coroutine_threadsafe(_call(), worker.loop)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._release(worker)
+
+    def bridge(self, iterator: Any) -> AsyncIterator[Any]:
+        """
+        Make a stream created on a worker consumable from another event loop.
+
+        Must be called on the worker that created the stream. The stream keeps running on that
+        worker and counts towards its load until it is exhausted or closed.
+        """
+        worker = self._current_worker()
+        with self._lock:
+            worker.active += 1
+        return self._bridged(iterator, worker)
+
+    async def _bridged(self, iterator: Any, worker: _Worker) -> AsyncIterator[Any]:
+        if hasattr(iterator, "__aiter__"):
+            async_iterator = iterator.__aiter__()
+        else:
+            # sync iterables are iterated on the worker as well
+            sync_iterator = iter(iterator)
+            async def _from_sync():
+                for item in sync_iterator:
+                    yield item
+            async_iterator = _from_sync()
+
+        async def _next():
+            try:
+                return await async_iterator.__anext__()
+            except StopAsyncIteration:
+                return _END_OF_STREAM
+
+        try:
+            while True:
+                future = asyncio.run_coroutine_threadsafe(_next(), worker.loop)
+                item = await asyncio.wrap_future(future)
+                if item is _END_OF_STREAM:
+                    return
+                yield item
+        finally:
+            try:
+                if hasattr(async_iterator, "aclose") and worker.loop.is_running():
+                    await asyncio.wrap_future(
+                        asyncio.run_coroutine_threadsafe(async_iterator.aclose(), worker.loop)
+                    )
+            except Exception as exc: # pylint: disable=broad-except
+                logger.debug("Error closing bridged stream: %s", exc)
+            finally:
+                self._release(worker)
+
+    def shutdown(self):
+        """Stop all workers"""
+        with self._lock:
+            self._shutdown = True
+            workers = self._workers
+            self._workers = []
+            self._workers_by_loop = {}
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,67 @@
+"""Agents with controllable runs used by the tests"""
+
+import asyncio
+import json
+from typing import Dict, List
+
+from copilotkit import CopilotKitRemoteEndpoint
+from copilotkit.agent import Agent
+
+CONTEXT = {"properties": {}, "frontend_url": None, "headers": {}}
+
+
+class GatedAgent(Agent):
+    """Streams a `started` event, then waits until its run is released to stream `finished`"""
+
+    def __init__(self, name: str = "agent"):
+        super().__init__(name=name)
+        self.started: List[str] = []
+        self.closed: List[str] = []
+        self._gates: Dict[str, asyncio.Event] = {}
+
+    def _gate(self, thread_id: str) -> asyncio.Event:
+        if thread_id not in self._gates:
+            self._gates[thread_id] = asyncio.Event()
+        return self._gates[thread_id]
+
+    def release(self, thread_id: str):
+        """Let the run on a thread finish"""
+        self._gate(thread_id).set()
+
+    def execute( # pylint: disable=arguments-differ
+            self,
+            *,
+            thread_id: str,
+            **kwargs
+        ):
+        return self._execute(thread_id)
+
+    async def _execute(self, thread_id: str):
+        self.started.append(thread_id)
+        try:
+            yield json.dumps({"event": "started", "thread_id": thread_id}) + "\n"
+            await self._gate(thread_id).wait()
+            yield json.dumps({"event": "finished", "thread_id": thread_id}) + "\n"
+        finally:
+            self.closed.append(thread_id)
+
+    async def get_state(self, *, thread_id: str):
+        return await super().get_state(thread_id=thread_id)
+
+
+def execute(sdk: CopilotKitRemoteEndpoint, thread_id: str, name: str = "agent"):
+    """Start a run of an agent without iterating it"""
+    return sdk.execute_agent(
+        context=CONTEXT,
+        name=name,
+        thread_id=thread_id,
+        state={},
+        messages=[],
+        actions=[],
+        node_name=None,
+    )
+
+
+async def next_event(stream) -> dict:
+    """The next event of a stream of newline delimited JSON"""
+    return json.loads(await stream.__anext__())
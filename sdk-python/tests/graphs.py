@@ -0,0 +1,134 @@
+"""Small LangGraph graphs used by the tests"""
+
+import json
+from typing import Any, Iterator, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+
+from copilotkit import CopilotKitState
+from copilotkit.langgraph import copilotkit_customize_config, copilotkit_emit_state
+
+DOCUMENT = "hello world " * 20
+
+
+class FakeWriterModel(BaseChatModel):
+    """Streams a `WriteDocument` tool call in small chunks, followed by some text"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-writer"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=""))])
+
+    def _stream(
+            self,
+            messages,
+            stop=None,
+            run_manager=None,
+            **kwargs
+        ) -> Iterator[ChatGenerationChunk]:
+        arguments = json.dumps({"document": DOCUMENT})
+        chunks: List[AIMessageChunk] = []
+        for index in range(0, len(arguments), 7):
+            chunks.append(AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": "WriteDocument" if index == 0 else None,
+                    "args": arguments[index:index + 7],
+                    "id": "call_1" if index == 0 else None,
+                    "index": 0,
+                    "type": "tool_call_chunk",
+                }]
+            ))
+        chunks.extend(AIMessageChunk(content=word) for word in ["Done ", "writing."])
+        for chunk in chunks:
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(str(chunk.content), chunk=generation)
+            yield generation
+
+
+class State(CopilotKitState):
+    """State of the test graphs"""
+    document: str
+    resources: List[Any]
+
+
+async def write(state: State, config):
+    """Writes the document, emitting it while the tool call streams"""
+    config = copilotkit_customize_config(
+        config,
+        emit_intermediate_state=[{
+            "state_key": "document",
+            "tool": "WriteDocument",
+            "tool_argument": "document",
+        }]
+    )
+    message = None
+    async for chunk in FakeWriterModel().astream(state["messages"], config):
+        message = chunk if message is None else message + chunk
+    return {
+        "messages": [AIMessage(content="Done writing.", id=message.id)],
+        "document": DOCUMENT,
+        "resources": [{"url": "https://example.com/a"}],
+    }
+
+
+async def plan(state: State, config):
+    """Emits state manually before writing"""
+    await copilotkit_emit_state(config, {"document": "draft 1"})
+    await copilotkit_emit_state(config, {"document": "draft 2", "resources": []})
+    return {"document": "planned"}
+
+
+async def review(state: State, config):  # pylint: disable=unused-argument
+    """Adds a resource after writing"""
+    return {"resources": [*state["resources"], {"url": "https://example.com/b"}]}
+
+
+def build_writer_graph():
+    """A graph with a single node that streams a tool call into the state"""
+    graph = StateGraph(State)
+    graph.add_node("write", write)
+    graph.set_entry_point("write")
+    graph.add_edge("write", END)
+    return graph.compile(checkpointer=MemorySaver())
+
+
+def build_pipeline_graph():
+    """plan -> write -> review"""
+    graph = StateGraph(State)
+    graph.add_node("plan", plan)
+    graph.add_node("write", write)
+    graph.add_node("review", review)
+    graph.set_entry_point("plan")
+    graph.add_edge("plan", "write")
+    graph.add_edge("write", "review")
+    graph.add_edge("review", END)
+    return graph.compile(checkpointer=MemorySaver())
+
+
+def user_message(index: int, content: str = "hi") -> dict:
+    """A CopilotKit user message"""
+    return {"type": "TextMessage", "role": "user", "content": content, "id": f"user-{index}"}
+
+
+async def collect_events(agent, *, thread_id: str = "thread", turns: int = 1, **kwargs) -> list:
+    """Run an agent for a number of turns and return the parsed events"""
+    events = []
+    for turn in range(turns):
+        async for chunk in agent.execute(
+            state={},
+            messages=[user_message(index) for index in range(turn + 1)],
+            thread_id=thread_id,
+            actions=[],
+            node_name=None,
+            **kwargs
+        ):
+            events.extend(json.loads(line) for line in chunk.split("\n") if line)
+    return events
@@ -0,0 +1,88 @@
+"""Tests for executing a batch of actions"""
+
+import asyncio
+
+import pytest
+
+from copilotkit import Action, CopilotKitRemoteEndpoint
+
+from .test_fastapi import make_client
+
+
+async def _echo(value, delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def _fail():
+    raise ValueError("boom")
+
+
+def _client():
+    return make_client(CopilotKitRemoteEndpoint(actions=[
+        Action(name="echo", handler=_echo),
+        Action(name="fail", handler=_fail),
+    ]))
+
+
+def test_results_come_back_in_order():
+    response = _client().post("/copilotkit/actions/batch", json={"actions": [
+        # the first action finishes last
+        {"name": "echo", "arguments": {"value": 1, "delay": 0.05}},
+        {"name": "echo", "arguments": {"value": 2}},
+        {"name": "echo", "arguments": {"value": 3, "delay": 0.01}},
+    ]})
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {"name": "echo", "result": 1},
+        {"name": "echo", "result": 2},
+        {"name": "echo", "result": 3},
+    ]
+
+
+def test_failing_actions_do_not_fail_the_batch():
+    response = _client().post("/copilotkit/actions/batch", json={
+        "actions": [
+            {"name": "fail", "arguments": {}},
+            {"name": "missing", "arguments": {}},
+            {"name": "echo", "arguments": {"value": "ok"}},
+        ],
+        "maxConcurrency": 1,
+    })
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["name"] for result in results] == ["fail", "missing", "echo"]
+    assert results[0]["code"] == "action_error" and "boom" in results[0]["error"]
+    assert results[1]["code"] == "action_not_found"
+    assert results[2] == {"name": "echo", "result": "ok"}
+
+
+@pytest.mark.parametrize("max_concurrency", [0, -1, 1.5, "2", True])
+def test_invalid_max_concurrency_is_rejected(max_concurrency):
+    response = _client().post("/copilotkit/actions/batch", json={
+        "actions": [{"name": "echo", "arguments": {"value": 1}}],
+        "maxConcurrency": max_concurrency,
+    })
+    assert response.status_code == 400
+    assert "maxConcurrency" in response.json()["detail"]
+
+
+def test_max_concurrency_limits_running_actions():
+    running = 0
+    peak = 0
+
+    async def track():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    sdk = CopilotKitRemoteEndpoint(actions=[Action(name="track", handler=track)])
+    results = asyncio.run(sdk.execute_actions(
+        context={"properties": {}, "frontend_url": None, "headers": {}},
+        actions=[{"name": "track", "arguments": {}} for _ in range(6)],
+        max_concurrency=2,
+    ))
+    assert len(results) == 6
+    assert peak == 2
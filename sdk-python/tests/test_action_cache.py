@@ -0,0 +1,125 @@
+"""Tests for the result cache of actions"""
+
+import asyncio
+
+import pytest
+
+from copilotkit import Action
+from copilotkit.action_cache import ActionCache
+
+
+def _context(tenant: str) -> dict:
+    return {"properties": {"tenantId": tenant}, "frontend_url": None, "headers": {}}
+
+
+class CountingHandler:
+    """An async action handler (`handle`) that counts its calls and can be held until released"""
+
+    def __init__(self, *, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+        self.release = None
+
+    async def handle(self, **arguments):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise ValueError(f"call {self.calls} failed")
+        return {"calls": self.calls, **arguments}
+
+
+def test_concurrent_identical_calls_run_the_handler_once():
+    handler = CountingHandler()
+    action = Action(name="lookup", handler=handler.handle, cache=ActionCache())
+
+    async def main():
+        handler.release = asyncio.Event()
+        calls = [
+            asyncio.ensure_future(action.execute(arguments={"a": 1, "b": 2})),
+            asyncio.ensure_future(action.execute(arguments={"b": 2, "a": 1})),
+            asyncio.ensure_future(action.execute(arguments={"a": 1, "b": 2})),
+        ]
+        await asyncio.sleep(0.01)
+        handler.release.set()
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(main())
+    assert handler.calls == 1
+    assert results[0] == results[1] == results[2]
+
+
+def test_errors_are_not_cached():
+    handler = CountingHandler(fail=True)
+    action = Action(name="lookup", handler=handler.handle, cache=ActionCache())
+
+    async def main():
+        for expected in ["call 1 failed", "call 2 failed"]:
+            with pytest.raises(ValueError, match=expected):
+                await action.execute(arguments={"a": 1})
+        handler.fail = False
+        return await action.execute(arguments={"a": 1})
+
+    assert asyncio.run(main())["result"]["calls"] == 3
+
+
+def test_waiting_calls_get_the_error_of_the_running_call():
+    handler = CountingHandler(fail=True)
+    action = Action(name="lookup", handler=handler.handle, cache=ActionCache())
+
+    async def main():
+        handler.release = asyncio.Event()
+        calls = [asyncio.ensure_future(action.execute(arguments={})) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        handler.release.set()
+        return await asyncio.gather(*calls, return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert handler.calls == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_results_expire_after_the_ttl():
+    handler = CountingHandler()
+    action = Action(name="lookup", handler=handler.handle, cache=ActionCache(ttl=0.05))
+
+    async def main():
+        await action.execute(arguments={})
+        await action.execute(arguments={})
+        assert handler.calls == 1
+        await asyncio.sleep(0.1)
+        await action.execute(arguments={})
+        assert handler.calls == 2
+
+    asyncio.run(main())
+
+
+def test_context_keys_separate_callers():
+    handler = CountingHandler()
+    action = Action(
+        name="lookup",
+        handler=handler.handle,
+        cache=ActionCache(context_keys=["tenantId"]),
+    )
+
+    async def main():
+        first = await action.execute(arguments={}, context=_context("a"))
+        assert await action.execute(arguments={}, context=_context("a")) == first
+        other = await action.execute(arguments={}, context=_context("b"))
+        assert other != first
+
+    asyncio.run(main())
+    assert handler.calls == 2
+
+
+def test_actions_without_a_cache_always_run():
+    handler = CountingHandler()
+    action = Action(name="create_ticket", handler=handler.handle)
+
+    async def main():
+        calls = [action.execute(arguments={"title": "x"}) for _ in range(3)]
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(main())
+    assert handler.calls == 3
+    assert sorted(result["result"]["calls"] for result in results) == [1, 2, 3]
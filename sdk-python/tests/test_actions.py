@@ -0,0 +1,155 @@
+"""Tests for action execution: executor, concurrency limits and timeouts"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from copilotkit import Action, CopilotKitRemoteEndpoint
+from copilotkit.action import get_action_executor, set_action_executor
+from copilotkit.exc import ActionTimeoutException
+
+from .test_fastapi import make_client
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_sync_handlers_run_on_the_action_executor():
+    def handler():
+        return threading.current_thread().name, request_id.get()
+
+    async def main():
+        request_id.set("request-1")
+        return await Action(name="sync", handler=handler).execute(arguments={})
+
+    thread_name, seen_request_id = asyncio.run(main())["result"]
+    assert thread_name.startswith("copilotkit-action")
+    # the handler sees the context of the request
+    assert seen_request_id == "request-1"
+
+
+def test_sync_handlers_do_not_block_the_event_loop():
+    release = threading.Event()
+
+    def handler():
+        return release.wait(5)
+
+    async def main():
+        action = Action(name="sync", handler=handler)
+        execution = asyncio.ensure_future(action.execute(arguments={}))
+        # the loop keeps running while the handler blocks
+        await asyncio.sleep(0.01)
+        assert not execution.done()
+        release.set()
+        return await execution
+
+    assert asyncio.run(main()) == {"result": True}
+
+
+def test_custom_executor():
+    previous = get_action_executor()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="custom")
+    set_action_executor(executor)
+    try:
+        result = asyncio.run(Action(
+            name="sync",
+            handler=lambda: threading.current_thread().name
+        ).execute(arguments={}))
+    finally:
+        set_action_executor(previous)
+        executor.shutdown()
+    assert result["result"].startswith("custom")
+
+
+def test_max_concurrency_limits_running_handlers():
+    running = 0
+    peak = 0
+
+    async def handler():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    action = Action(name="limited", handler=handler, max_concurrency=2)
+
+    async def main():
+        await asyncio.gather(*(action.execute(arguments={}) for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+
+def test_timeout_cancels_async_handlers():
+    cancelled = False
+
+    async def handler():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    action = Action(name="slow", handler=handler, timeout=0.01)
+    with pytest.raises(ActionTimeoutException) as exc_info:
+        asyncio.run(action.execute(arguments={}))
+    assert exc_info.value.timeout == 0.01
+    assert exc_info.value.name == "slow"
+    assert cancelled
+
+
+def test_timed_out_sync_handlers_keep_their_slot_until_done():
+    release = threading.Event()
+    action = Action(
+        name="slow",
+        handler=lambda: release.wait(5),
+        max_concurrency=1,
+        timeout=0.05,
+    )
+
+    async def main():
+        with pytest.raises(ActionTimeoutException):
+            await action.execute(arguments={})
+        # the first handler is still running, so the next execution can't get a slot
+        with pytest.raises(ActionTimeoutException):
+            await action.execute(arguments={})
+        release.set()
+        return await action.execute(arguments={})
+
+    assert asyncio.run(main()) == {"result": True}
+
+
+def test_timeout_includes_waiting_for_a_slot():
+    async def handler():
+        return "done"
+
+    action = Action(name="busy", handler=handler, max_concurrency=1, timeout=0.05)
+    limiter = action._limiter  # pylint: disable=protected-access
+
+    async def main():
+        # another execution holds the only slot
+        await limiter.acquire()
+        with pytest.raises(ActionTimeoutException):
+            await action.execute(arguments={})
+        assert limiter.waiting == 0
+        limiter.release()
+        return await action.execute(arguments={})
+
+    assert asyncio.run(main()) == {"result": "done"}
+
+
+def test_timeouts_are_answered_with_504():
+    async def handler():
+        await asyncio.sleep(5)
+
+    client = make_client(CopilotKitRemoteEndpoint(
+        actions=[Action(name="slow", handler=handler, timeout=0.01)]
+    ))
+    response = client.post("/copilotkit/action/slow", json={"arguments": {}})
+    assert response.status_code == 504
+    assert response.json()["code"] == "action_timeout"
+    assert response.json()["timeout"] == 0.01
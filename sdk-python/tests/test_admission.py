@@ -0,0 +1,124 @@
+"""Tests for the admission control of agent runs"""
+
+import asyncio
+
+import pytest
+
+from copilotkit import CopilotKitRemoteEndpoint
+from copilotkit.admission import AdmissionController
+from copilotkit.exc import RunQueueFullException
+
+from .agents import GatedAgent, execute, next_event
+
+
+def _queued(position: int, thread_id: str) -> dict:
+    return {
+        "event": "on_copilotkit_run_queued",
+        "data": {"position": position, "thread_id": thread_id, "agent_name": "agent"},
+    }
+
+
+def test_runs_that_are_never_iterated_hold_no_slot():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], max_concurrent_runs=1)
+
+    async def main():
+        abandoned = [execute(sdk, f"abandoned-{index}") for index in range(3)]
+        stream = execute(sdk, "thread")
+        assert await next_event(stream) == {"event": "started", "thread_id": "thread"}
+        assert sdk.admission.queued == 0
+        await stream.aclose()
+        for other in abandoned:
+            await other.aclose()
+
+    asyncio.run(main())
+    assert agent.started == ["thread"]
+
+
+def test_queued_runs_are_told_when_their_position_changes():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], max_concurrent_runs=1)
+
+    async def main():
+        first, second, third = (execute(sdk, thread_id) for thread_id in ["a", "b", "c"])
+        assert (await next_event(first))["event"] == "started"
+        assert await next_event(second) == _queued(1, "b")
+        assert await next_event(third) == _queued(2, "c")
+
+        agent.release("a")
+        assert [event async for event in first] == [
+            '{"event": "finished", "thread_id": "a"}\n'
+        ]
+        assert (await next_event(second))["event"] == "started"
+        assert await next_event(third) == _queued(1, "c")
+
+        for stream in [second, third]:
+            await stream.aclose()
+        assert sdk.admission.queued == 0
+
+    asyncio.run(main())
+
+
+def test_closing_a_queued_run_leaves_the_queue():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], max_concurrent_runs=1)
+
+    async def main():
+        first, second, third = (execute(sdk, thread_id) for thread_id in ["a", "b", "c"])
+        await next_event(first)
+        assert await next_event(second) == _queued(1, "b")
+        assert await next_event(third) == _queued(2, "c")
+
+        await second.aclose()
+        assert await next_event(third) == _queued(1, "c")
+
+        agent.release("a")
+        async for _ in first:
+            pass
+        assert (await next_event(third))["event"] == "started"
+        await third.aclose()
+
+    asyncio.run(main())
+    assert "b" not in agent.started
+
+
+def test_full_queue_rejects_on_the_first_iteration():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], max_concurrent_runs=1, run_queue_size=0)
+
+    async def main():
+        first = execute(sdk, "a")
+        await next_event(first)
+        rejected = execute(sdk, "b")
+        with pytest.raises(RunQueueFullException):
+            await rejected.__anext__()
+        await first.aclose()
+
+        # the rejected run held nothing
+        stream = execute(sdk, "c")
+        assert (await next_event(stream))["event"] == "started"
+        await stream.aclose()
+
+    asyncio.run(main())
+
+
+def test_position_watchers_are_resolved_when_runs_ahead_leave():
+    controller = AdmissionController(max_concurrent_runs=1)
+
+    async def main():
+        running = controller.admit("agent")
+        first = controller.admit("agent")
+        second = controller.admit("agent")
+        assert (running.position, first.position, second.position) == (0, 1, 2)
+
+        changed = second.watch_position()
+        first.release()
+        assert changed.done()
+        assert second.position == 1
+
+        running.release()
+        await second.wait()
+        assert second.position == 0
+        second.release()
+
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""Tests for finding the checkpoint before a message through the message index"""
+
+import asyncio
+
+import pytest
+
+from copilotkit import LangGraphAgent
+
+from .graphs import build_pipeline_graph, collect_events, user_message
+
+
+async def _linear_scan(graph, thread_id: str, message_id: str):
+    """Reference: scan the whole thread history from the oldest checkpoint"""
+    history = [
+        snapshot
+        async for snapshot in graph.aget_state_history({"configurable": {"thread_id": thread_id}})
+    ]
+    history.reverse()
+    for index, snapshot in enumerate(history):
+        if any(getattr(message, "id", None) == message_id
+               for message in snapshot.values.get("messages", [])):
+            if index == 0:
+                snapshot.values["messages"] = []
+                return snapshot
+            return history[index - 1]
+    raise ValueError("Message ID not found in history")
+
+
+async def _run(agent, turn: int):
+    async for _ in agent.execute(
+        state={},
+        messages=[user_message(index) for index in range(turn)],
+        thread_id="thread",
+        actions=[],
+        node_name=None,
+    ):
+        pass
+
+
+async def _message_ids(agent, thread_id: str) -> list:
+    state = await agent.graph.aget_state({"configurable": {"thread_id": thread_id}})
+    return [message.id for message in state.values["messages"]]
+
+
+def test_index_finds_the_same_checkpoint_as_the_linear_scan():
+    agent = LangGraphAgent(name="agent", graph=build_pipeline_graph())
+
+    async def main():
+        for turn in range(1, 4):
+            # the index is brought up to date incrementally after every run
+            await _run(agent, turn)
+            message_ids = await _message_ids(agent, "thread")
+            assert len(message_ids) >= 2 * turn
+            for message_id in message_ids:
+                indexed = await agent.get_checkpoint_before_message(message_id, "thread")
+                scanned = await _linear_scan(agent.graph, "thread", message_id)
+                assert indexed.config == scanned.config
+                assert indexed.values == scanned.values
+
+    asyncio.run(main())
+
+
+def test_index_is_rebuilt_when_it_was_dropped():
+    agent = LangGraphAgent(name="agent", graph=build_pipeline_graph())
+
+    async def main():
+        await collect_events(agent, turns=2, thread_id="thread")
+        agent.message_checkpoints.invalidate("thread")
+        message_id = (await _message_ids(agent, "thread"))[-1]
+        indexed = await agent.get_checkpoint_before_message(message_id, "thread")
+        scanned = await _linear_scan(agent.graph, "thread", message_id)
+        assert indexed.config == scanned.config
+
+    asyncio.run(main())
+
+
+def test_unknown_messages_are_not_found():
+    agent = LangGraphAgent(name="agent", graph=build_pipeline_graph())
+
+    async def main():
+        await collect_events(agent, thread_id="thread")
+        with pytest.raises(ValueError, match="not found"):
+            await agent.get_checkpoint_before_message("unknown", "thread")
+        with pytest.raises(ValueError, match="not found"):
+            await agent.get_checkpoint_before_message("user-0", "other-thread")
+
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+"""Tests for coalescing chat model token events"""
+
+import asyncio
+from typing import List
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from copilotkit.streaming import coalesce_chat_model_stream
+
+
+def _token(content: str, message_id: str = "message", run_id: str = "run") -> dict:
+    return {
+        "event": "on_chat_model_stream",
+        "run_id": run_id,
+        "data": {"chunk": AIMessageChunk(content=content, id=message_id)},
+    }
+
+
+def _tool_call_token(args: str) -> dict:
+    return {
+        "event": "on_chat_model_stream",
+        "run_id": "run",
+        "data": {"chunk": AIMessageChunk(
+            content="",
+            id="message",
+            tool_call_chunks=[{
+                "name": None, "args": args, "id": None, "index": 0, "type": "tool_call_chunk"
+            }],
+        )},
+    }
+
+
+def _other(name: str) -> dict:
+    return {"event": name, "run_id": "run", "data": {}}
+
+
+def _contents(events: List[dict]) -> List[str]:
+    return [
+        event["data"]["chunk"].content if event["event"] == "on_chat_model_stream"
+        else event["event"]
+        for event in events
+    ]
+
+
+def _order(events: List[dict]) -> list:
+    """The events with consecutive content deltas of the same message merged"""
+    order: list = []
+    for event in events:
+        chunk = event["data"].get("chunk")
+        if chunk is not None and isinstance(chunk.content, str) and chunk.content:
+            key = ("content", event["run_id"], chunk.id)
+            if order and order[-1][0] == key:
+                order[-1] = (key, order[-1][1] + chunk.content)
+                continue
+            order.append((key, chunk.content))
+        else:
+            order.append((event["event"], chunk.tool_call_chunks if chunk is not None else None))
+    return order
+
+
+async def _source(events: List[dict]):
+    for event in events:
+        yield event
+
+
+async def _collect(events, **kwargs) -> List[dict]:
+    return [event async for event in coalesce_chat_model_stream(events, **kwargs)]
+
+
+def _assert_same_stream(coalesced: List[dict], original: List[dict]):
+    assert _order(coalesced) == _order(original)
+
+
+def test_flushes_when_the_window_passes():
+    first_received = None
+
+    async def events():
+        yield _token("a")
+        yield _token("b")
+        # only continues once the buffered content was flushed
+        await asyncio.wait_for(first_received.wait(), 5)
+        yield _token("c")
+
+    async def main():
+        nonlocal first_received
+        first_received = asyncio.Event()
+        coalesced = []
+        async for event in coalesce_chat_model_stream(events(), window=0.01):
+            coalesced.append(event)
+            first_received.set()
+        return coalesced
+
+    coalesced = asyncio.run(main())
+    assert _contents(coalesced) == ["ab", "c"]
+    _assert_same_stream(coalesced, [_token("a"), _token("b"), _token("c")])
+
+
+def test_flushes_at_max_chars():
+    original = [_token(content) for content in ["ab", "cd", "ef", "g"]]
+    coalesced = asyncio.run(_collect(_source(original), window=10, max_chars=4))
+    assert _contents(coalesced) == ["abcd", "efg"]
+    _assert_same_stream(coalesced, original)
+
+
+def test_flushes_before_other_events():
+    original = [
+        _token("a"),
+        _token("b"),
+        _other("on_chain_end"),
+        _token("c"),
+        _tool_call_token('{"x'),
+        _token("d"),
+        _token("e", message_id="other"),
+        _token("f", run_id="other"),
+    ]
+    coalesced = asyncio.run(_collect(_source(original), window=10))
+    assert _contents(coalesced) == ["ab", "on_chain_end", "c", "", "d", "e", "f"]
+    _assert_same_stream(coalesced, original)
+
+
+def test_flushes_at_the_end_of_the_stream():
+    original = [_token("a"), _token("b"), _token("c")]
+    coalesced = asyncio.run(_collect(_source(original), window=10))
+    assert _contents(coalesced) == ["abc"]
+    _assert_same_stream(coalesced, original)
+
+
+def test_flushes_when_the_stream_fails():
+    original = [_token("a"), _token("b")]
+
+    async def events():
+        for event in original:
+            yield event
+        raise ValueError("boom")
+
+    async def main():
+        coalesced = []
+        with pytest.raises(ValueError, match="boom"):
+            async for event in coalesce_chat_model_stream(events(), window=10):
+                coalesced.append(event)
+        return coalesced
+
+    coalesced = asyncio.run(main())
+    assert _contents(coalesced) == ["ab"]
+    _assert_same_stream(coalesced, original)
@@ -0,0 +1,108 @@
+"""Tests for cancelling streamed agent responses when the client disconnects"""
+
+import asyncio
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+from copilotkit.integrations.fastapi import AgentStreamingResponse
+
+
+def _scope(spec_version: str) -> dict:
+    return {"type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}}
+
+
+async def _serve(response: AgentStreamingResponse, spec_version: str, send=None) -> list:
+    sent = []
+    disconnect = asyncio.Event()
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def record(message):
+        sent.append(message)
+        if message.get("body") == b"first\n":
+            # the client goes away after the first event
+            disconnect.set()
+
+    await asyncio.wait_for(response(_scope(spec_version), receive, send or record), 5)
+    return sent
+
+
+def _slow_events(state: dict):
+    async def events():
+        try:
+            yield b"first\n"
+            await asyncio.sleep(10)
+            yield b"never\n"
+        finally:
+            state["closed"] = True
+    return events()
+
+
+@pytest.mark.parametrize("spec_version", ["2.3", "2.4"])
+def test_disconnect_closes_the_stream_right_away(spec_version):
+    state = {}
+    disconnects = []
+    response = AgentStreamingResponse(_slow_events(state), media_type="application/json")
+    response.on_disconnect = lambda: disconnects.append(True)
+
+    sent = asyncio.run(_serve(response, spec_version))
+
+    assert state["closed"]
+    assert disconnects == [True]
+    assert [message.get("body") for message in sent[1:]] == [b"first\n"]
+
+
+def test_streams_are_sent_completely_without_a_disconnect():
+    async def events():
+        for index in range(3):
+            yield f"{index}\n".encode()
+
+    async def receive():
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = AgentStreamingResponse(events(), media_type="application/json")
+    asyncio.run(asyncio.wait_for(response(_scope("2.4"), receive, send), 5))
+    assert b"".join(message.get("body", b"") for message in sent) == b"0\n1\n2\n"
+    assert sent[-1]["more_body"] is False
+
+
+def test_failed_sends_are_reported_as_client_disconnects():
+    state = {}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            raise OSError("connection reset")
+
+    response = AgentStreamingResponse(_slow_events(state), media_type="application/json")
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(_serve(response, "2.4", send=send))
+    assert state["closed"]
+
+
+def test_disconnects_are_ignored_when_cancellation_is_disabled():
+    state = {}
+    response = AgentStreamingResponse(_slow_events(state), media_type="application/json")
+    response.cancel_on_disconnect = False
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(_message):
+        pass
+
+    async def main():
+        # Starlette does not listen for the disconnect from spec version 2.4 on
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(response(_scope("2.4"), receive, send), 0.1)
+
+    asyncio.run(main())
+    assert state["closed"]
@@ -0,0 +1,35 @@
+"""Tests for caching the results of `actions` and `agents` callables"""
+
+from copilotkit import Action, CopilotKitRemoteEndpoint
+from copilotkit.sdk import default_context_fingerprint
+
+
+def _context(user: str) -> dict:
+    return {"properties": {}, "frontend_url": None, "headers": {"authorization": user}}
+
+
+def _counting_actions(calls: list):
+    def actions(context):
+        calls.append(context["headers"]["authorization"])
+        return [Action(name="action", handler=lambda: None)]
+    return actions
+
+
+def test_callables_are_called_on_every_request_by_default():
+    calls = []
+    sdk = CopilotKitRemoteEndpoint(actions=_counting_actions(calls))
+    for user in ["alice", "alice"]:
+        sdk._get_actions(_context(user))  # pylint: disable=protected-access
+    assert calls == ["alice", "alice"]
+
+
+def test_cached_results_are_not_shared_between_callers():
+    calls = []
+    sdk = CopilotKitRemoteEndpoint(
+        actions=_counting_actions(calls),
+        factory_cache_key=default_context_fingerprint
+    )
+    alice = sdk._get_actions(_context("alice"))  # pylint: disable=protected-access
+    assert sdk._get_actions(_context("alice")) is alice  # pylint: disable=protected-access
+    assert sdk._get_actions(_context("bob")) is not alice  # pylint: disable=protected-access
+    assert calls == ["alice", "bob"]
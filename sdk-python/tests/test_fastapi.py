@@ -0,0 +1,56 @@
+"""Tests for the FastAPI integration"""
+
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+
+from .graphs import build_writer_graph, user_message
+
+
+def make_client(sdk: CopilotKitRemoteEndpoint, **kwargs) -> TestClient:
+    """A test client for an app serving `sdk` under /copilotkit"""
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit", **kwargs)
+    return TestClient(app)
+
+
+def make_agent_sdk(**kwargs) -> CopilotKitRemoteEndpoint:
+    """An endpoint serving the writer graph as `agent`"""
+    return CopilotKitRemoteEndpoint(
+        agents=[LangGraphAgent(name="agent", graph=build_writer_graph())],
+        **kwargs
+    )
+
+
+def test_malformed_event_filter_is_rejected():
+    client = make_client(make_agent_sdk())
+    for event_filter in [{"bogus": 1}, "x", {"include": {"events": "on_chain_end"}}]:
+        response = client.post(
+            "/copilotkit/agent/agent",
+            json={
+                "threadId": "thread",
+                "messages": [user_message(0)],
+                "eventFilter": event_filter,
+            }
+        )
+        assert response.status_code == 400
+        assert response.json()["code"] == "invalid_event_filter"
+
+
+def test_event_filter_limits_streamed_events():
+    client = make_client(make_agent_sdk())
+    response = client.post(
+        "/copilotkit/agent/agent",
+        json={
+            "threadId": "thread",
+            "messages": [user_message(0)],
+            "eventFilter": {"include": {"events": ["on_chain_end"]}},
+        }
+    )
+    assert response.status_code == 200
+    event_types = {json.loads(line)["event"] for line in response.text.splitlines() if line}
+    assert event_types == {"on_chain_end", "on_copilotkit_state_sync"}
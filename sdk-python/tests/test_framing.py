@@ -0,0 +1,161 @@
+"""Tests for the msgpack event format"""
+
+import asyncio
+import json
+from enum import Enum, IntEnum
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from copilotkit import langgraph_agent
+from copilotkit.framing import FrameDecoder, decode_frames, frame, msgpack_available, packb
+from copilotkit.serializer import encode_event, encode_runtime_events, use_event_format
+
+from .agents import CONTEXT
+from .graphs import user_message
+from .test_fastapi import make_agent_sdk
+
+pytestmark = pytest.mark.skipif(not msgpack_available(), reason="no MessagePack library")
+
+
+class Color(str, Enum):
+    """A str enum, serialized by value"""
+    RED = "red"
+
+
+class Level(IntEnum):
+    """An int enum, serialized by value"""
+    HIGH = 3
+
+
+class Shape(Enum):
+    """A plain enum, serialized as not implemented"""
+    CIRCLE = object()
+
+
+def _encode(obj, encode=encode_event):
+    """The event as parsed from the JSON event format and decoded from the msgpack one"""
+    with use_event_format("json"):
+        lines = encode(obj)
+    with use_event_format("msgpack"):
+        frames = encode(obj)
+    return [json.loads(line) for line in lines.split("\n") if line], decode_frames(frames)
+
+
+def _frames(*events) -> bytes:
+    return b"".join(frame(packb(event, default=str)) for event in events)
+
+
+def test_decoder_handles_frames_split_at_any_byte():
+    events = [{"event": "a", "data": "x" * 300}, {"event": "b"}, {"event": "c", "data": [1, 2]}]
+    data = _frames(*events)
+    for chunk_size in [1, 2, 3, 5, 64, len(data)]:
+        decoder = FrameDecoder()
+        decoded = []
+        for offset in range(0, len(data), chunk_size):
+            decoded.extend(decoder.feed(data[offset:offset + chunk_size]))
+        decoder.close()
+        assert decoded == events
+
+
+def test_decoder_returns_only_complete_frames():
+    data = _frames({"event": "a"}, {"event": "b"})
+    decoder = FrameDecoder()
+    # the first frame and the header of the second one
+    split = len(_frames({"event": "a"})) + 4
+    assert decoder.feed(data[:split]) == [{"event": "a"}]
+    assert decoder.feed(b"") == []
+    assert decoder.feed(data[split:]) == [{"event": "b"}]
+    decoder.close()
+
+
+@pytest.mark.parametrize("cut", [1, 3, 4, 6])
+def test_decoder_close_fails_on_a_truncated_frame(cut):
+    data = _frames({"event": "a", "data": "payload"})
+    decoder = FrameDecoder()
+    assert decoder.feed(data[:cut]) == []
+    with pytest.raises(ValueError, match="incomplete frame"):
+        decoder.close()
+    with pytest.raises(ValueError):
+        decode_frames(data[:-1])
+
+
+def test_decoder_rejects_oversized_frames():
+    decoder = FrameDecoder(max_frame_size=8)
+    with pytest.raises(ValueError, match="exceeds the maximum"):
+        decoder.feed(_frames({"event": "a", "data": "x" * 20}))
+
+
+def test_integers_larger_than_64_bit_are_sent_as_strings():
+    event = {"event": "a", "data": {"big": 2 ** 70, "small": -(2 ** 63), "max": 2 ** 64 - 1}}
+    for encode in [encode_event, encode_runtime_events]:
+        parsed, decoded = _encode(event, encode)
+        assert parsed[0]["data"]["big"] == 2 ** 70
+        assert decoded == [{
+            "event": "a",
+            "data": {"big": str(2 ** 70), "small": -(2 ** 63), "max": 2 ** 64 - 1},
+        }]
+
+
+def test_enums_match_json():
+    parsed, decoded = _encode({"event": "a", "data": {"color": Color.RED, "level": Level.HIGH}})
+    assert decoded == parsed == [{"event": "a", "data": {"color": "red", "level": 3}}]
+
+    parsed, decoded = _encode({"event": "a", "data": {"shape": Shape.CIRCLE}})
+    assert decoded == parsed
+
+    parsed, decoded = _encode({"type": "a", "value": Color.RED}, encode_runtime_events)
+    assert decoded == parsed == [{"type": "a", "value": "red"}]
+
+
+def test_message_chunks_match_json():
+    chunk = AIMessageChunk(
+        content="hello",
+        id="message",
+        tool_call_chunks=[{
+            "name": "search", "args": '{"q', "id": "call", "index": 0, "type": "tool_call_chunk"
+        }],
+    )
+    parsed, decoded = _encode({"event": "on_chat_model_stream", "data": {"chunk": chunk}})
+    assert decoded == parsed
+    assert decoded[0]["data"]["chunk"]["kwargs"]["content"] == "hello"
+
+
+def test_non_string_keys_match_json():
+    parsed, decoded = _encode({"event": "a", "data": {1: "one", None: "none", 2.5: "half"}})
+    assert decoded == parsed == [
+        {"event": "a", "data": {"1": "one", "null": "none", "2.5": "half"}}
+    ]
+
+
+def test_agent_stream_matches_json(monkeypatch):
+    json_lines = []
+
+    def encode_in_both_formats(event):
+        # record what the JSON event format sends for every event of the stream
+        with use_event_format("json"):
+            json_lines.append(encode_event(event))
+        return encode_event(event)
+
+    monkeypatch.setattr(langgraph_agent, "encode_event", encode_in_both_formats)
+    sdk = make_agent_sdk()
+
+    async def main():
+        stream = sdk.execute_agent(
+            context=CONTEXT,
+            name="agent",
+            thread_id="thread",
+            state={},
+            messages=[user_message(0)],
+            actions=[],
+            node_name=None,
+            event_format="msgpack",
+        )
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(main())
+    assert all(isinstance(chunk, bytes) for chunk in chunks)
+    decoded = decode_frames(b"".join(chunks))
+    assert len(decoded) == len(json_lines) > 0
+    assert decoded == [json.loads(line) for line in json_lines]
+    assert any(event.get("event") == "on_chat_model_stream" for event in decoded)
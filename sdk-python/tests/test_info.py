@@ -0,0 +1,120 @@
+"""Tests for the cached info endpoint"""
+
+import functools
+
+from copilotkit import Action, CopilotKitRemoteEndpoint
+from copilotkit.sdk import default_context_fingerprint
+
+from .test_fastapi import make_client
+
+
+def _actions_for_user(context):
+    user = context["headers"].get("authorization", "anonymous")
+    return [Action(name=f"action_of_{user}", handler=lambda: None)]
+
+
+def test_info_payloads_are_not_shared_between_callers():
+    client = make_client(CopilotKitRemoteEndpoint(actions=_actions_for_user))
+
+    alice = client.post("/copilotkit", json={}, headers={"Authorization": "alice"})
+    bob = client.post(
+        "/copilotkit",
+        json={},
+        headers={"Authorization": "bob", "If-None-Match": alice.headers["etag"]}
+    )
+
+    assert bob.status_code == 200
+    assert [action["name"] for action in bob.json()["actions"]] == ["action_of_bob"]
+    assert bob.headers["etag"] != alice.headers["etag"]
+
+
+def test_info_is_revalidated_with_the_etag():
+    client = make_client(CopilotKitRemoteEndpoint(actions=_actions_for_user))
+
+    first = client.post("/copilotkit", json={}, headers={"Authorization": "alice"})
+    second = client.post(
+        "/copilotkit",
+        json={},
+        headers={"Authorization": "alice", "If-None-Match": first.headers["etag"]}
+    )
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_info_of_dynamic_actions_is_cached_per_caller():
+    calls = []
+
+    def actions(context):
+        calls.append(context["headers"].get("authorization"))
+        return _actions_for_user(context)
+
+    sdk = CopilotKitRemoteEndpoint(actions=actions)
+    for user in ["alice", "alice", "bob"]:
+        sdk.info_payload(
+            context={"properties": {}, "frontend_url": None, "headers": {"authorization": user}}
+        )
+    assert calls == ["alice", "bob"]
+
+
+def test_info_of_lists_is_cached_until_they_change():
+    sdk = CopilotKitRemoteEndpoint(actions=[Action(name="first", handler=lambda: None)])
+    context = {"properties": {}, "frontend_url": None, "headers": {}}
+
+    payload = sdk.info_payload(context=context)
+    assert sdk.info_payload(context=context) is payload
+
+    sdk.actions.append(Action(name="second", handler=lambda: None))
+    assert [action["name"] for action in sdk.info_payload(context=context).info["actions"]] == [
+        "first", "second"
+    ]
+
+
+def test_info_cache_ignores_per_request_headers():
+    calls = []
+
+    def actions(context):
+        calls.append(context["headers"].get("authorization"))
+        return _actions_for_user(context)
+
+    sdk = CopilotKitRemoteEndpoint(actions=actions)
+    for request_id in range(3):
+        sdk.info_payload(context={
+            "properties": {},
+            "frontend_url": None,
+            "headers": {
+                "authorization": "alice",
+                "x-request-id": str(request_id),
+                "traceparent": f"00-{request_id:032x}-{request_id:016x}-01",
+                "user-agent": f"client/{request_id}",
+            },
+        })
+    assert calls == ["alice"]
+    assert len(sdk.info_cache) == 1
+
+
+def test_info_cache_key_headers_are_configurable():
+    calls = []
+
+    def actions(context):
+        calls.append(context["headers"].get("x-tenant-id"))
+        return []
+
+    sdk = CopilotKitRemoteEndpoint(
+        actions=actions,
+        info_cache_key=functools.partial(default_context_fingerprint, headers=("x-tenant-id",))
+    )
+    for tenant in ["a", "a", "b"]:
+        sdk.info_payload(
+            context={"properties": {}, "frontend_url": None, "headers": {"x-tenant-id": tenant}}
+        )
+    assert calls == ["a", "b"]
+
+
+def test_info_returns_a_copy_of_the_cached_payload():
+    sdk = CopilotKitRemoteEndpoint(actions=_actions_for_user)
+    context = {"properties": {}, "frontend_url": None, "headers": {"authorization": "alice"}}
+
+    sdk.info(context=context)["actions"].clear()
+    assert [action["name"] for action in sdk.info(context=context)["actions"]] == [
+        "action_of_alice"
+    ]
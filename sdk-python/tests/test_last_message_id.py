@@ -0,0 +1,75 @@
+"""Tests for syncing only the messages after `lastMessageId` at the end of a run"""
+
+import asyncio
+import json
+
+from .graphs import user_message
+from .test_fastapi import make_agent_sdk, make_client
+
+
+def _final_sync(response) -> dict:
+    syncs = [
+        event for event in (json.loads(line) for line in response.text.split("\n") if line)
+        if event.get("event") == "on_copilotkit_state_sync"
+    ]
+    return syncs[-1]
+
+
+def _execute(client, messages: list, **body):
+    response = client.post(
+        "/copilotkit/agent/agent",
+        json={"threadId": "thread", "messages": messages, **body}
+    )
+    assert response.status_code == 200
+    return response
+
+
+def _thread_messages(sdk) -> list:
+    return asyncio.run(sdk.agents[0].get_state(thread_id="thread"))["messages"]
+
+
+def test_only_newer_messages_are_synced():
+    sdk = make_agent_sdk()
+    client = make_client(sdk)
+    first = _final_sync(_execute(client, [user_message(0)]))
+    assert "messages_after" not in first
+    last_message_id = first["state"]["messages"][-1]["id"]
+
+    final = _final_sync(_execute(
+        client,
+        [user_message(0), user_message(1)],
+        lastMessageId=last_message_id
+    ))
+    assert final["messages_after"] == last_message_id
+
+    thread_messages = _thread_messages(sdk)
+    ids = [message["id"] for message in thread_messages]
+    assert final["state"]["messages"] == thread_messages[ids.index(last_message_id) + 1:]
+    assert [message["id"] for message in final["state"]["messages"]][0] == "user-1"
+
+
+def test_unknown_last_message_id_syncs_all_messages():
+    sdk = make_agent_sdk()
+    client = make_client(sdk)
+    _execute(client, [user_message(0)])
+
+    final = _final_sync(_execute(client, [user_message(0), user_message(1)], lastMessageId="gone"))
+    assert "messages_after" not in final
+    assert final["state"]["messages"] == _thread_messages(sdk)
+
+
+def test_unknown_anchor_of_sent_messages_requires_resync():
+    client = make_client(make_agent_sdk())
+    _execute(client, [user_message(0)])
+
+    response = client.post(
+        "/copilotkit/agent/agent",
+        json={
+            "threadId": "thread",
+            "messages": [user_message(1)],
+            "messagesAfter": "gone",
+            "lastMessageId": "gone",
+        }
+    )
+    assert response.status_code == 409
+    assert response.json()["code"] == "resync_required"
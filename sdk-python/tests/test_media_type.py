@@ -0,0 +1,61 @@
+"""Tests for negotiating the media type of agent responses"""
+
+import pytest
+
+from copilotkit.framing import MSGPACK_MEDIA_TYPE, msgpack_available
+from copilotkit.integrations.fastapi import _negotiate_media_type
+from copilotkit.streaming import negotiate_media_type
+
+from .graphs import user_message
+from .test_fastapi import make_agent_sdk, make_client
+
+OFFERS = ["text/event-stream", "application/json"]
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, None),
+    ("", None),
+    ("text/event-stream", "text/event-stream"),
+    ("TEXT/Event-Stream; charset=utf-8", "text/event-stream"),
+    ("text/event-stream;q=0, application/json", "application/json"),
+    ("text/event-stream;q=0.5, application/json", "application/json"),
+    ("application/json;q=0.5, text/event-stream", "text/event-stream"),
+    ("application/json, text/event-stream", "text/event-stream"),
+    ("text/event-stream;q=nope, application/json;q=0.1", "application/json"),
+    ("text/event-stream;q=0", None),
+    ("*/*", None),
+    ("text/*", None),
+    ("text/event-streams", None),
+])
+def test_negotiate_media_type(accept, expected):
+    assert negotiate_media_type(accept, OFFERS) == expected
+
+
+def test_msgpack_is_only_picked_when_asked_for_by_name():
+    assert _negotiate_media_type({"accept": "application/msgpack-foo"}) == "application/json"
+    assert _negotiate_media_type({"accept": "*/*"}) == "application/json"
+    assert _negotiate_media_type({
+        "accept": "application/msgpack;q=0, text/event-stream"
+    }) == "text/event-stream"
+    if msgpack_available():
+        assert _negotiate_media_type({
+            "accept": "application/x-msgpack, text/event-stream;q=0.9"
+        }) == MSGPACK_MEDIA_TYPE
+
+
+def test_excluded_event_stream_is_not_served():
+    client = make_client(make_agent_sdk())
+    response = client.post(
+        "/copilotkit/agent/agent",
+        json={"threadId": "thread", "messages": [user_message(0)]},
+        headers={"Accept": "text/event-stream;q=0, application/json"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+
+
+def test_info_is_html_only_when_accepted():
+    client = make_client(make_agent_sdk())
+    assert client.get("/copilotkit", headers={"Accept": "text/html"}).text.lstrip().startswith("<")
+    response = client.get("/copilotkit", headers={"Accept": "text/html;q=0, application/json"})
+    assert response.headers["content-type"].startswith("application/json")
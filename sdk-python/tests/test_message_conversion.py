@@ -0,0 +1,53 @@
+"""Tests for the CopilotKit to LangChain message conversion"""
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from copilotkit.langgraph import copilotkit_messages_to_langchain
+
+MESSAGES = [
+    {"type": "TextMessage", "role": "user", "content": "hi", "id": "user-0"},
+    {
+        "type": "ActionExecutionMessage",
+        "id": "call-1",
+        "name": "Search",
+        "arguments": {"query": "a"},
+        "parentMessageId": "assistant-0",
+    },
+    {
+        "type": "ResultMessage",
+        "id": "result-1",
+        "result": "found a",
+        "actionName": "Search",
+        "actionExecutionId": "call-1",
+    },
+    {
+        "type": "ActionExecutionMessage",
+        "id": "call-2",
+        "name": "Search",
+        "arguments": {"query": "b"},
+        "parentMessageId": "assistant-0",
+    },
+    {"type": "TextMessage", "role": "assistant", "content": "done", "id": "assistant-1"},
+]
+
+
+def test_tool_calls_are_grouped_by_parent_message():
+    converted = copilotkit_messages_to_langchain()(MESSAGES)
+
+    assert [type(message) for message in converted] == [
+        HumanMessage, AIMessage, ToolMessage, AIMessage
+    ]
+    assert converted[1].id == "assistant-0"
+    assert [call["id"] for call in converted[1].tool_calls] == ["call-1", "call-2"]
+    assert converted[2].tool_call_id == "call-1"
+
+
+def test_converted_messages_are_not_shared_between_conversions():
+    convert = copilotkit_messages_to_langchain()
+    first = convert(MESSAGES)
+    first[0].additional_kwargs["mutated"] = True
+    first[1].tool_calls[0]["args"]["query"] = "mutated"
+
+    second = convert(MESSAGES)
+    assert second[0].additional_kwargs == {}
+    assert second[1].tool_calls[0]["args"] == {"query": "a"}
@@ -0,0 +1,103 @@
+"""Tests for execute requests that only send the messages after `messagesAfter`"""
+
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from copilotkit.integrations.fastapi import handle_execute_agent
+
+from .graphs import user_message
+from .test_fastapi import make_agent_sdk, make_client
+
+
+def _execute(client: TestClient, thread_id: str, messages: list, **body):
+    return client.post(
+        "/copilotkit/agent/agent",
+        json={"threadId": thread_id, "messages": messages, **body}
+    )
+
+
+def _thread_messages(sdk, thread_id: str) -> list:
+    graph = sdk.agents[0].graph
+    state = asyncio.run(graph.aget_state({"configurable": {"thread_id": thread_id}}))
+    return state.values["messages"]
+
+
+def test_unknown_anchor_requires_resync():
+    client = make_client(make_agent_sdk())
+    assert _execute(client, "thread", [user_message(0)]).status_code == 200
+
+    response = _execute(client, "thread", [user_message(1)], messagesAfter="unknown")
+    assert response.status_code == 409
+    assert response.json()["code"] == "resync_required"
+    assert response.json()["messageId"] == "unknown"
+
+
+def test_continuing_a_history_message_requires_resync():
+    sdk = make_agent_sdk()
+    client = make_client(sdk)
+    assert _execute(client, "thread", [user_message(0)]).status_code == 200
+    assistant_id = _thread_messages(sdk, "thread")[-1].id
+
+    # another tool call of the last assistant message
+    tool_call = {
+        "type": "ActionExecutionMessage",
+        "id": "call-2",
+        "name": "WriteDocument",
+        "arguments": {},
+        "parentMessageId": assistant_id,
+    }
+    response = _execute(client, "thread", [tool_call], messagesAfter=assistant_id)
+    assert response.status_code == 409
+    assert response.json()["code"] == "resync_required"
+
+
+def test_delta_gives_the_same_history_as_the_full_messages():
+    sdk = make_agent_sdk()
+    client = make_client(sdk)
+    for thread_id in ["full", "delta"]:
+        assert _execute(client, thread_id, [user_message(0)]).status_code == 200
+
+    full = _thread_messages(sdk, "full")
+    assistant = {
+        "type": "TextMessage",
+        "role": "assistant",
+        "content": full[-1].content,
+        "id": full[-1].id,
+    }
+    assert _execute(
+        client, "full", [user_message(0), assistant, user_message(1)]
+    ).status_code == 200
+
+    anchor = _thread_messages(sdk, "delta")[-1].id
+    assert _execute(client, "delta", [user_message(1)], messagesAfter=anchor).status_code == 200
+
+    def summary(messages):
+        return [(type(message).__name__, message.content) for message in messages]
+    assert summary(_thread_messages(sdk, "delta")) == summary(_thread_messages(sdk, "full"))
+
+
+def test_sync_handler_can_be_returned_from_a_custom_route():
+    sdk = make_agent_sdk()
+    app = FastAPI()
+
+    @app.post("/run")
+    async def run(request: Request):
+        body = await request.json()
+        return handle_execute_agent(
+            sdk=sdk,
+            context={"properties": {}, "frontend_url": None, "headers": request.headers},
+            thread_id="thread",
+            name="agent",
+            node_name=None,
+            state={},
+            messages=body["messages"],
+            actions=[],
+        )
+
+    response = TestClient(app).post("/run", json={"messages": [user_message(0)]})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    assert events[-1]["event"] == "on_copilotkit_state_sync"
@@ -0,0 +1,96 @@
+"""Tests for the incremental partial JSON parser"""
+
+import json
+
+import pytest
+from partialjson.json_parser import JSONParser
+
+from copilotkit.partial_json import IncrementalJSONParser
+
+ARGUMENTS = [
+    json.dumps({"document": "hello world", "done": False}),
+    json.dumps({"text": 'quote " backslash \\ slash / newline \n tab \t \u0001 end'}),
+    json.dumps({"text": "unicode: äöü ß € 漢字 😀"}),
+    json.dumps({"text": "unicode: äöü ß € 漢字 😀"}, ensure_ascii=False),
+    json.dumps({
+        "steps": [
+            {"title": "draft", "done": True, "tags": ["a", "b"], "meta": {"weight": 0.5}},
+            {"title": "review", "done": False, "tags": [], "meta": {}},
+        ],
+        "matrix": [[1, 2], [3, [4, 5]], []],
+        "empty": None,
+    }),
+    '{"count": 12345, "ratio": -0.125, "scale": 1.5e3, "flags": [true, false, null]}',
+    '{ "spaced" : [ 1 , "two" , { "three" : 3 } ] , "last" : "x" }',
+    '["top", "level", ["array"]]',
+]
+
+
+def _expected(text: str):
+    try:
+        return JSONParser().parse(text), None
+    except Exception as exc:  # pylint: disable=broad-except
+        return None, exc
+
+
+def _actual(parser: IncrementalJSONParser):
+    try:
+        return parser.get_value(), None
+    except ValueError as exc:
+        return None, exc
+
+
+@pytest.mark.parametrize("arguments", ARGUMENTS)
+def test_every_prefix_matches_partialjson(arguments):
+    parser = IncrementalJSONParser()
+    for end in range(1, len(arguments) + 1):
+        parser.feed(arguments[end - 1])
+        expected, expected_error = _expected(arguments[:end])
+        actual, actual_error = _actual(parser)
+        prefix = arguments[:end]
+        assert (actual_error is None) == (expected_error is None), prefix
+        assert actual == expected, prefix
+
+    assert parser.get_value() == json.loads(arguments)
+
+
+@pytest.mark.parametrize("arguments", ARGUMENTS)
+@pytest.mark.parametrize("chunk_size", [3, 8])
+def test_chunked_feeding_matches_partialjson(arguments, chunk_size):
+    parser = IncrementalJSONParser()
+    for end in range(chunk_size, len(arguments) + chunk_size, chunk_size):
+        parser.feed(arguments[end - chunk_size:end])
+        expected, expected_error = _expected(arguments[:end])
+        actual, actual_error = _actual(parser)
+        assert (actual_error is None) == (expected_error is None), arguments[:end]
+        assert actual == expected, arguments[:end]
+
+
+@pytest.mark.parametrize("truncated", [
+    '{"count": 12',
+    '{"count": -',
+    '{"ratio": 0.',
+    '{"done": tr',
+    '{"done": fals',
+    '{"empty": nu',
+    '{"text": "unfinished',
+    '{"text": "escape \\',
+    '{"text": "unicode \\u00',
+    '{"steps": [{"title": "dr',
+    '{"key',
+    '{"key": ',
+])
+def test_truncated_values_match_partialjson(truncated):
+    parser = IncrementalJSONParser()
+    parser.feed(truncated)
+    assert _actual(parser)[0] == _expected(truncated)[0]
+    assert (_actual(parser)[1] is None) == (_expected(truncated)[1] is None)
+
+
+def test_values_are_not_mutated_by_later_chunks():
+    parser = IncrementalJSONParser()
+    parser.feed('{"steps": ["a"')
+    value = parser.get_value()
+    parser.feed(', "b"]}')
+    assert value == {"steps": ["a"]}
+    assert parser.get_value() == {"steps": ["a", "b"]}
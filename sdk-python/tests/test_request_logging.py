@@ -0,0 +1,101 @@
+"""Tests for request logging"""
+
+import logging
+
+from copilotkit.logging import RequestLogger
+
+
+class Unformattable:
+    """Fails the test if it is ever formatted"""
+
+    def __repr__(self):
+        raise AssertionError("formatted although the request is not logged")
+
+
+class RecordingHandler(logging.Handler):
+    """Keeps the emitted records"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _logger(name: str, level: int = logging.DEBUG):
+    logger = logging.getLogger(f"tests.request_logging.{name}")
+    logger.setLevel(level)
+    logger.propagate = False
+    handler = RecordingHandler()
+    logger.handlers = [handler]
+    return logger, handler
+
+
+def test_only_every_nth_request_is_logged():
+    logger, handler = _logger("sampling")
+    request_logger = RequestLogger(logger, {"sample_rate": 3})
+    for index in range(7):
+        request_logger.log("Request", [("Index", index)])
+
+    assert [record.copilotkit_request["fields"]["Index"] for record in handler.records] == [
+        "0", "3", "6"
+    ]
+
+
+def test_fields_are_truncated():
+    logger, handler = _logger("truncation")
+    request_logger = RequestLogger(
+        logger,
+        {"max_field_length": 10, "field_max_lengths": {"State": 4, "Context": None}}
+    )
+    request_logger.log("Request", [
+        ("Messages", "m" * 30),
+        ("State", "s" * 30),
+        ("Context", "c" * 30),
+        ("Short", "ok"),
+    ])
+
+    fields = handler.records[0].copilotkit_request["fields"]
+    assert fields["Messages"] == repr("m" * 30)[:10] + "... (22 more characters)"
+    assert fields["State"] == repr("s" * 30)[:4] + "... (28 more characters)"
+    assert fields["Context"] == repr("c" * 30)
+    assert fields["Short"] == repr("ok")
+
+
+def test_requests_are_logged_at_the_configured_level():
+    logger, handler = _logger("level", level=logging.INFO)
+    RequestLogger(logger, {"level": logging.DEBUG}).log("Request", [("Field", 1)])
+    assert handler.records == []
+
+    RequestLogger(logger, {"level": logging.WARNING}).log("Request", [("Field", 1)])
+    assert [record.levelno for record in handler.records] == [logging.WARNING]
+
+
+def test_fields_are_not_formatted_when_logging_is_disabled():
+    logger, handler = _logger("disabled", level=logging.WARNING)
+    calls = []
+
+    def expensive():
+        calls.append(True)
+        return Unformattable()
+
+    request_logger = RequestLogger(logger)
+    request_logger.log("Request", [("Lazy", expensive), ("Eager", Unformattable())])
+    assert calls == []
+    assert handler.records == []
+
+
+def test_fields_are_not_formatted_for_requests_that_are_not_sampled():
+    logger, handler = _logger("unsampled")
+    calls = []
+
+    def expensive():
+        calls.append(True)
+        return "value"
+
+    request_logger = RequestLogger(logger, {"sample_rate": 2})
+    request_logger.log("Request", [("Lazy", expensive)])
+    request_logger.log("Request", [("Lazy", expensive), ("Eager", Unformattable())])
+    assert calls == [True]
+    assert len(handler.records) == 1
@@ -0,0 +1,99 @@
+"""Tests for resumable agent runs"""
+
+import asyncio
+
+import pytest
+
+from copilotkit.exc import IdempotencyKeyConflictException, RunEventsExpiredException
+from copilotkit.runs import AgentRun, AgentRunRegistry
+
+from .graphs import user_message
+from .test_fastapi import make_agent_sdk, make_client
+
+
+def _context(user: str) -> dict:
+    return {"properties": {}, "frontend_url": None, "headers": {"authorization": user}}
+
+
+def test_idempotency_keys_are_scoped_to_the_caller():
+    registry = AgentRunRegistry()
+    run, created = registry.create(
+        agent_name="agent", thread_id="thread", idempotency_key="key", context=_context("alice")
+    )
+    assert created
+
+    repeated, created = registry.create(
+        agent_name="agent", thread_id="thread", idempotency_key="key", context=_context("alice")
+    )
+    assert repeated is run and not created
+
+    other, created = registry.create(
+        agent_name="agent", thread_id="thread", idempotency_key="key", context=_context("bob")
+    )
+    assert other is not run and created
+
+
+def test_idempotency_keys_are_bound_to_their_thread():
+    registry = AgentRunRegistry()
+    registry.create(agent_name="agent", thread_id="thread", idempotency_key="key")
+    with pytest.raises(IdempotencyKeyConflictException) as exc_info:
+        registry.create(agent_name="agent", thread_id="other", idempotency_key="key")
+    assert exc_info.value.thread_id == "thread"
+
+
+def test_discarded_runs_free_their_idempotency_key():
+    registry = AgentRunRegistry()
+    run, _ = registry.create(agent_name="agent", thread_id="thread", idempotency_key="key")
+    registry.discard(run)
+    _, created = registry.create(agent_name="agent", thread_id="other", idempotency_key="key")
+    assert created
+
+
+def test_buffer_is_bounded_in_bytes():
+    run = AgentRun(
+        run_id="run",
+        agent_name="agent",
+        thread_id="thread",
+        buffer_size=1000,
+        max_buffer_bytes=100,
+    )
+
+    async def events():
+        for index in range(10):
+            yield f'{{"event": "e{index}", "data": "{"x" * 10}"}}\n'
+
+    async def main():
+        run.start(events())
+        await asyncio.wait_for(run._task, 5)  # pylint: disable=protected-access
+        return [chunk async for _, chunk in run.stream(run.first_seq - 1)]
+
+    buffered = asyncio.run(main())
+    assert sum(len(chunk) for chunk in buffered) <= 100
+    assert buffered[-1].startswith('{"event": "e9"')
+    assert run.last_seq == 10
+    with pytest.raises(RunEventsExpiredException):
+        run.check(0)
+
+
+def test_repeated_requests_attach_to_the_same_run():
+    client = make_client(make_agent_sdk(resumable_runs={}))
+
+    def execute(thread_id: str, user: str):
+        return client.post(
+            "/copilotkit/agent/agent",
+            json={"threadId": thread_id, "messages": [user_message(0)]},
+            headers={"Idempotency-Key": "key", "Authorization": user}
+        )
+
+    first = execute("thread", "alice")
+    repeated = execute("thread", "alice")
+    assert first.status_code == repeated.status_code == 200
+    assert repeated.headers["x-copilotkit-run-id"] == first.headers["x-copilotkit-run-id"]
+    assert repeated.text == first.text
+
+    other_caller = execute("thread", "bob")
+    assert other_caller.headers["x-copilotkit-run-id"] != first.headers["x-copilotkit-run-id"]
+
+    conflict = execute("other", "alice")
+    assert conflict.status_code == 409
+    assert conflict.json()["code"] == "idempotency_key_conflict"
@@ -0,0 +1,73 @@
+"""Tests for the cached graph schema keys"""
+
+from typing import List
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+from langchain_core.runnables import ensure_config
+from pydantic import BaseModel
+
+from copilotkit import CopilotKitState, LangGraphAgent
+
+
+class FirstState(CopilotKitState):
+    """State with a document"""
+    document: str
+
+
+class SecondState(CopilotKitState):
+    """State with a list of steps"""
+    steps: List[str]
+
+
+class NarrowInput(BaseModel):
+    """An input schema with a single key"""
+    topic: str
+
+
+def _build_graph(state):
+    graph = StateGraph(state)
+    graph.add_node("noop", lambda state: {})
+    graph.set_entry_point("noop")
+    graph.add_edge("noop", END)
+    return graph.compile(checkpointer=MemorySaver())
+
+
+def test_schema_keys_are_cached_per_graph():
+    first = LangGraphAgent(name="first", graph=_build_graph(FirstState))
+    second = LangGraphAgent(name="second", graph=_build_graph(SecondState))
+    config = ensure_config({})
+
+    first_input, first_output, _ = first.get_schema_keys(config)
+    second_input, second_output, _ = second.get_schema_keys(config)
+    assert "document" in first_input and "document" in first_output
+    assert "steps" in second_input and "steps" in second_output
+    assert "steps" not in first_input and "document" not in second_input
+    # cached
+    assert first.get_schema_keys(config)[0] is first_input
+
+
+def test_schema_keys_follow_a_change_of_the_graph():
+    agent = LangGraphAgent(name="agent", graph=_build_graph(FirstState))
+    config = ensure_config({})
+    assert "document" in agent.get_schema_keys(config)[0]
+
+    agent.graph = _build_graph(SecondState)
+    input_keys, output_keys, _ = agent.get_schema_keys(config)
+    assert "steps" in input_keys and "document" not in input_keys
+    assert "steps" in output_keys
+
+
+def test_schema_keys_follow_a_change_of_the_input_schema(monkeypatch):
+    graph = _build_graph(FirstState)
+    agent = LangGraphAgent(name="agent", graph=graph)
+    config = ensure_config({})
+    assert "document" in agent.get_schema_keys(config)[0]
+
+    monkeypatch.setattr(graph, "get_input_schema", lambda config=None: NarrowInput)
+    monkeypatch.setattr(
+        graph, "get_input_jsonschema", lambda config=None: NarrowInput.model_json_schema()
+    )
+    input_keys, output_keys, _ = agent.get_schema_keys(config)
+    assert input_keys == frozenset({"topic", "copilotkit", "messages"})
+    assert "document" in output_keys
@@ -0,0 +1,105 @@
+"""Tests for delta encoded state syncs"""
+
+import asyncio
+import json
+
+import jsonpatch
+
+from copilotkit import LangGraphAgent
+from copilotkit.langgraph_agent import _StateSyncEncoder
+
+from .graphs import build_pipeline_graph, build_writer_graph, collect_events
+
+
+def _state_syncs(events: list) -> list:
+    return [event for event in events if event.get("event") == "on_copilotkit_state_sync"]
+
+
+def _without_messages(state: dict) -> dict:
+    return {key: value for key, value in state.items() if key != "messages"}
+
+
+def _assert_deltas_match_snapshots(build_graph):
+    full = _state_syncs(asyncio.run(collect_events(
+        LangGraphAgent(name="agent", graph=build_graph()),
+        turns=2
+    )))
+    deltas = _state_syncs(asyncio.run(collect_events(
+        LangGraphAgent(
+            name="agent",
+            graph=build_graph(),
+            copilotkit_config={"emit_state_deltas": True}
+        ),
+        turns=2
+    )))
+
+    assert len(full) == len(deltas)
+    state = None
+    for snapshot, event in zip(full, deltas):
+        if "state" in event:
+            state = event["state"]
+        else:
+            state = jsonpatch.apply_patch(state, event["state_delta"])
+        assert _without_messages(state) == _without_messages(snapshot["state"])
+
+
+def test_deltas_rebuild_the_streamed_state():
+    _assert_deltas_match_snapshots(build_writer_graph)
+
+
+def test_deltas_rebuild_manually_emitted_state():
+    _assert_deltas_match_snapshots(build_pipeline_graph)
+
+
+def test_first_and_final_syncs_are_snapshots():
+    events = _state_syncs(asyncio.run(collect_events(
+        LangGraphAgent(
+            name="agent",
+            graph=build_writer_graph(),
+            copilotkit_config={"emit_state_deltas": True}
+        )
+    )))
+    assert "state" in events[0]
+    assert "state" in events[-1]
+    assert [event["state_seq"] for event in events] == list(range(1, len(events) + 1))
+
+
+def test_encoder_only_diffs_changed_keys():
+    encoder = _StateSyncEncoder()
+    resources = [{"url": "a"}]
+    encoder.encode({"document": "a", "resources": resources, "draft": True})
+
+    fields = encoder.encode(
+        {"document": "ab", "resources": resources},
+        changed_keys={"document"}
+    )
+    assert fields["state_delta"] == [
+        {"op": "remove", "path": "/draft"},
+        {"op": "replace", "path": "/document", "value": "ab"},
+    ]
+
+    # keys that are not reported as changed are not diffed, nor sent
+    fields = encoder.encode(
+        {"document": "ab", "resources": [{"url": "b"}, {"url": "x"}]},
+        changed_keys=set()
+    )
+    assert fields["state_delta"] == []
+
+    # the next delta of the key is relative to what the client has received
+    fields = encoder.encode({"document": "ab", "resources": [{"url": "c"}]})
+    assert fields["state_delta"] == [
+        {"op": "replace", "path": "/resources/0/url", "value": "c"},
+    ]
+
+
+def test_deltas_apply_to_the_received_state_after_changes_in_place():
+    encoder = _StateSyncEncoder()
+    items = [1]
+    # what the client received
+    client = json.loads(json.dumps(encoder.encode({"items": items, "document": "a"})["state"]))
+
+    # changed in place after the snapshot was sent
+    items.append(2)
+    for state in [{"items": [1, 2, 3], "document": "a"}, {"items": [1, 2, 3], "document": "b"}]:
+        client = jsonpatch.apply_patch(client, encoder.encode(state)["state_delta"])
+        assert client == state
@@ -0,0 +1,43 @@
+"""Tests for the state syncs of LangGraphAgent"""
+
+import asyncio
+from itertools import groupby
+
+from copilotkit import LangGraphAgent
+
+from .graphs import build_pipeline_graph, build_writer_graph, collect_events
+
+
+def _sync_sequence(build_graph) -> list:
+    """(node name, active, number of consecutive syncs) of the state syncs of a run"""
+    events = asyncio.run(collect_events(LangGraphAgent(name="agent", graph=build_graph())))
+    syncs = [
+        (event["node_name"], event["active"])
+        for event in events if event.get("event") == "on_copilotkit_state_sync"
+    ]
+    return [(*key, len(list(group))) for key, group in groupby(syncs)]
+
+
+# the syncs emitted when the state was compared with the last emitted state on every event
+
+def test_sync_sequence_of_streamed_intermediate_state():
+    assert _sync_sequence(build_writer_graph) == [
+        ("write", True, 38),
+        ("write", False, 1),
+        ("write", True, 1),
+        ("__end__", False, 1),
+    ]
+
+
+def test_sync_sequence_of_nodes_without_intermediate_state():
+    # the graph's final output updates messages, which must not cause another sync of the
+    # node that just ended
+    assert _sync_sequence(build_pipeline_graph) == [
+        ("plan", True, 4),
+        ("plan", False, 1),
+        ("write", True, 38),
+        ("write", False, 1),
+        ("review", True, 1),
+        ("review", False, 1),
+        ("__end__", False, 1),
+    ]
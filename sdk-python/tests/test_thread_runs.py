@@ -0,0 +1,133 @@
+"""Tests for serializing agent runs on the same thread"""
+
+import asyncio
+import threading
+
+import pytest
+
+from copilotkit import CopilotKitRemoteEndpoint
+from copilotkit.exc import ThreadBusyException
+from copilotkit.streaming import CancellableStream
+
+from .agents import GatedAgent, execute, next_event
+
+
+def test_runs_are_not_coordinated_by_default():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent])
+
+    async def main():
+        first, second = execute(sdk, "thread"), execute(sdk, "thread")
+        assert (await next_event(first))["event"] == "started"
+        assert (await next_event(second))["event"] == "started"
+        await first.aclose()
+        await second.aclose()
+
+    asyncio.run(main())
+    assert sdk.thread_runs is None
+
+
+def test_reject_policy():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], thread_run_policy="reject")
+
+    async def main():
+        first = execute(sdk, "thread")
+        await next_event(first)
+        with pytest.raises(ThreadBusyException):
+            await execute(sdk, "thread").__anext__()
+        # other threads are not affected
+        other = execute(sdk, "other")
+        assert (await next_event(other))["event"] == "started"
+
+        agent.release("thread")
+        async for _ in first:
+            pass
+        retried = execute(sdk, "thread")
+        assert (await next_event(retried))["event"] == "started"
+        for stream in [other, retried]:
+            await stream.aclose()
+
+    asyncio.run(main())
+    assert len(sdk.thread_runs) == 0
+
+
+def test_queue_policy():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], thread_run_policy="queue")
+
+    async def main():
+        first, second = execute(sdk, "thread"), execute(sdk, "thread")
+        await next_event(first)
+        waiting = asyncio.ensure_future(next_event(second))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+
+        agent.release("thread")
+        async for _ in first:
+            pass
+        assert (await waiting)["event"] == "started"
+        await second.aclose()
+
+    asyncio.run(main())
+
+
+def test_cancel_previous_policy():
+    agent = GatedAgent()
+    sdk = CopilotKitRemoteEndpoint(agents=[agent], thread_run_policy="cancel_previous")
+
+    async def main():
+        first, second = execute(sdk, "thread"), execute(sdk, "thread")
+        await next_event(first)
+        started = asyncio.ensure_future(next_event(second))
+
+        assert await next_event(first) == {
+            "event": "on_copilotkit_run_superseded",
+            "data": {"thread_id": "thread", "agent_name": "agent"},
+        }
+        assert (await started)["event"] == "started"
+        # the previous run was stopped before the new one started
+        assert agent.closed == ["thread"]
+        await second.aclose()
+
+    asyncio.run(main())
+
+
+def test_cancellable_stream_can_be_cancelled_from_another_thread():
+    closed = []
+
+    async def events():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def main():
+        stream = CancellableStream(events())
+        received = []
+        async for event in stream:
+            received.append(event)
+            threading.Thread(target=stream.cancel).start()
+        return stream, received
+
+    stream, received = asyncio.run(asyncio.wait_for(main(), 5))
+    assert received == ["first"]
+    assert stream.cancelled
+    assert closed == [True]
+
+
+def test_cancellable_stream_passes_errors_through():
+    async def events():
+        yield "first"
+        raise ValueError("boom")
+
+    async def main():
+        received = []
+        with pytest.raises(ValueError, match="boom"):
+            async for event in CancellableStream(events()):
+                received.append(event)
+        return received
+
+    assert asyncio.run(main()) == ["first"]
@@ -0,0 +1,66 @@
+"""Tests for the thread state cache of LangGraph agents"""
+
+import asyncio
+
+from copilotkit import LangGraphAgent
+
+from .graphs import build_writer_graph, user_message
+
+
+async def _run(agent, turn: int, *, thread_id: str = "thread"):
+    async for _ in agent.execute(
+        state={},
+        messages=[user_message(index, f"turn {index}") for index in range(turn)],
+        thread_id=thread_id,
+        actions=[],
+        node_name=None,
+    ):
+        pass
+
+
+def _message_contents(state: dict) -> list:
+    return [message["content"] for message in state["messages"] if message["role"] == "user"]
+
+
+def test_cached_state_is_refreshed_at_the_end_of_a_run():
+    agent = LangGraphAgent(
+        name="agent",
+        graph=build_writer_graph(),
+        copilotkit_config={"thread_state_cache_ttl": 3600},
+    )
+    reads = []
+    aget_state = agent.graph.aget_state
+
+    async def counting_aget_state(*args, **kwargs):
+        reads.append(args)
+        return await aget_state(*args, **kwargs)
+
+    async def main():
+        await _run(agent, 1)
+        state = await agent.get_state(thread_id="thread")
+        assert _message_contents(state) == ["turn 0"]
+
+        await _run(agent, 2)
+        agent.graph.aget_state = counting_aget_state
+        state = await agent.get_state(thread_id="thread")
+        # served from the cache, which the run brought up to date
+        assert reads == []
+        assert _message_contents(state) == ["turn 0", "turn 1"]
+        assert state["state"]["document"].startswith("hello world")
+
+    asyncio.run(main())
+
+
+def test_unknown_threads_are_read_from_the_checkpointer():
+    agent = LangGraphAgent(name="agent", graph=build_writer_graph())
+
+    async def main():
+        state = await agent.get_state(thread_id="new")
+        assert state["threadExists"] is False
+
+        await _run(agent, 1, thread_id="new")
+        state = await agent.get_state(thread_id="new")
+        assert state["threadExists"] is True
+        assert _message_contents(state) == ["turn 0"]
+
+    asyncio.run(main())
@@ -0,0 +1,139 @@
+"""Tests for the worker pool"""
+
+import asyncio
+import threading
+
+import pytest
+
+from copilotkit.worker_pool import WorkerPool
+
+
+def test_runs_coroutines_on_persistent_worker_loops():
+    pool = WorkerPool(max_workers=1)
+
+    async def current_loop():
+        return asyncio.get_running_loop(), threading.current_thread().name
+
+    async def main():
+        first = await pool.run(current_loop)
+        second = await pool.run(current_loop)
+        assert first == second
+        assert first[0] is not asyncio.get_running_loop()
+        assert first[1].startswith("copilotkit-worker")
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+
+
+def test_busy_workers_are_not_reused_while_the_pool_can_grow():
+    pool = WorkerPool(max_workers=2)
+    started = threading.Barrier(2, timeout=5)
+
+    async def blocking_work():
+        # only returns if both calls run at the same time, on different workers
+        await asyncio.to_thread(started.wait)
+        return threading.current_thread().name
+
+    async def main():
+        return await asyncio.gather(pool.run(blocking_work), pool.run(blocking_work))
+
+    try:
+        names = asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert len(set(names)) == 2
+
+
+def test_errors_are_raised_in_the_caller():
+    pool = WorkerPool(max_workers=1)
+
+    async def fail():
+        raise ValueError("boom")
+
+    try:
+        with pytest.raises(ValueError, match="boom"):
+            asyncio.run(pool.run(fail))
+    finally:
+        pool.shutdown()
+
+
+def test_bridged_streams_run_on_their_worker():
+    pool = WorkerPool(max_workers=1)
+    closed = threading.Event()
+
+    async def events():
+        try:
+            for index in range(3):
+                yield index, threading.current_thread().name
+        finally:
+            closed.set()
+
+    async def start_stream():
+        return pool.bridge(events())
+
+    async def main():
+        stream = await pool.run(start_stream)
+        items = [item async for item in stream]
+        assert [index for index, _ in items] == [0, 1, 2]
+        assert all(name.startswith("copilotkit-worker") for _, name in items)
+
+    try:
+        asyncio.run(main())
+    finally:
+        pool.shutdown()
+    assert closed.is_set()
+
+
+def test_closing_a_bridged_stream_closes_it_on_the_worker():
+    pool = WorkerPool(max_workers=1)
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield "event"
+                await asyncio.sleep(0)
+        finally:
+            closed.set()
+
+    async def start_stream():
+        return pool.bridge(endless())
+
+    async def main():
+        stream = await pool.run(start_stream)
+        assert await stream.__anext__() == "event"
+        await stream.aclose()
+
+    try:
+        asyncio.run(main())
+        assert closed.wait(5)
+        # the worker is idle again once the stream is closed
+        assert pool._workers[0].active == 0  # pylint: disable=protected-access
+    finally:
+        pool.shutdown()
+
+
+def test_bridge_outside_of_a_worker_is_rejected():
+    pool = WorkerPool(max_workers=1)
+
+    async def events():
+        yield "event"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            pool.bridge(events())
+
+    asyncio.run(main())
+
+
+def test_shutdown_pool_rejects_work():
+    pool = WorkerPool(max_workers=1)
+    pool.shutdown()
+
+    async def work():
+        return 1
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.run(work))